@@ -0,0 +1,123 @@
+"""Micro-benchmark for TripleRiderDetector.filter_overlapping_detections.
+
+Compares the original pure-Python greedy NMS (a ``calculate_overlap`` call per
+pair) with the vectorized ``detect.geometry.nms_indices`` on synthetic dense
+scenes of 10 to 1000 boxes, and checks both keep exactly the same boxes.
+
+Usage (from the project root):
+    python -m benchmarks.bench_nms --sizes 10 100 1000 --output nms.json
+"""
+
+import argparse
+import json
+import timeit
+
+import numpy as np
+
+from detect.geometry import nms_indices
+
+IOU_THRESHOLD = 0.3
+
+
+def calculate_overlap(box1, box2):
+    """The original per-pair IoU from TripleRiderDetector"""
+    x1 = max(box1[0], box2[0])
+    y1 = max(box1[1], box2[1])
+    x2 = min(box1[2], box2[2])
+    y2 = min(box1[3], box2[3])
+
+    if x2 < x1 or y2 < y1:
+        return 0.0
+
+    intersection = (x2 - x1) * (y2 - y1)
+    box1_area = (box1[2] - box1[0]) * (box1[3] - box1[1])
+    box2_area = (box2[2] - box2[0]) * (box2[3] - box2[1])
+    return intersection / float(box1_area + box2_area - intersection)
+
+
+def original_nms(boxes, scores, iou_threshold):
+    """The original greedy loop, without its debug prints"""
+    indices = []
+    boxes = np.array(boxes)
+    scores = np.array(scores)
+    score_indices = np.argsort(scores)[::-1]
+    while len(score_indices) > 0:
+        current_index = score_indices[0]
+        indices.append(current_index)
+        ious = [
+            calculate_overlap(boxes[current_index], boxes[i])
+            for i in score_indices[1:]
+        ]
+        score_indices = [
+            i for i, iou in zip(score_indices[1:], ious) if iou < iou_threshold
+        ]
+    return [int(i) for i in indices]
+
+
+def synthetic_scene(count, seed=0, width=1920, height=1080):
+    """Clustered boxes like a dense junction: several jittered candidates per object"""
+    rng = np.random.default_rng(seed)
+    objects = max(1, count // 4)
+    centers = rng.uniform([0, 0], [width, height], size=(objects, 2))
+    sizes = rng.uniform(40, 200, size=(objects, 2))
+    owner = rng.integers(0, objects, size=count)
+    jitter = rng.normal(0, 8, size=(count, 4))
+    boxes = np.concatenate(
+        [centers[owner] - sizes[owner] / 2, centers[owner] + sizes[owner] / 2], axis=1
+    )
+    boxes = (boxes + jitter).astype(np.float32)
+    scores = rng.uniform(0.3, 0.95, size=count).astype(np.float32)
+    return boxes, scores
+
+
+def best_time(function, repeat):
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--sizes", nargs="+", type=int, default=[10, 30, 100, 300, 1000]
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'boxes':>6} {'kept':>6} {'original ms':>12} {'vectorized ms':>14} {'speedup':>8}")
+    for count in args.sizes:
+        boxes, scores = synthetic_scene(count)
+        kept = nms_indices(boxes, scores, IOU_THRESHOLD)
+        if kept != original_nms(boxes, scores, IOU_THRESHOLD):
+            raise AssertionError(f"Kept boxes differ for {count} boxes")
+
+        original = best_time(
+            lambda: original_nms(boxes, scores, IOU_THRESHOLD), args.repeat
+        )
+        vectorized = best_time(
+            lambda: nms_indices(boxes, scores, IOU_THRESHOLD), args.repeat
+        )
+        results.append(
+            {
+                "boxes": count,
+                "kept": len(kept),
+                "original_seconds": original,
+                "vectorized_seconds": vectorized,
+                "speedup": original / vectorized,
+            }
+        )
+        print(
+            f"{count:>6} {len(kept):>6} {original * 1e3:>12.3f} "
+            f"{vectorized * 1e3:>14.3f} {original / vectorized:>7.1f}x"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[INFO] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
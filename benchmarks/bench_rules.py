@@ -0,0 +1,268 @@
+"""Micro-benchmarks of the detection rule and geometry code, without the models.
+
+Times the per-frame code around the models on synthetic, seeded inputs, so the
+numbers are deterministic and the suite runs in seconds on any CPU:
+
+- ``calculate_overlap``: one pairwise IoU, over a batch of random box pairs;
+- ``filter_overlapping_detections``: motorcycle NMS on dense scenes;
+- ``detect_triple_riders``: the whole rule (filtering, NMS, rider association)
+  with the YOLO model replaced by a stub that returns a prepared scene;
+- ``preprocess_image``: CLAHE and sharpening on frames from 480p to 4K;
+- ``preprocessor``: each step and CLAHE mode of the reused-buffer
+  ``Preprocessor`` on a 1080p frame;
+- ``match_helmets``: the helmet/head-region matching on rider/helmet sets.
+
+Results go to JSON; ``--baseline`` compares them with an earlier run (e.g. from
+the previous version) and flags cases that got slower than ``--tolerance``.
+
+Usage (from the project root):
+    python -m benchmarks.bench_rules --output rules.json
+    python -m benchmarks.bench_rules --baseline rules.json --only preprocess_image
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import timeit
+
+import cv2
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+from benchmarks.bench_nms import synthetic_scene
+from detect.Helmet_detection.helmet import HELMET_CLASS_ID, RIDER_CLASS_ID, match_helmets
+from detect.object_detection import MOTORCYCLE_CLASS_ID, PERSON_CLASS_ID
+from detect.preprocess import Preprocessor
+from detect.Trippleriding_detection.tripple import TripleRiderDetector
+
+FRAME_SIZES = {"480p": (480, 854), "720p": (720, 1280), "1080p": (1080, 1920), "4k": (2160, 3840)}
+COCO_NAMES = {PERSON_CLASS_ID: "person", MOTORCYCLE_CLASS_ID: "motorcycle"}
+
+
+class StubModel:
+    """Stands in for the COCO YOLO model: every call returns the same prepared
+    detections, as an ultralytics ``Results`` like the real model's"""
+
+    def __init__(self, boxes, classes, confidences):
+        self.data = torch.from_numpy(
+            np.column_stack([boxes, confidences, classes]).astype(np.float32)
+        )
+
+    def __call__(self, frame, **kwargs):
+        return [Results(frame, path="", names=COCO_NAMES, boxes=self.data)]
+
+
+def synthetic_frame(height, width, seed=0):
+    """Smooth noise, so CLAHE and the sharpening work on realistic gradients"""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, (height // 8, width // 8, 3), dtype=np.uint8)
+    return cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR)
+
+
+def traffic_scene(motorcycles, riders_per_motorcycle=2, bystanders=0, seed=0):
+    """Motorcycles with their riders stacked on them, plus people elsewhere.
+
+    Every third motorcycle carries three riders, so the triple riding rule has
+    violations to find. Returns (boxes, classes, confidences).
+    """
+    rng = np.random.default_rng(seed)
+    boxes, classes = [], []
+    for i in range(motorcycles):
+        x, y = rng.uniform([0, 200], [1700, 900])
+        w, h = rng.uniform([80, 100], [160, 180])
+        boxes.append([x, y, x + w, y + h])
+        classes.append(MOTORCYCLE_CLASS_ID)
+        for j in range(3 if i % 3 == 0 else riders_per_motorcycle):
+            offset = (j - 1) * w * 0.3
+            boxes.append([x + offset + w * 0.2, y - h * 0.8, x + offset + w * 0.7, y + h * 0.5])
+            classes.append(PERSON_CLASS_ID)
+    for _ in range(bystanders):
+        x, y = rng.uniform([0, 0], [1850, 900])
+        boxes.append([x, y, x + 50, y + 150])
+        classes.append(PERSON_CLASS_ID)
+    confidences = rng.uniform(0.4, 0.95, size=len(boxes))
+    return np.array(boxes, dtype=np.float32), np.array(classes), confidences
+
+
+def helmet_scene(riders, helmet_share=0.6, seed=0):
+    """Riders with a helmet on the head of about ``helmet_share`` of them"""
+    rng = np.random.default_rng(seed)
+    rider_boxes = np.column_stack(
+        [rng.uniform(0, 1800, riders), rng.uniform(0, 800, riders)]
+    )
+    rider_boxes = np.hstack([rider_boxes, rider_boxes + rng.uniform(60, 200, (riders, 2))])
+    helmeted = rider_boxes[rng.random(riders) < helmet_share]
+    width = helmeted[:, 2] - helmeted[:, 0]
+    helmets = np.column_stack(
+        [
+            helmeted[:, 0] + width * 0.25,
+            helmeted[:, 1],
+            helmeted[:, 2] - width * 0.25,
+            helmeted[:, 1] + width * 0.5,
+        ]
+    )
+    xyxy = np.vstack([rider_boxes, helmets])
+    classes = np.array([RIDER_CLASS_ID] * riders + [HELMET_CLASS_ID] * len(helmets))
+    return xyxy, classes, rng.uniform(0.3, 0.95, len(xyxy))
+
+
+def best_time(function, repeat):
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def quiet(function):
+    """``function`` with its console output discarded, so printing is not timed
+    against the terminal"""
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return function()
+
+    return run
+
+
+def bench_calculate_overlap(detector, pairs):
+    rng = np.random.default_rng(0)
+    corners = rng.uniform(0, 1000, (pairs, 2, 2))
+    boxes = np.concatenate([corners, corners + rng.uniform(20, 200, (pairs, 2, 2))], axis=2)
+    boxes = boxes.tolist()
+    return lambda: [detector.calculate_overlap(a, b) for a, b in boxes]
+
+
+def bench_filter_overlapping_detections(detector, boxes):
+    scene, scores = synthetic_scene(boxes)
+    classes = [MOTORCYCLE_CLASS_ID] * boxes
+    return quiet(lambda: detector.filter_overlapping_detections(scene, scores, classes, 0.3))
+
+
+def bench_detect_triple_riders(detector, motorcycles, bystanders):
+    detector.model = StubModel(*traffic_scene(motorcycles, bystanders=bystanders))
+    frame = synthetic_frame(1080, 1920)
+    return quiet(lambda: detector.detect_triple_riders(frame))
+
+
+def bench_preprocess_image(detector, size):
+    frame = synthetic_frame(*FRAME_SIZES[size])
+    return quiet(lambda: detector.preprocess_image(frame))
+
+
+def bench_preprocessor(detector, clahe, sharpen):
+    frame = synthetic_frame(*FRAME_SIZES["1080p"])
+    preprocessor = Preprocessor(clahe=clahe, sharpen=sharpen)
+    return lambda: preprocessor(frame)
+
+
+def bench_match_helmets(detector, riders):
+    xyxy, classes, confidences = helmet_scene(riders)
+    return lambda: match_helmets(xyxy, classes, confidences)
+
+
+# (name, factory returning the timed call, parameter sets of the factory)
+BENCHMARKS = [
+    ("calculate_overlap", bench_calculate_overlap, [{"pairs": 1000}]),
+    (
+        "filter_overlapping_detections",
+        bench_filter_overlapping_detections,
+        [{"boxes": n} for n in (10, 100, 1000)],
+    ),
+    (
+        "detect_triple_riders",
+        bench_detect_triple_riders,
+        [
+            {"motorcycles": 2, "bystanders": 5},
+            {"motorcycles": 20, "bystanders": 40},
+            {"motorcycles": 100, "bystanders": 200},
+        ],
+    ),
+    ("preprocess_image", bench_preprocess_image, [{"size": size} for size in FRAME_SIZES]),
+    (
+        "preprocessor",
+        bench_preprocessor,
+        [
+            {"clahe": clahe, "sharpen": sharpen}
+            for clahe in ("bgr", "lab", "ycrcb", None)
+            for sharpen in (True, False)
+            if clahe or sharpen
+        ],
+    ),
+    ("match_helmets", bench_match_helmets, [{"riders": n} for n in (5, 50, 500)]),
+]
+
+
+def case_id(name, params):
+    return name + "[" + ",".join(f"{key}={value}" for key, value in params.items()) + "]"
+
+
+def environment():
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        "revision": revision,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "machine": platform.machine(),
+        "opencv_threads": cv2.getNumThreads(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--only", nargs="+", help="Run only these benchmarks")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare with the results in this JSON file")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="Slowdown flagged as a regression"
+    )
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {row["case"]: row for row in json.load(f)["results"]}
+
+    # The model is never loaded: every benchmark that needs one installs a stub
+    detector = TripleRiderDetector(model=StubModel(*traffic_scene(0)))
+    results = []
+    regressions = []
+    print(f"{'case':>58} {'us/call':>11} {'baseline':>11} {'change':>8}")
+    for name, factory, param_sets in BENCHMARKS:
+        if args.only and name not in args.only:
+            continue
+        for params in param_sets:
+            case = case_id(name, params)
+            seconds = best_time(factory(detector, **params), args.repeat)
+            row = {"case": case, "benchmark": name, "params": params, "seconds": seconds}
+            previous = baseline.get(case)
+            reference = change = "-"
+            if previous:
+                row["baseline_seconds"] = previous["seconds"]
+                row["change"] = seconds / previous["seconds"] - 1
+                reference = f"{previous['seconds'] * 1e6:.1f}"
+                change = f"{row['change']:+.1%}"
+                if row["change"] > args.tolerance:
+                    regressions.append(case)
+            results.append(row)
+            print(f"{case:>58} {seconds * 1e6:>11.1f} {reference:>11} {change:>8}")
+
+    if regressions:
+        print(f"[WARNING] Slower than the baseline by over {args.tolerance:.0%}: {regressions}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2)
+        print(f"[INFO] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
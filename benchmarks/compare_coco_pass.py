@@ -0,0 +1,180 @@
+"""Compare the shared COCO pass against the original two-model setup.
+
+The original pipeline ran yolov8m (persons and motorcycles) for the triple riding
+rule and, separately, yolov8x for vehicle annotation. This script runs both setups
+over a folder of images and reports, for every shared-pass model size:
+
+- how often the triple riding decision agrees with the original setup
+- vehicle precision/recall against the original yolov8x boxes
+  (same class, IoU >= 0.5)
+- mean COCO inference time per image
+
+Usage (from the project root):
+    python -m benchmarks.compare_coco_pass path/to/images --sizes n s m --output report.json
+"""
+
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from detect.geometry import box_iou_matrix
+from detect.model_registry import registry
+from detect.object_detection import (
+    coco_model_path,
+    detections_from_results,
+    run_coco_pass,
+)
+from detect.Trippleriding_detection.tripple import TripleRiderDetector
+from detect.vehicle_detection import VEHICLE_CLASSES, VEHICLE_MODEL_PATH
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+MATCH_IOU = 0.5
+
+
+def list_images(folder):
+    return sorted(
+        os.path.join(folder, name)
+        for name in os.listdir(folder)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def vehicles_only(detections):
+    mask = np.isin(detections.data["class_name"], VEHICLE_CLASSES)
+    return detections[mask]
+
+
+def count_matches(reference, candidate):
+    """Greedy one-to-one matching of candidate boxes to reference boxes of the same class"""
+    if len(reference) == 0 or len(candidate) == 0:
+        return 0
+    ious = box_iou_matrix(candidate.xyxy, reference.xyxy)
+    same_class = candidate.class_id[:, None] == reference.class_id[None, :]
+    ious = np.where(same_class, ious, 0.0)
+    matched_reference = set()
+    matches = 0
+    for i in np.argsort(-candidate.confidence):
+        for j in np.argsort(-ious[i]):
+            if ious[i, j] < MATCH_IOU:
+                break
+            if j not in matched_reference:
+                matched_reference.add(j)
+                matches += 1
+                break
+    return matches
+
+
+def run_original(images, triple_detector, vehicle_model):
+    """Decisions, vehicles and COCO inference time of the original two-model setup"""
+    outcomes = []
+    for image_path in images:
+        image = cv2.imread(image_path)
+        frame = triple_detector.preprocess_image(image)
+        start = time.perf_counter()
+        triple_detections = triple_detector.run_detection(frame)
+        vehicle_detections = detections_from_results(
+            vehicle_model(image, verbose=False)[0]
+        )
+        elapsed = time.perf_counter() - start
+        outcomes.append(
+            {
+                "triple_riding": triple_detector.detect_triple_riders(
+                    frame, detections=triple_detections
+                ),
+                "vehicles": vehicles_only(vehicle_detections),
+                "seconds": elapsed,
+            }
+        )
+    return outcomes
+
+
+def run_shared(images, triple_detector, coco_model):
+    """Decisions, vehicles and COCO inference time of the shared single pass"""
+    outcomes = []
+    for image_path in images:
+        image = cv2.imread(image_path)
+        frame = triple_detector.preprocess_image(image)
+        start = time.perf_counter()
+        detections = run_coco_pass(coco_model, frame)
+        elapsed = time.perf_counter() - start
+        outcomes.append(
+            {
+                "triple_riding": triple_detector.detect_triple_riders(
+                    frame, detections=detections
+                ),
+                "vehicles": vehicles_only(detections),
+                "seconds": elapsed,
+            }
+        )
+    return outcomes
+
+
+def compare(original, shared):
+    agreement = sum(
+        a["triple_riding"] == b["triple_riding"] for a, b in zip(original, shared)
+    )
+    reference_total = sum(len(a["vehicles"]) for a in original)
+    candidate_total = sum(len(b["vehicles"]) for b in shared)
+    matches = sum(
+        count_matches(a["vehicles"], b["vehicles"]) for a, b in zip(original, shared)
+    )
+    return {
+        "images": len(original),
+        "triple_riding_agreement": agreement / len(original) if original else None,
+        "triple_riding_disagreements": len(original) - agreement,
+        "vehicle_precision": matches / candidate_total if candidate_total else None,
+        "vehicle_recall": matches / reference_total if reference_total else None,
+        "mean_seconds": float(np.mean([b["seconds"] for b in shared])),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("images", help="Folder of test images")
+    parser.add_argument(
+        "--sizes", nargs="+", default=["n", "s", "m", "l", "x"],
+        help="Shared-pass model sizes to evaluate",
+    )
+    parser.add_argument("--output", help="Write the report to this JSON file")
+    args = parser.parse_args()
+
+    images = list_images(args.images)
+    if not images:
+        print(f"[ERROR] No images found in {args.images}")
+        return
+
+    triple_detector = TripleRiderDetector(
+        confidence=0.3, model=registry.get_model(coco_model_path("m"))
+    )
+    vehicle_model = registry.get_model(VEHICLE_MODEL_PATH)
+    for model in (triple_detector.model, vehicle_model):
+        model.warm_up()
+
+    original = run_original(images, triple_detector, vehicle_model)
+    report = {
+        "original": {
+            "images": len(images),
+            "mean_seconds": float(np.mean([a["seconds"] for a in original])),
+        },
+        "shared": {},
+    }
+    for size in args.sizes:
+        coco_model = registry.get_model(coco_model_path(size))
+        coco_model.warm_up()
+        report["shared"][size] = compare(
+            original, run_shared(images, triple_detector, coco_model)
+        )
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[INFO] Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Helmet model on whole frames versus on motorcycle crops (ROI mode).
+
+Runs the shared COCO pass once per image, then the helmet model both ways, and
+reports per mode the pixels given to the model, the time per frame, and the
+riders and helmetless riders found. Riders are also split by the height of
+their box (small, medium, large) and matched across modes at IoU >= 0.5, so the
+gain on small, distant riders shows separately from the large ones both find.
+
+Usage (from the project root):
+    python -m benchmarks.compare_helmet_roi input_images --output helmet_roi.json
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from benchmarks.compare_model_formats import load_frames
+from detect.geometry import box_iou_matrix
+from detect.Helmet_detection.helmet import (
+    HELMET_CONFIDENCE,
+    ROI_IMAGE_SIZE,
+    predict_helmet_rois,
+    rider_helmet_results,
+    rider_rois,
+)
+from detect.model_registry import registry
+from detect.object_detection import (
+    DETECT_DIR,
+    MOTORCYCLE_CLASS_ID,
+    coco_model_path,
+    filter_detections,
+    predict_batched,
+    run_coco_pass_batch,
+)
+
+MATCH_IOU = 0.5
+# Rider box heights (pixels) splitting small / medium / large riders
+SIZE_BOUNDS = (64, 160)
+HELMET_MODEL_PATH = os.path.join(DETECT_DIR, "Helmet_detection", "hemletYoloV8_100epochs.pt")
+
+
+def size_class(box):
+    height = box[3] - box[1]
+    if height < SIZE_BOUNDS[0]:
+        return "small"
+    return "medium" if height < SIZE_BOUNDS[1] else "large"
+
+
+def riders_by_size(riders):
+    counts = {"small": 0, "medium": 0, "large": 0}
+    for rider in riders:
+        counts[size_class(rider["box"])] += 1
+    return counts
+
+
+def only_in(riders, others):
+    """Riders with no rider of ``others`` at IoU >= MATCH_IOU, by size"""
+    counts = {"small": 0, "medium": 0, "large": 0}
+    for frame_riders, frame_others in zip(riders, others):
+        if not frame_riders:
+            continue
+        boxes = [rider["box"] for rider in frame_riders]
+        if frame_others:
+            ious = box_iou_matrix(boxes, [rider["box"] for rider in frame_others])
+            unmatched = ious.max(axis=1) < MATCH_IOU
+        else:
+            unmatched = np.ones(len(boxes), dtype=bool)
+        for rider, alone in zip(frame_riders, unmatched):
+            if alone:
+                counts[size_class(rider["box"])] += 1
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("folder", nargs="?", help="Folder of test images")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N random frames instead")
+    parser.add_argument("--coco-model-size", default="m")
+    parser.add_argument("--roi-size", type=int, default=ROI_IMAGE_SIZE)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    if not args.folder and not args.synthetic:
+        parser.error("give a folder of images or --synthetic N")
+    frames = load_frames(args.folder, args.synthetic)
+    helmet_model = registry.get_model(HELMET_MODEL_PATH)
+    coco_model = registry.get_model(coco_model_path(args.coco_model_size))
+
+    coco_detections = run_coco_pass_batch(coco_model, frames, batch_size=args.batch_size)
+    rois = [
+        rider_rois(filter_detections(detections, [MOTORCYCLE_CLASS_ID]).xyxy, frame.shape)
+        for frame, detections in zip(frames, coco_detections)
+    ]
+    runs = {
+        "full": (
+            lambda: predict_batched(
+                helmet_model, frames, args.batch_size, conf=HELMET_CONFIDENCE, verbose=False
+            ),
+            sum(frame.shape[0] * frame.shape[1] for frame in frames),
+        ),
+        "roi": (
+            lambda: predict_helmet_rois(
+                helmet_model, frames, rois, imgsz=args.roi_size, batch_size=args.batch_size
+            ),
+            sum((x2 - x1) * (y2 - y1) for frame_rois in rois for x1, y1, x2, y2 in frame_rois),
+        ),
+    }
+
+    riders = {}
+    results = {"images": len(frames), "crops": sum(len(r) for r in rois), "modes": []}
+    print(f"{'mode':>5} {'Mpixels':>9} {'ms/frame':>9} {'riders':>7} {'no helmet':>10} {'small':>6}")
+    for mode, (run, pixels) in runs.items():
+        run()  # warm
+        start = time.perf_counter()
+        helmet_results = run()
+        seconds = (time.perf_counter() - start) / len(frames)
+        riders[mode] = [rider_helmet_results(result) for result in helmet_results]
+        flat = [rider for frame_riders in riders[mode] for rider in frame_riders]
+        row = {
+            "mode": mode,
+            "pixels": int(pixels),
+            "seconds_per_frame": seconds,
+            "riders": len(flat),
+            "helmetless": sum(not rider["helmet"] for rider in flat),
+            "riders_by_size": riders_by_size(flat),
+        }
+        results["modes"].append(row)
+        print(
+            f"{mode:>5} {pixels / 1e6:>9.1f} {seconds * 1e3:>9.1f} {row['riders']:>7} "
+            f"{row['helmetless']:>10} {row['riders_by_size']['small']:>6}"
+        )
+
+    results["only_in_roi"] = only_in(riders["roi"], riders["full"])
+    results["only_in_full"] = only_in(riders["full"], riders["roi"])
+    print(f"[INFO] Riders only found on crops: {results['only_in_roi']}")
+    print(f"[INFO] Riders only found on full frames: {results['only_in_full']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[INFO] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""CPU throughput and output agreement of the PyTorch, ONNX and OpenVINO models.
+
+Runs each detection checkpoint in every requested format over the same frames,
+in batches like ``ViolationDetector`` does, and reports per-frame latency,
+throughput relative to PyTorch, and how closely the detections match PyTorch's
+(share of PyTorch boxes matched by a box of the same class at IoU >= 0.9, and
+the largest confidence difference among them).
+
+Usage (from the project root):
+    python -m benchmarks.compare_model_formats input_images --formats pytorch onnx openvino
+    python -m benchmarks.compare_model_formats --synthetic 32 --output formats.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from detect.geometry import box_iou_matrix
+from detect.model_export import MODEL_FORMATS, project_checkpoints
+from detect.model_registry import ModelRegistry
+from detect.object_detection import predict_batched
+
+MATCH_IOU = 0.9
+
+
+def load_frames(folder=None, synthetic=0, seed=0):
+    if synthetic:
+        rng = np.random.default_rng(seed)
+        return [
+            cv2.GaussianBlur(rng.integers(0, 255, (720, 1280, 3), dtype=np.uint8), (7, 7), 0)
+            for _ in range(synthetic)
+        ]
+    paths = sorted(
+        path
+        for pattern in ("*.jpg", "*.jpeg", "*.png")
+        for path in glob.glob(os.path.join(folder, pattern))
+    )
+    return [frame for frame in (cv2.imread(path) for path in paths) if frame is not None]
+
+
+def detections_of(results):
+    """(boxes, classes, confidences) of every result as numpy arrays"""
+    return [
+        (
+            result.boxes.xyxy.cpu().numpy(),
+            result.boxes.cls.cpu().numpy().astype(int),
+            result.boxes.conf.cpu().numpy(),
+        )
+        for result in results
+    ]
+
+
+def agreement(reference, candidate):
+    """Share of reference boxes matched by the candidate, and the worst confidence gap"""
+    matched = total = 0
+    max_conf_diff = 0.0
+    for (ref_boxes, ref_cls, ref_conf), (boxes, cls, conf) in zip(reference, candidate):
+        total += len(ref_boxes)
+        if not len(ref_boxes) or not len(boxes):
+            continue
+        ious = box_iou_matrix(ref_boxes, boxes)
+        ious[ref_cls[:, None] != cls[None, :]] = 0
+        best = ious.argmax(axis=1)
+        hits = ious[np.arange(len(ref_boxes)), best] >= MATCH_IOU
+        matched += int(hits.sum())
+        if hits.any():
+            max_conf_diff = max(
+                max_conf_diff, float(np.abs(ref_conf[hits] - conf[best[hits]]).max())
+            )
+    return {
+        "reference_boxes": total,
+        "matched_share": matched / total if total else 1.0,
+        "max_confidence_diff": max_conf_diff,
+    }
+
+
+def time_model(model, frames, batch_size, repeat):
+    """Seconds per frame (best of ``repeat`` passes) and the detections of the last pass"""
+    predict_batched(model, frames[:batch_size], batch_size, verbose=False)  # warm
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = predict_batched(model, frames, batch_size, verbose=False)
+        elapsed = (time.perf_counter() - start) / len(frames)
+        best = elapsed if best is None else min(best, elapsed)
+    return best, detections_of(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("folder", nargs="?", help="Folder of test images")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N random frames instead")
+    parser.add_argument("--formats", nargs="+", default=["pytorch", "onnx"], choices=MODEL_FORMATS)
+    parser.add_argument("--checkpoints", nargs="+", help="Checkpoints (default: the project's)")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    if not args.folder and not args.synthetic:
+        parser.error("give a folder of images or --synthetic N")
+    frames = load_frames(args.folder, args.synthetic)
+    formats = ["pytorch"] + [f for f in args.formats if f != "pytorch"]
+
+    results = []
+    print(f"{'model':>32} {'format':>9} {'ms/frame':>9} {'speedup':>8} {'matched':>8} {'max dconf':>9}")
+    for checkpoint in args.checkpoints or project_checkpoints():
+        if not os.path.exists(checkpoint):
+            print(f"[WARNING] {checkpoint} not found; skipped")
+            continue
+        registry = ModelRegistry()
+        reference = None
+        for model_format in formats:
+            model = registry.get_model(checkpoint, model_format)
+            seconds, detections = time_model(model, frames, args.batch_size, args.repeat)
+            if reference is None:
+                reference = (seconds, detections)
+            row = {
+                "model": os.path.basename(str(checkpoint)),
+                "format": model_format,
+                "loaded": os.path.basename(model.path),
+                "seconds_per_frame": seconds,
+                "speedup": reference[0] / seconds,
+            }
+            row.update(agreement(reference[1], detections))
+            results.append(row)
+            print(
+                f"{row['model']:>32} {model_format:>9} {seconds * 1e3:>9.1f} "
+                f"{row['speedup']:>7.2f}x {row['matched_share']:>8.1%} "
+                f"{row['max_confidence_diff']:>9.4f}"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[INFO] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
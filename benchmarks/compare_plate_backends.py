@@ -0,0 +1,159 @@
+"""Compare the cloud and local plate reader backends on the same vehicle crops.
+
+Reads every image with each backend and reports per-backend latency
+(mean/p50/p95), how often each found a plate, and how often the two agree
+(exact match, and mean character similarity where both read something). When
+the expected plate is known it also reports each backend's accuracy:
+``--truth`` takes a CSV of ``filename,plate`` lines, and ``--synthetic N``
+renders N crops with random plates instead of reading a folder.
+
+Usage (from the project root):
+    python -m benchmarks.compare_plate_backends input_images --token $PLATE_TOKEN
+    python -m benchmarks.compare_plate_backends --synthetic 50 \\
+        --url http://127.0.0.1:8765/v1/plate-reader/ --output backends.json
+"""
+
+import argparse
+import csv
+import difflib
+import glob
+import json
+import os
+import string
+import time
+
+import cv2
+import numpy as np
+
+from detect.Licenseplate_detection.local_reader import LocalPlateReader
+from detect.Licenseplate_detection.plate_reader import (
+    PLATE_READER_URL,
+    PlateRecognizerClient,
+)
+
+
+def synthetic_crops(count, seed=0):
+    """Motorcycle-crop-sized images with a light plate carrying a random number"""
+    rng = np.random.default_rng(seed)
+    crops = []
+    for i in range(count):
+        letters = "".join(rng.choice(list(string.ascii_uppercase), 2))
+        plate = f"KA{rng.integers(1, 99):02d}{letters}{rng.integers(1000, 9999)}"
+        image = rng.integers(40, 120, size=(400, 300, 3), dtype=np.uint8)
+        image = cv2.GaussianBlur(image, (9, 9), 0)
+        cv2.rectangle(image, (40, 260), (260, 310), (235, 235, 235), -1)
+        cv2.putText(
+            image, plate, (48, 298), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (20, 20, 20), 2
+        )
+        crops.append((f"synthetic_{i}.jpg", image, plate))
+    return crops
+
+
+def folder_crops(folder, truth_csv=None):
+    truth = {}
+    if truth_csv:
+        with open(truth_csv, newline="") as f:
+            truth = {row[0]: row[1].upper() for row in csv.reader(f) if row}
+    paths = sorted(
+        path
+        for pattern in ("*.jpg", "*.jpeg", "*.png")
+        for path in glob.glob(os.path.join(folder, pattern))
+    )
+    return [
+        (os.path.basename(path), cv2.imread(path), truth.get(os.path.basename(path)))
+        for path in paths
+    ]
+
+
+def run_backend(backend, crops):
+    plates, latencies = [], []
+    for _, image, _ in crops:
+        start = time.perf_counter()
+        plates.append(backend.read_plate(image))
+        latencies.append(time.perf_counter() - start)
+    return plates, latencies
+
+
+def summarize(name, plates, latencies, truths):
+    latencies = sorted(latencies)
+    summary = {
+        "backend": name,
+        "images": len(plates),
+        "read": sum(plate is not None for plate in plates),
+        "mean_ms": sum(latencies) / len(latencies) * 1e3,
+        "p50_ms": latencies[len(latencies) // 2] * 1e3,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1e3,
+    }
+    known = [(plate, truth) for plate, truth in zip(plates, truths) if truth]
+    if known:
+        summary["accuracy"] = sum(plate == truth for plate, truth in known) / len(known)
+    return summary
+
+
+def agreement(cloud, local):
+    both = [(a, b) for a, b in zip(cloud, local) if a is not None and b is not None]
+    return {
+        "both_read": len(both),
+        "exact_match": sum(a == b for a, b in both),
+        "exact_match_rate": sum(a == b for a, b in both) / len(both) if both else None,
+        "mean_similarity": (
+            sum(difflib.SequenceMatcher(None, a, b).ratio() for a, b in both) / len(both)
+            if both
+            else None
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("folder", nargs="?", help="Folder of vehicle crops")
+    parser.add_argument("--truth", help="CSV of filename,plate for the folder")
+    parser.add_argument("--synthetic", type=int, help="Use N rendered crops instead")
+    parser.add_argument("--token", default=os.environ.get("PLATE_RECOGNIZER_TOKEN", ""))
+    parser.add_argument("--url", default=PLATE_READER_URL, help="Cloud API (or mock) URL")
+    parser.add_argument("--engine", default="auto", choices=["auto", "tesseract", "easyocr"])
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        crops = synthetic_crops(args.synthetic)
+    elif args.folder:
+        crops = folder_crops(args.folder, args.truth)
+    else:
+        parser.error("give a folder of crops or --synthetic N")
+    truths = [truth for _, _, truth in crops]
+
+    backends = {
+        "cloud": PlateRecognizerClient(args.token, url=args.url),
+        "local": LocalPlateReader(engine=args.engine),
+    }
+    results = {"backends": [], "per_image": []}
+    plates = {}
+    print(f"{'backend':>8} {'read':>6} {'mean ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'accuracy':>9}")
+    for name, backend in backends.items():
+        plates[name], latencies = run_backend(backend, crops)
+        summary = summarize(name, plates[name], latencies, truths)
+        results["backends"].append(summary)
+        accuracy = summary.get("accuracy")
+        print(
+            f"{name:>8} {summary['read']:>6} {summary['mean_ms']:>9.1f} "
+            f"{summary['p50_ms']:>8.1f} {summary['p95_ms']:>8.1f} "
+            f"{'-' if accuracy is None else f'{accuracy:.1%}':>9}"
+        )
+        backend.close()
+
+    results["agreement"] = agreement(plates["cloud"], plates["local"])
+    print(f"[INFO] Agreement: {results['agreement']}")
+    results["per_image"] = [
+        {"image": name, "truth": truth, "cloud": cloud, "local": local}
+        for (name, _, truth), cloud, local in zip(crops, plates["cloud"], plates["local"])
+    ]
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[INFO] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Accuracy/latency contribution of each preprocessing step.
+
+Runs the full violation pipeline over the same images once per preprocessing
+configuration (the default, per-channel CLAHE plus sharpening, first as the
+reference) and reports the time spent preprocessing and in the whole pipeline,
+and how often each violation decision agrees with the reference's, with the
+images it misses or adds (see ``benchmarks.quantization_report``).
+
+Usage (from the project root):
+    python -m benchmarks.compare_preprocessing input_images --output preprocessing.json
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks.compare_model_formats import load_frames
+from benchmarks.quantization_report import (
+    VIOLATIONS,
+    NoPlateReader,
+    compare,
+    latency_summary,
+)
+from detect.metrics import STAGE_SECONDS, metrics
+from detect.model_registry import ModelRegistry
+from violation_detector import ViolationDetector
+
+# (clahe, sharpen), the reference first
+CONFIGURATIONS = [
+    ("bgr", True),
+    ("bgr", False),
+    ("lab", True),
+    ("ycrcb", True),
+    ("ycrcb", False),
+    (None, True),
+    (None, False),
+]
+
+
+def preprocess_seconds():
+    for name, labels, values in metrics.snapshot()["histograms"]:
+        if name == STAGE_SECONDS and labels.get("stage") == "preprocess":
+            return values[-2], values[-1]
+    return 0.0, 0
+
+
+def run_configuration(registry, frames, coco_model_size, clahe, sharpen):
+    """Per-image decisions, pipeline latencies and mean preprocessing time"""
+    detector = ViolationDetector(
+        registry=registry,
+        coco_model_size=coco_model_size,
+        plate_cache_path=None,
+        result_cache=False,
+        preprocess_clahe=clahe,
+        preprocess_sharpen=sharpen,
+    )
+    detector.plate_reader = NoPlateReader()
+    detector.process_image(frames[0])  # warm
+    metrics.reset()
+    decisions, latencies = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        result = detector.process_image(frame)
+        latencies.append(time.perf_counter() - start)
+        decisions.append({name: name in result["violations"] for name in VIOLATIONS})
+    total, calls = preprocess_seconds()
+    return decisions, latencies, total / max(calls, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("folder", nargs="?", help="Folder of test images")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N random frames instead")
+    parser.add_argument("--coco-model-size", default="m")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    if not args.folder and not args.synthetic:
+        parser.error("give a folder of images or --synthetic N")
+    frames = load_frames(args.folder, args.synthetic)
+    if not frames:
+        parser.error("no readable images")
+
+    # The models are loaded once and shared by every configuration
+    registry = ModelRegistry()
+    reference = None
+    results = []
+    print(
+        f"{'clahe':>6} {'sharpen':>7} {'prep ms':>8} {'mean ms':>8} "
+        f"{'helmet agree':>12} {'triple agree':>12} {'missed':>7} {'false':>6}"
+    )
+    for clahe, sharpen in CONFIGURATIONS:
+        decisions, latencies, preprocess = run_configuration(
+            registry, frames, args.coco_model_size, clahe, sharpen
+        )
+        if reference is None:
+            reference = decisions
+        row = {"clahe": clahe, "sharpen": sharpen, "preprocess_ms": preprocess * 1e3}
+        row.update(latency_summary(latencies))
+        row["decisions"] = compare(reference, decisions)
+        results.append(row)
+
+        helmet, triple = (row["decisions"][name] for name in VIOLATIONS)
+        print(
+            f"{str(clahe):>6} {str(sharpen):>7} {row['preprocess_ms']:>8.1f} "
+            f"{row['mean_ms']:>8.1f} {helmet['agreement']:>12.1%} "
+            f"{triple['agreement']:>12.1%} "
+            f"{len(helmet['missed']) + len(triple['missed']):>7} "
+            f"{len(helmet['false_alarms']) + len(triple['false_alarms']):>6}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"images": len(frames), "configurations": results}, f, indent=2)
+        print(f"[INFO] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
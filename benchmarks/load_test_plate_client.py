@@ -0,0 +1,142 @@
+"""Load test of the plate reader client against the local mock API.
+
+Reads the same set of synthetic uploads three ways and reports throughput,
+latency percentiles and failures for each:
+
+- ``bare``: the original one-off ``requests.post`` per image, no timeout
+- ``pooled``: ``PlateRecognizerClient.read_plate`` one image at a time
+- ``concurrent``: ``PlateRecognizerClient.read_many`` over all images
+
+Usage (from the project root):
+    python -m benchmarks.load_test_plate_client --requests 200 --workers 8 \\
+        --latency-ms 150 --error-rate 0.05 --hang-rate 0.01 --output plates.json
+
+``--url`` targets an already running server (e.g. ``benchmarks.mock_plate_server``)
+instead of starting one in-process.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import time
+
+import requests
+
+from benchmarks.mock_plate_server import start_mock_server
+from detect.Licenseplate_detection.plate_reader import PlateRecognizerClient
+
+
+def bare_read(url, upload):
+    """The original call: a new connection per request and no timeout"""
+    response = requests.post(
+        url, files={"upload": ("image.jpg", upload)}, headers={"Authorization": "Token x"}
+    )
+    if response.status_code not in (200, 201):
+        return None
+    results = response.json()["results"]
+    return results[0]["plate"].upper() if results else None
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def summarize(mode, latencies, plates, elapsed):
+    failures = sum(plate is None for plate in plates)
+    summary = {
+        "mode": mode,
+        "requests": len(plates),
+        "failures": failures,
+        "elapsed_seconds": elapsed,
+        "throughput_per_second": len(plates) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1e3,
+        "p95_ms": percentile(latencies, 0.95) * 1e3,
+        "p99_ms": percentile(latencies, 0.99) * 1e3,
+        "max_ms": max(latencies) * 1e3,
+    }
+    print(
+        f"{mode:>10} {summary['throughput_per_second']:>8.1f} {summary['p50_ms']:>8.0f} "
+        f"{summary['p95_ms']:>8.0f} {summary['p99_ms']:>8.0f} {summary['max_ms']:>8.0f} "
+        f"{failures:>8}"
+    )
+    return summary
+
+
+def timed(function, latencies):
+    def wrapper(*args):
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    return wrapper
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--url", help="Plate reader URL (default: start a mock server)")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=150)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--read-timeout", type=float, default=2.0)
+    parser.add_argument(
+        "--modes", nargs="+", default=["bare", "pooled", "concurrent"],
+        choices=["bare", "pooled", "concurrent"],
+    )
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    url = args.url
+    if url is None:
+        server, url = start_mock_server(
+            latency_ms=args.latency_ms,
+            error_rate=args.error_rate,
+            hang_rate=args.hang_rate,
+            hang_seconds=args.read_timeout * 5,
+        )
+    if args.hang_rate and "bare" in args.modes:
+        print("[WARNING] bare requests have no timeout and wait out every hung request")
+
+    # Per-request output from the client would drown the table
+    logging.getLogger("detect.Licenseplate_detection.plate_reader").setLevel(logging.CRITICAL)
+
+    # ~50 KB uploads, each distinct
+    uploads = [os.urandom(50_000) for _ in range(args.requests)]
+    results = []
+    print(f"{'mode':>10} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'failed':>8}")
+    for mode in args.modes:
+        latencies = []
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            if mode == "bare":
+                read = timed(lambda upload: bare_read(url, upload), latencies)
+                plates = [read(upload) for upload in uploads]
+            else:
+                client = PlateRecognizerClient(
+                    "x", url=url, read_timeout=args.read_timeout, max_workers=args.workers
+                )
+                client.read_plate = timed(client.read_plate, latencies)
+                if mode == "pooled":
+                    plates = [client.read_plate(upload) for upload in uploads]
+                else:
+                    plates = client.read_many(uploads)
+                client.close()
+        results.append(
+            summarize(mode, latencies, plates, time.perf_counter() - start)
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[INFO] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Local stand-in for the Plate Recognizer plate-reader API.
+
+Answers ``POST /v1/plate-reader/`` like the real API (201 with a ``results``
+list), after an injected latency, and fails a configurable share of requests
+with 429/5xx answers or by never answering in time. The plate returned is
+derived from the uploaded bytes, so the same image always reads the same.
+
+Usage (from the project root):
+    python -m benchmarks.mock_plate_server --port 8765 --latency-ms 300 --error-rate 0.05
+
+then point a client at it:
+    PlateRecognizerClient(token, url="http://127.0.0.1:8765/v1/plate-reader/")
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PLATE_READER_PATH = "/v1/plate-reader/"
+
+
+class MockPlateHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, Nagle plus the
+    # client's delayed ACK adds ~40 ms to every keep-alive response
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        config = self.server.config
+
+        if self.path != PLATE_READER_PATH:
+            self.reply(404, {"detail": "Not found."})
+            return
+
+        delay = random.lognormvariate(0, config["jitter"]) * config["latency"]
+        roll = random.random()
+        if roll < config["hang_rate"]:
+            # Longer than any sane read timeout
+            time.sleep(config["hang_seconds"])
+            self.reply(201, {"results": []})
+            return
+        time.sleep(delay)
+        roll -= config["hang_rate"]
+        if roll < config["error_rate"]:
+            self.reply(random.choice([429, 500, 502, 503]), {"detail": "Injected error"})
+            return
+
+        digest = hashlib.sha1(body).hexdigest().upper()
+        plate = "KA" + digest[:2] + "".join(c for c in digest if c.isdigit())[:4].ljust(4, "0")
+        self.reply(
+            201,
+            {
+                "processing_time": delay * 1000,
+                "results": [{"plate": plate.lower(), "score": 0.9}],
+            },
+        )
+
+    def reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client timed out and went away
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_server(
+    host="127.0.0.1",
+    port=0,
+    latency_ms=200,
+    jitter=0.3,
+    error_rate=0.0,
+    hang_rate=0.0,
+    hang_seconds=30.0,
+):
+    """Serve the mock API from a background thread; returns ``(server, url)``.
+
+    ``latency_ms`` is the median response time, spread log-normally by
+    ``jitter``. ``error_rate`` of the requests get a 429/5xx answer and
+    ``hang_rate`` take ``hang_seconds`` to answer. Stop with ``server.shutdown()``.
+    """
+    server = ThreadingHTTPServer((host, port), MockPlateHandler)
+    server.daemon_threads = True
+    server.config = {
+        "latency": latency_ms / 1000.0,
+        "jitter": jitter,
+        "error_rate": error_rate,
+        "hang_rate": hang_rate,
+        "hang_seconds": hang_seconds,
+    }
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}{PLATE_READER_PATH}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--hang-seconds", type=float, default=30.0)
+    args = parser.parse_args()
+
+    server, url = start_mock_server(
+        args.host,
+        args.port,
+        args.latency_ms,
+        args.jitter,
+        args.error_rate,
+        args.hang_rate,
+        args.hang_seconds,
+    )
+    print(f"[INFO] Mock plate reader listening on {url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Accuracy/latency trade-off of the INT8 model variants against FP32.
+
+Runs the full violation pipeline over the same images once per model format
+(FP32 PyTorch first, as the reference) and reports, for each variant:
+
+- per-image latency (mean/p50/p95 of ``process_image``) and speedup over FP32;
+- for each violation ("No Helmet", "Triple Riding"), how often the variant's
+  yes/no decision agrees with FP32's, and the images where it flips: a missed
+  violation (FP32 yes, variant no) or a false alarm (FP32 no, variant yes).
+
+Plates are not read, so the numbers cover only the models and the rules. Create
+the variants first (static INT8 is calibrated on a folder of our own images,
+ideally not the ones evaluated here):
+
+    python -m detect.quantization --calibration calibration_images
+    python -m benchmarks.quantization_report input_images --output quantization.json
+"""
+
+import argparse
+import json
+import os
+import time
+
+from benchmarks.compare_model_formats import load_frames
+from detect.model_registry import ModelRegistry
+from violation_detector import ViolationDetector
+
+VIOLATIONS = ("No Helmet", "Triple Riding")
+
+
+class NoPlateReader:
+    """Stands in for the plate reader, so the report never calls the API"""
+
+    def read_many(self, images):
+        return [None] * len(images)
+
+
+def run_variant(model_format, frames, coco_model_size):
+    """Per-image decisions and latencies of the pipeline in ``model_format``"""
+    detector = ViolationDetector(
+        registry=ModelRegistry(),
+        coco_model_size=coco_model_size,
+        model_format=model_format,
+        plate_cache_path=None,
+        result_cache=False,
+    )
+    detector.plate_reader = NoPlateReader()
+    detector.process_image(frames[0])  # warm
+    decisions, latencies = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        result = detector.process_image(frame)
+        latencies.append(time.perf_counter() - start)
+        decisions.append({name: name in result["violations"] for name in VIOLATIONS})
+    loaded = [
+        os.path.basename(detector.helmet_model.path),
+        os.path.basename(detector.coco_model.path),
+    ]
+    return decisions, latencies, loaded
+
+
+def compare(reference, decisions):
+    """Agreement with the FP32 decisions, per violation"""
+    report = {}
+    for name in VIOLATIONS:
+        missed = [i for i, (r, d) in enumerate(zip(reference, decisions)) if r[name] and not d[name]]
+        false_alarms = [
+            i for i, (r, d) in enumerate(zip(reference, decisions)) if d[name] and not r[name]
+        ]
+        report[name] = {
+            "fp32_positives": sum(r[name] for r in reference),
+            "positives": sum(d[name] for d in decisions),
+            "agreement": 1 - (len(missed) + len(false_alarms)) / len(reference),
+            "missed": missed,
+            "false_alarms": false_alarms,
+        }
+    return report
+
+
+def latency_summary(latencies):
+    latencies = sorted(latencies)
+    return {
+        "mean_ms": sum(latencies) / len(latencies) * 1e3,
+        "p50_ms": latencies[len(latencies) // 2] * 1e3,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1e3,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("folder", nargs="?", help="Folder of test images")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N random frames instead")
+    parser.add_argument(
+        "--formats", nargs="+", default=["int8-dynamic", "int8-static"],
+        help="Variants compared against pytorch (e.g. onnx int8-dynamic int8-static)",
+    )
+    parser.add_argument("--coco-model-size", default="m")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    if not args.folder and not args.synthetic:
+        parser.error("give a folder of images or --synthetic N")
+    frames = load_frames(args.folder, args.synthetic)
+    if not frames:
+        parser.error("no readable images")
+
+    reference = None
+    results = []
+    print(
+        f"{'format':>13} {'mean ms':>8} {'p50 ms':>7} {'p95 ms':>7} {'speedup':>8} "
+        f"{'helmet agree':>12} {'triple agree':>12} {'missed':>7} {'false':>6}"
+    )
+    for model_format in ["pytorch"] + [f for f in args.formats if f != "pytorch"]:
+        decisions, latencies, loaded = run_variant(model_format, frames, args.coco_model_size)
+        row = {"format": model_format, "loaded": loaded}
+        row.update(latency_summary(latencies))
+        if reference is None:
+            reference = (row["mean_ms"], decisions)
+        row["speedup"] = reference[0] / row["mean_ms"]
+        row["decisions"] = compare(reference[1], decisions)
+        results.append(row)
+
+        helmet, triple = (row["decisions"][name] for name in VIOLATIONS)
+        print(
+            f"{model_format:>13} {row['mean_ms']:>8.1f} {row['p50_ms']:>7.1f} "
+            f"{row['p95_ms']:>7.1f} {row['speedup']:>7.2f}x "
+            f"{helmet['agreement']:>12.1%} {triple['agreement']:>12.1%} "
+            f"{len(helmet['missed']) + len(triple['missed']):>7} "
+            f"{len(helmet['false_alarms']) + len(triple['false_alarms']):>6}"
+        )
+        if model_format != "pytorch" and any(name.endswith(".pt") for name in loaded):
+            print(f"[WARNING] {model_format} fell back to PyTorch for {loaded}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"images": len(frames), "variants": results}, f, indent=2)
+        print(f"[INFO] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
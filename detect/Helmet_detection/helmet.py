@@ -1,87 +1,192 @@
+import logging
+
 from ultralytics import YOLO
 import cv2
+import numpy as np
 from pathlib import Path
 import os
 
+from detect.object_detection import predict_batched, results_from_boxes
+
+logger = logging.getLogger(__name__)
+
 # Set class IDs based on your trained model
 RIDER_CLASS_ID = 0
 HELMET_CLASS_ID = 1
 
-
-def helmet_violation_in_image(model, image_path):
-    image = cv2.imread(image_path)
-    if image is None:
-        print(f"[ERROR] Cannot read image: {image_path}")
-        return
-
-    # Use lower confidence threshold to ensure helmets are detected
-    results = model(image, conf=0.25)
-    boxes = results[0].boxes
-
-    riders = []
-    helmets = []
-
-    for box in boxes:
-        cls_id = int(box.cls[0])
-        xyxy = box.xyxy[0].tolist()  # x1, y1, x2, y2
-
-        if cls_id == RIDER_CLASS_ID:
-            riders.append(xyxy)
-        elif cls_id == HELMET_CLASS_ID:
-            helmets.append(xyxy)
-
-    violation_detected = False
-
-    for rider_box in riders:
-        rider_x1, rider_y1, rider_x2, rider_y2 = rider_box
-        # Define a larger head region (top 1/2 instead of 1/3) to improve helmet association
-        rider_head_region = [
-            rider_x1,
-            rider_y1,
-            rider_x2,
-            rider_y1 + (rider_y2 - rider_y1) // 2,
-        ]  # top 1/2
-        print(f"Rider at coordinates: {rider_box}, head region: {rider_head_region}")
-
-        helmet_found = False
-        for helmet_box in helmets:
-            helmet_x1, helmet_y1, helmet_x2, helmet_y2 = helmet_box
-
-            # Check if helmet overlaps rider head region
-            # Calculate overlap area between helmet and head region
-            overlap_width = min(helmet_x2, rider_head_region[2]) - max(
-                helmet_x1, rider_head_region[0]
-            )
-            overlap_height = min(helmet_y2, rider_head_region[3]) - max(
-                helmet_y1, rider_head_region[1]
-            )
-
-            # Print debug information
-            print(
-                f"Checking helmet at {[helmet_x1, helmet_y1, helmet_x2, helmet_y2]} with rider head"
-            )
-
-            # Check if there's any overlap (more lenient criteria)
-            if overlap_width > 0 and overlap_height > 0:
-                helmet_found = True
-                break
-
-        if not helmet_found:
-            violation_detected = True
-            break  # One helmetless rider is enough to flag a violation
-
-    if violation_detected:
-        print("Helmet violation detected 🚫")
+# Use lower confidence threshold to ensure helmets are detected
+HELMET_CONFIDENCE = 0.25
+
+# ROI mode: the helmet model runs on a crop around each motorcycle instead of the
+# whole frame. The crop takes in the riders: the motorcycle box grown upwards by
+# ROI_EXPAND_UP and sideways by ROI_EXPAND_SIDE times its own height/width.
+ROI_EXPAND_UP = 1.5
+ROI_EXPAND_SIDE = 0.3
+# Crops are small, so a small input size keeps heads at the scale the model was
+# trained on while processing far fewer pixels than a full 640 frame
+ROI_IMAGE_SIZE = 320
+# Riders seen in two overlapping crops are merged at this IoU
+ROI_MERGE_IOU = 0.5
+
+
+def helmet_violation_in_image(model, image, motorcycle_boxes=None):
+    """Return True if any rider in the image has no helmet on their head.
+
+    ``image`` is an already decoded BGR frame or a path to read it from. Given
+    the ``motorcycle_boxes`` of the frame, only the crops around them are checked
+    (see ``predict_helmet_rois``).
+    """
+    if not isinstance(image, np.ndarray):
+        image_path = image
+        image = cv2.imread(image_path)
+        if image is None:
+            print(f"[ERROR] Cannot read image: {image_path}")
+            return
+
+    if motorcycle_boxes is not None:
+        rois = rider_rois(motorcycle_boxes, image.shape)
+        return helmet_violation_from_results(predict_helmet_rois(model, [image], [rois])[0])
+    results = model(image, conf=HELMET_CONFIDENCE)
+    return helmet_violation_from_results(results[0])
+
+
+def helmet_violation_from_results(results):
+    """Apply the helmet/head-overlap rule to one helmet-model result"""
+    if helmetless_riders(results):
+        logger.debug("Helmet violation detected 🚫")
         return True
     else:
-        print("Helmet violation not detected ✅")
+        logger.debug("Helmet violation not detected ✅")
         return False
 
 
+def helmetless_riders(results):
+    """Return the boxes of the riders with no helmet over their head region"""
+    return [rider["box"] for rider in rider_helmet_results(results) if not rider["helmet"]]
+
+
+def rider_helmet_results(results):
+    """Per-rider helmet matching for one helmet-model result (see ``match_helmets``)"""
+    boxes = results.boxes
+    return match_helmets(
+        boxes.xyxy.cpu().numpy(), boxes.cls.cpu().numpy(), boxes.conf.cpu().numpy()
+    )
+
+
+def match_helmets(xyxy, classes, confidences):
+    """Match every rider's head region against every helmet at once.
+
+    ``xyxy``, ``classes`` and ``confidences`` are the raw box arrays of one
+    helmet-model result. The head region is the top half of the rider box; a
+    rider is helmeted if any helmet box overlaps it at all. Returns one dict per
+    rider with its ``box``, ``confidence``, whether a ``helmet`` was found and the
+    best overlapping ``helmet_confidence`` (``None`` without a helmet).
+    """
+    xyxy = np.asarray(xyxy, dtype=np.float64).reshape(-1, 4)
+    classes = np.asarray(classes).astype(int)
+    confidences = np.asarray(confidences, dtype=np.float64)
+
+    riders = xyxy[classes == RIDER_CLASS_ID]
+    rider_confidences = confidences[classes == RIDER_CLASS_ID]
+    helmets = xyxy[classes == HELMET_CLASS_ID]
+    helmet_confidences = confidences[classes == HELMET_CLASS_ID]
+
+    # Define a larger head region (top 1/2 instead of 1/3) to improve helmet association
+    heads = riders.copy()
+    heads[:, 3] = riders[:, 1] + np.floor_divide(riders[:, 3] - riders[:, 1], 2)
+
+    # Overlap of every helmet with every rider head region (riders x helmets)
+    overlap_width = np.minimum(helmets[None, :, 2], heads[:, None, 2]) - np.maximum(
+        helmets[None, :, 0], heads[:, None, 0]
+    )
+    overlap_height = np.minimum(helmets[None, :, 3], heads[:, None, 3]) - np.maximum(
+        helmets[None, :, 1], heads[:, None, 1]
+    )
+    # Any overlap counts (lenient criteria)
+    overlaps = (overlap_width > 0) & (overlap_height > 0)
+    helmeted = overlaps.any(axis=1)
+    best_helmet = np.where(overlaps, helmet_confidences[None, :], -1.0).max(
+        axis=1, initial=-1.0
+    )
+
+    return [
+        {
+            "box": riders[i].tolist(),
+            "confidence": float(rider_confidences[i]),
+            "helmet": bool(helmeted[i]),
+            "helmet_confidence": float(best_helmet[i]) if helmeted[i] else None,
+        }
+        for i in range(len(riders))
+    ]
+
+
+def rider_rois(motorcycle_boxes, frame_shape, expand_up=ROI_EXPAND_UP, expand_side=ROI_EXPAND_SIDE):
+    """Integer (x1, y1, x2, y2) crops around each motorcycle, clipped to the frame"""
+    boxes = np.asarray(motorcycle_boxes, dtype=np.float64).reshape(-1, 4)
+    height, width = frame_shape[:2]
+    box_width = boxes[:, 2] - boxes[:, 0]
+    box_height = boxes[:, 3] - boxes[:, 1]
+    rois = np.stack(
+        [
+            boxes[:, 0] - box_width * expand_side,
+            boxes[:, 1] - box_height * expand_up,
+            boxes[:, 2] + box_width * expand_side,
+            boxes[:, 3],
+        ],
+        axis=1,
+    )
+    rois = np.clip(np.round(rois), 0, [width, height, width, height]).astype(int)
+    return [tuple(int(v) for v in roi) for roi in rois if roi[2] > roi[0] and roi[3] > roi[1]]
+
+
+def predict_helmet_rois(
+    model,
+    frames,
+    rois,
+    imgsz=ROI_IMAGE_SIZE,
+    batch_size=None,
+    conf=HELMET_CONFIDENCE,
+    merge_iou=ROI_MERGE_IOU,
+):
+    """Run the helmet model on the ``rois`` crops of each frame, all frames batched together.
+
+    Boxes are shifted back to frame coordinates, and the duplicates of riders
+    seen in two overlapping crops are merged by per-class NMS. Returns one
+    ultralytics ``Results`` per frame, like running the model on the frame, so
+    the helmet rules work the same on either.
+    """
+    crops = []
+    offsets = []
+    for index, (frame, frame_rois) in enumerate(zip(frames, rois)):
+        for x1, y1, x2, y2 in frame_rois:
+            crops.append(frame[y1:y2, x1:x2])
+            offsets.append((index, x1, y1))
+
+    detections = [[] for _ in frames]
+    crop_results = predict_batched(
+        model, crops, batch_size, imgsz=imgsz, conf=conf, verbose=False
+    )
+    for (index, x1, y1), result in zip(offsets, crop_results):
+        data = result.boxes.data.cpu().numpy()[:, :6].copy()
+        data[:, [0, 2]] += x1
+        data[:, [1, 3]] += y1
+        detections[index].append(data)
+
+    return [
+        results_from_boxes(
+            frame,
+            np.concatenate(parts) if parts else np.zeros((0, 6)),
+            model.names,
+            merge_iou,
+        )
+        for frame, parts in zip(frames, detections)
+    ]
+
+
 def main():
     # Use absolute path to find the model
-    model_path = # Use helmetBest.pt which is available
-    image_path = #give your image path
+    model_path = " "  # Use helmetBest.pt which is available
+    image_path = " "  # give your image path
 
     if not os.path.exists(model_path):
         print(f"[ERROR] Model not found at: {model_path}")
@@ -0,0 +1,183 @@
+import logging
+import re
+import threading
+
+import cv2
+import numpy as np
+
+from detect.frames import decode_image
+from detect.Licenseplate_detection.plate_reader import (
+    PlateReaderBackend,
+    PlateReaderError,
+    image_upload_bytes,
+)
+
+# OCR engines are optional; the local backend needs one of them
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+try:
+    import easyocr
+except ImportError:
+    easyocr = None
+
+logger = logging.getLogger(__name__)
+
+PLATE_CHARACTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+# Width / height of a plate's block of characters: two-line motorcycle plates
+# are close to 1.5, single-line plates up to about 8
+PLATE_ASPECT_RANGE = (1.2, 8.0)
+
+# A plate covers 0.5-40% of the vehicle crop
+PLATE_AREA_RANGE = (0.005, 0.4)
+
+# Plausible plate text once spaces and punctuation are stripped
+PLATE_TEXT_PATTERN = re.compile(r"^(?=.*[A-Z])(?=.*[0-9])[A-Z0-9]{4,10}$")
+
+# Height the plate crop is scaled to before OCR
+OCR_HEIGHT = 96
+
+
+def normalize_plate_text(text):
+    """Upper-case plate text with everything but letters and digits removed"""
+    return re.sub(r"[^A-Z0-9]", "", text.upper())
+
+
+def locate_plate_candidates(image, max_candidates=5):
+    """Plate-like regions of a vehicle crop, best first, as (x1, y1, x2, y2) boxes.
+
+    Plates are high-contrast rectangles of characters: a black-hat transform
+    brings out dark text on a light plate, a horizontal closing joins the
+    characters into one blob, and the blobs with a plate's aspect ratio and
+    relative size are kept, largest first.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    height, width = gray.shape
+    area = float(height * width)
+
+    kernel_width = max(3, width // 25)
+    blackhat = cv2.morphologyEx(
+        gray,
+        cv2.MORPH_BLACKHAT,
+        cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_width, kernel_width // 2 + 1)),
+    )
+    gradient = cv2.Sobel(blackhat, cv2.CV_32F, 1, 0, ksize=3)
+    gradient = cv2.convertScaleAbs(gradient)
+    gradient = cv2.GaussianBlur(gradient, (5, 5), 0)
+    gradient = cv2.morphologyEx(
+        gradient,
+        cv2.MORPH_CLOSE,
+        cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_width, 3)),
+    )
+    _, mask = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    mask = cv2.erode(mask, None, iterations=1)
+    mask = cv2.dilate(mask, None, iterations=2)
+
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    candidates = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if h == 0:
+            continue
+        aspect = w / h
+        relative_area = (w * h) / area
+        if (
+            PLATE_ASPECT_RANGE[0] <= aspect <= PLATE_ASPECT_RANGE[1]
+            and PLATE_AREA_RANGE[0] <= relative_area <= PLATE_AREA_RANGE[1]
+        ):
+            # Grow the character block a little so OCR sees whole characters
+            pad_x, pad_y = w // 10, h // 4
+            candidates.append(
+                (
+                    w * h,
+                    (
+                        max(0, x - pad_x),
+                        max(0, y - pad_y),
+                        min(width, x + w + pad_x),
+                        min(height, y + h + pad_y),
+                    ),
+                )
+            )
+    candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+    return [box for _, box in candidates[:max_candidates]]
+
+
+def prepare_for_ocr(plate):
+    """Grey, scaled to OCR_HEIGHT and Otsu-binarised to dark text on white"""
+    gray = cv2.cvtColor(plate, cv2.COLOR_BGR2GRAY) if plate.ndim == 3 else plate
+    scale = OCR_HEIGHT / gray.shape[0]
+    gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    if np.mean(binary) < 127:
+        # Light text on a dark plate
+        binary = cv2.bitwise_not(binary)
+    return cv2.copyMakeBorder(binary, 8, 8, 8, 8, cv2.BORDER_CONSTANT, value=255)
+
+
+class LocalPlateReader(PlateReaderBackend):
+    """Offline plate reader: plate localisation on the vehicle crop, then CPU OCR.
+
+    ``engine`` is ``"tesseract"`` (needs pytesseract and the tesseract binary),
+    ``"easyocr"`` or ``"auto"`` for whichever is installed. The plate candidates
+    from ``locate_plate_candidates`` are read in turn, and the first reading that
+    looks like a plate wins; when no candidate does, the whole crop is read as a
+    last resort.
+    """
+
+    name = "local"
+
+    def __init__(self, engine="auto", max_candidates=5, max_workers=2):
+        super().__init__(max_workers)
+        if engine not in ("auto", "tesseract", "easyocr"):
+            raise ValueError(f"Unknown OCR engine: {engine}")
+        if engine == "auto":
+            engine = "tesseract" if pytesseract is not None else "easyocr"
+        if engine == "tesseract" and pytesseract is None:
+            raise ImportError("The tesseract OCR engine needs: pip install pytesseract")
+        if engine == "easyocr" and easyocr is None:
+            raise ImportError(
+                "The local plate reader needs an OCR engine: "
+                "pip install pytesseract (plus the tesseract binary) or easyocr"
+            )
+        self.engine = engine
+        self.max_candidates = max_candidates
+        # One easyocr reader (a torch model) shared by the pool threads, which
+        # take turns with it: it is not safe to call from several at once
+        self._easyocr = None
+        self._easyocr_lock = threading.Lock()
+
+    def recognize(self, image):
+        """Plate text of an image path, encoded bytes or a BGR frame, or ``None``"""
+        if isinstance(image, np.ndarray):
+            frame = image
+        else:
+            frame = decode_image(image_upload_bytes(image))
+        if frame is None:
+            raise PlateReaderError("Could not decode the plate image")
+
+        boxes = locate_plate_candidates(frame, self.max_candidates)
+        height, width = frame.shape[:2]
+        for x1, y1, x2, y2 in boxes + [(0, 0, width, height)]:
+            text = normalize_plate_text(self._ocr(prepare_for_ocr(frame[y1:y2, x1:x2])))
+            if PLATE_TEXT_PATTERN.match(text):
+                logger.info(f"Detected plate: {text} (local {self.engine})")
+                return text
+
+        logger.info("No plate text extracted.")
+        return None
+
+    def _ocr(self, binary):
+        if self.engine == "tesseract":
+            # Block of text: two-line motorcycle plates read as one string
+            return pytesseract.image_to_string(
+                binary, config=f"--psm 6 -c tessedit_char_whitelist={PLATE_CHARACTERS}"
+            )
+        with self._easyocr_lock:
+            if self._easyocr is None:
+                self._easyocr = easyocr.Reader(["en"], gpu=False, verbose=False)
+            return "".join(
+                self._easyocr.readtext(binary, detail=0, allowlist=PLATE_CHARACTERS)
+            )
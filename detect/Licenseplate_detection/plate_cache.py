@@ -0,0 +1,220 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from detect.Licenseplate_detection.plate_reader import image_upload_bytes
+from detect.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# A week: plates do not change, but keep the table from growing forever
+DEFAULT_PLATE_CACHE_TTL = 7 * 24 * 3600
+
+
+def content_key(image):
+    """SHA-256 of an image's content: the encoded bytes, or the pixels of a frame"""
+    digest = hashlib.sha256()
+    if isinstance(image, np.ndarray):
+        digest.update(f"{image.shape}{image.dtype}".encode())
+        digest.update(np.ascontiguousarray(image).data)
+    else:
+        digest.update(image_upload_bytes(image))
+    return digest.hexdigest()
+
+
+class PlateCache:
+    """Plate reads keyed by image content hash, in an LRU memory tier over SQLite.
+
+    ``max_entries`` bounds the in-memory tier (least recently used out first);
+    ``max_disk_entries`` bounds the SQLite table the same way, using the last
+    lookup time. Entries older than ``ttl_seconds`` are treated as misses and
+    dropped. The SQLite file is shared by every process using the same
+    ``db_path``, so re-uploads are recognised across detection workers and
+    restarts; ``db_path=None`` keeps the cache in memory only.
+
+    A cached ``None`` means the API answered but found no plate; failed lookups
+    are never cached. Subclasses cache other text values in their own ``TABLE``
+    and ``VALUE_COLUMN`` (see ``detect.result_cache``).
+    """
+
+    TABLE = "plates"
+    VALUE_COLUMN = "plate"
+
+    def __init__(
+        self,
+        db_path=None,
+        max_entries=1024,
+        max_disk_entries=100_000,
+        ttl_seconds=DEFAULT_PLATE_CACHE_TTL,
+    ):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+        }
+        self._db = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, timeout=20, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.TABLE} ("
+                f"key TEXT PRIMARY KEY, {self.VALUE_COLUMN} TEXT, stored_at REAL, used_at REAL)"
+            )
+            self._db.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.TABLE}_used_at ON {self.TABLE} (used_at)"
+            )
+            self._db.commit()
+
+    def get(self, key):
+        """``(True, plate)`` for a cached read, ``(False, None)`` for a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                plate, stored_at = entry
+                if now - stored_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return True, plate
+                del self._memory[key]
+                self._stats["expired"] += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    f"SELECT {self.VALUE_COLUMN}, stored_at FROM {self.TABLE} WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row is not None:
+                    plate, stored_at = row
+                    if now - stored_at <= self.ttl_seconds:
+                        self._db.execute(
+                            f"UPDATE {self.TABLE} SET used_at = ? WHERE key = ?", (now, key)
+                        )
+                        self._db.commit()
+                        self._remember(key, plate, stored_at)
+                        self._stats["disk_hits"] += 1
+                        return True, plate
+                    self._db.execute(f"DELETE FROM {self.TABLE} WHERE key = ?", (key,))
+                    self._db.commit()
+                    self._stats["expired"] += 1
+
+            self._stats["misses"] += 1
+            return False, None
+
+    def put(self, key, plate):
+        now = time.time()
+        with self._lock:
+            self._remember(key, plate, now)
+            if self._db is not None:
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO {self.TABLE} "
+                    f"(key, {self.VALUE_COLUMN}, stored_at, used_at) VALUES (?, ?, ?, ?)",
+                    (key, plate, now, now),
+                )
+                excess = self._db.execute(f"SELECT COUNT(*) FROM {self.TABLE}").fetchone()[0]
+                excess -= self.max_disk_entries
+                if excess > 0:
+                    self._db.execute(
+                        f"DELETE FROM {self.TABLE} WHERE key IN "
+                        f"(SELECT key FROM {self.TABLE} ORDER BY used_at LIMIT ?)",
+                        (excess,),
+                    )
+                    self._stats["disk_evictions"] += excess
+                self._db.commit()
+
+    def _remember(self, key, plate, stored_at):
+        self._memory[key] = (plate, stored_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["memory_evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            if self._db is not None:
+                stats["disk_entries"] = self._db.execute(
+                    f"SELECT COUNT(*) FROM {self.TABLE}"
+                ).fetchone()[0]
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (
+            (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        )
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class CachedPlateReader:
+    """Reads plates through a ``PlateCache``, so each distinct image is read once.
+
+    Wraps any ``PlateReaderBackend`` and exposes the same ``read_plate``/``read_many``
+    interface.
+    """
+
+    def __init__(self, client, cache):
+        self.client = client
+        self.cache = cache
+
+    def read_plate(self, image):
+        return self.read_many([image])[0]
+
+    def read_many(self, images):
+        """Plates of several images in input order; the misses are read concurrently"""
+        images = list(images)
+        # Backends can read the same image differently, so they never share entries
+        keys = [f"{self.client.name}:{content_key(image)}" for image in images]
+        plates = {}
+        misses = {}
+        for key, image in zip(keys, images):
+            if key in plates or key in misses:
+                # The same image twice in one call is looked up once
+                continue
+            found, plate = self.cache.get(key)
+            metrics.inc("trafai_plate_cache_total", result="hit" if found else "miss")
+            if found:
+                plates[key] = plate
+            else:
+                misses[key] = image
+
+        for key, (ok, plate) in zip(
+            misses, self.client.map(self._lookup, misses.values())
+        ):
+            plates[key] = plate
+            if ok:
+                self.cache.put(key, plate)
+        return [plates[key] for key in keys]
+
+    def _lookup(self, image):
+        backend = self.client.name
+        try:
+            with metrics.span("plate_read", backend=backend):
+                plate = self.client.recognize(image)
+        except Exception as e:
+            logger.error(f"Plate lookup failed: {str(e)}")
+            metrics.inc("trafai_plate_reads_total", backend=backend, outcome="error")
+            return False, None
+        outcome = "read" if plate else "no_plate"
+        metrics.inc("trafai_plate_reads_total", backend=backend, outcome=outcome)
+        return True, plate
@@ -1,37 +1,212 @@
+import cv2
+import numpy as np
 import requests
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+PLATE_READER_URL = "https://api.platerecognizer.com/v1/plate-reader/"
+
+
+def image_upload_bytes(image):
+    """Encoded bytes to upload for an image given as a path, encoded bytes or a BGR frame"""
+    if isinstance(image, np.ndarray):
+        ok, buffer = cv2.imencode(".jpg", image)
+        if not ok:
+            raise ValueError("Could not encode image as JPEG")
+        return buffer.tobytes()
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return bytes(image)
+    with open(image, "rb") as img_file:
+        return img_file.read()
+
+
+class PlateReaderError(Exception):
+    """The plate lookup failed (network error, timeout or error answer)"""
+
+
+class PlateReaderBackend:
+    """Interface of a plate reader: ``recognize`` one image, or many concurrently.
+
+    Subclasses implement ``recognize``, returning the plate text or ``None`` when
+    there is no plate and raising ``PlateReaderError`` when the read itself
+    failed. ``name`` identifies the backend in configuration and cache keys.
+    """
+
+    name = None
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def recognize(self, image):
+        raise NotImplementedError
+
+    def read_plate(self, image):
+        """Plate text of an image path, encoded bytes or a BGR frame, or ``None``"""
+        try:
+            return self.recognize(image)
+        except PlateReaderError as e:
+            logger.error(str(e))
+        except Exception as e:
+            logger.error(f"Exception during plate read: {str(e)}")
+        return None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="plate-reader"
+                )
+            return self._executor
+
+    def map(self, function, images):
+        """Apply ``function`` to every image on the backend's thread pool, in input order"""
+        images = list(images)
+        if len(images) <= 1:
+            return [function(image) for image in images]
+        return list(self._get_executor().map(function, images))
+
+    def submit(self, image):
+        """Start reading an image in the background and return its Future"""
+        return self._get_executor().submit(self.read_plate, image)
+
+    def read_many(self, images):
+        """Read several images concurrently; returns the plates in input order"""
+        return self.map(self.read_plate, images)
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
 
-def extract_plate_text_from_api(image_path, api_token):
-    url = "https://api.platerecognizer.com/v1/plate-reader/"
-    headers = {"Authorization": f"Token {api_token}"}
+    def __enter__(self):
+        return self
 
-    try:
-        with open(image_path, "rb") as img_file:
-            response = requests.post(url, files={"upload": img_file}, headers=headers)
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class PlateRecognizerClient(PlateReaderBackend):
+    """Plate Recognizer API client with a pooled session, timeouts and bounded retries.
+
+    The session keeps connections to the API open between calls. Every request
+    is bounded by ``connect_timeout`` and ``read_timeout``; connection failures
+    and 429/5xx answers are retried up to ``retries`` times with exponential
+    backoff (honouring ``Retry-After``). Read timeouts are not retried, since the
+    API may already have processed, and billed, the lookup. ``read_many`` reads
+    several images concurrently on a pool of ``max_workers`` threads.
+    """
+
+    name = "cloud"
+
+    def __init__(
+        self,
+        api_token,
+        url=PLATE_READER_URL,
+        connect_timeout=3.05,
+        read_timeout=10.0,
+        retries=2,
+        backoff_factor=0.5,
+        max_workers=4,
+    ):
+        super().__init__(max_workers)
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Token {api_token}"
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({"POST"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        # One connection per concurrent worker, so read_many never queues on the pool
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=max_workers, max_retries=retry
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def recognize(self, image):
+        """Plate text of an image path, encoded bytes or a BGR frame.
+
+        Returns ``None`` when the API found no plate and raises ``PlateReaderError``
+        when the lookup itself failed, so callers can tell the two apart.
+        """
+        upload = image_upload_bytes(image)
+        try:
+            response = self.session.post(
+                self.url, files={"upload": ("image.jpg", upload)}, timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            raise PlateReaderError(f"Exception during API request: {str(e)}") from e
 
         # Accept both 200 (OK) and 201 (Created) as success
         if response.status_code not in (200, 201):
-            logger.error(f"API request failed: {response.status_code} {response.text}")
-            return None
+            raise PlateReaderError(
+                f"API request failed: {response.status_code} {response.text[:200]}"
+            )
 
         result = response.json()
-        logger.info(f"API response: {result}")
+        logger.debug(f"API response: {result}")
 
         if result["results"]:
             plate_text = result["results"][0]["plate"].upper()
             confidence = result["results"][0]["score"]
             logger.info(f"Detected plate: {plate_text} (confidence: {confidence:.2f})")
-            print(f"Detected plate: {plate_text} (confidence: {confidence:.2f})")
             return plate_text
 
         logger.info("No plate text extracted.")
-        print("No license plate detected.")
         return None
 
-    except Exception as e:
-        logger.error(f"Exception during API request: {str(e)}")
-        return None
+    def close(self):
+        super().close()
+        self.session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_plate_client(api_token):
+    """Process-wide client for an API token, so every caller shares its connection pool"""
+    with _clients_lock:
+        client = _clients.get(api_token)
+        if client is None:
+            client = PlateRecognizerClient(api_token)
+            _clients[api_token] = client
+        return client
+
+
+def create_plate_backend(name, api_token=None):
+    """Plate reader backend for a configuration name.
+
+    ``"cloud"`` is the shared Plate Recognizer client for ``api_token``;
+    ``"local"`` reads plates offline with OCR (see ``local_reader``).
+    """
+    if name == "cloud":
+        return get_plate_client(api_token)
+    if name == "local":
+        from detect.Licenseplate_detection.local_reader import LocalPlateReader
+
+        return LocalPlateReader()
+    raise ValueError(f"Unknown plate reader backend: {name}")
+
+
+def extract_plate_text_from_api(image, api_token):
+    """Read the plate text from an image path, encoded bytes or a BGR frame"""
+    return get_plate_client(api_token).read_plate(image)
@@ -1,31 +1,133 @@
+import logging
+
 import cv2
 import numpy as np
-from ultralytics import YOLO
 import supervision as sv
 import os
 from PIL import Image
 
+from detect.geometry import nms_indices
+from detect.model_registry import registry
+from detect.object_detection import (
+    MOTORCYCLE_CLASS_ID,
+    PERSON_CLASS_ID,
+    detections_from_results,
+    filter_detections,
+)
+from detect.preprocess import Preprocessor
+
+logger = logging.getLogger(__name__)
+
+# A person counts as a rider of a motorcycle if their centres are closer than this
+# many times the motorcycle's larger side...
+RIDER_DISTANCE_FACTOR = 2.0
+# ...or if they overlap it by more than this fraction, vertically or horizontally
+RIDER_OVERLAP_RATIO = 0.1
+
+
+def associate_riders(
+    motorcycles,
+    people,
+    exclusive=True,
+    distance_factor=RIDER_DISTANCE_FACTOR,
+    overlap_ratio=RIDER_OVERLAP_RATIO,
+):
+    """Return a motorcycles x people boolean matrix of rider assignments.
+
+    Distances and overlap ratios for every pair are computed in one vectorized
+    step. With ``exclusive`` each person rides at most one motorcycle: the
+    eligible one whose centre is nearest relative to its distance threshold, so
+    nobody is counted twice on neighbouring motorcycles.
+    """
+    motorcycles = np.asarray(motorcycles, dtype=np.float32).reshape(-1, 4)
+    people = np.asarray(people, dtype=np.float32).reshape(-1, 4)
+    if len(motorcycles) == 0 or len(people) == 0:
+        return np.zeros((len(motorcycles), len(people)), dtype=bool)
+
+    m = motorcycles[:, None, :]
+    p = people[None, :, :]
+    motorcycle_width = m[..., 2] - m[..., 0]
+    motorcycle_height = m[..., 3] - m[..., 1]
+    person_width = p[..., 2] - p[..., 0]
+    person_height = p[..., 3] - p[..., 1]
+
+    # Distance from person center to motorcycle center, against a lenient
+    # threshold based on motorcycle size
+    distance = np.hypot(
+        (p[..., 0] + p[..., 2]) / 2 - (m[..., 0] + m[..., 2]) / 2,
+        (p[..., 1] + p[..., 3]) / 2 - (m[..., 1] + m[..., 3]) / 2,
+    )
+    distance_threshold = np.maximum(motorcycle_width, motorcycle_height) * distance_factor
+
+    # Vertical and horizontal overlap relative to the smaller box
+    vertical_overlap = np.minimum(p[..., 3], m[..., 3]) - np.maximum(p[..., 1], m[..., 1])
+    horizontal_overlap = np.minimum(p[..., 2], m[..., 2]) - np.maximum(p[..., 0], m[..., 0])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vertical_ratio = vertical_overlap / np.minimum(person_height, motorcycle_height)
+        horizontal_ratio = horizontal_overlap / np.minimum(person_width, motorcycle_width)
+        relative_distance = distance / distance_threshold
+
+    eligible = (
+        (distance < distance_threshold)
+        | (vertical_ratio > overlap_ratio)
+        | (horizontal_ratio > overlap_ratio)
+    )
+    if not exclusive:
+        return eligible
+
+    # Each person goes to their nearest eligible motorcycle
+    cost = np.where(eligible, np.nan_to_num(relative_distance, nan=np.inf), np.inf)
+    nearest = np.argmin(cost, axis=0)
+    columns = np.arange(len(people))
+    assignment = np.zeros_like(eligible)
+    assignment[nearest, columns] = eligible[nearest, columns]
+    return assignment
+
 
 class TripleRiderDetector:
-    def __init__(self, confidence=0.35, iou=0.3, model_size="m"):
+    def __init__(
+        self,
+        confidence=0.35,
+        iou=0.3,
+        model_size="m",
+        model=None,
+        exclusive_riders=True,
+        model_format="pytorch",
+        preprocessor=None,
+    ):
         self.confidence = confidence
         self.iou = iou
-
-        # Initialize YOLO model based on size
-        try:
-            model_dir = os.path.dirname(os.path.abspath(__file__))
-            model_path = os.path.join(model_dir, f"yolov8{model_size}.pt")
-            print(f"Loading YOLO model: {model_path}")
-            self.model = YOLO(model_path)
-        except Exception as e:
-            print(f"Error loading model: {e}")
-            print("Attempting alternative loading method...")
-            os.environ["TORCH_WEIGHTS_ONLY"] = "true"
-            self.model = YOLO(model_path)
-
+        # Count each person as a rider of one motorcycle at most
+        self.exclusive_riders = exclusive_riders
+        # CLAHE and sharpening by default (see detect.preprocess)
+        self.preprocessor = preprocessor or Preprocessor()
+
+        # Reuse an already loaded (shared) model when one is given
+        if model is not None:
+            self.model = model
+        else:
+            self.model = self.load_model(model_size, model_format)
+
+        # Tracker for callers feeding frames of a single video to detect_triple_riders
         self.tracker = sv.ByteTrack()
         self.box_annotator = sv.BoxAnnotator(thickness=2)
 
+    @staticmethod
+    def model_path(model_size="m"):
+        """Path of the COCO YOLO checkpoint of the given size stored next to this file"""
+        model_dir = os.path.dirname(os.path.abspath(__file__))
+        return os.path.join(model_dir, f"yolov8{model_size}.pt")
+
+    @classmethod
+    def load_model(cls, model_size="m", model_format="pytorch"):
+        """The shared COCO YOLO model of the given size, from the model registry.
+
+        ``model_format`` ``"onnx"`` or ``"openvino"`` serves an export of the
+        checkpoint; the registry falls back to the checkpoint when it cannot be
+        exported or loaded (see ``ModelRegistry.get_model``).
+        """
+        return registry.get_model(cls.model_path(model_size), model_format)
+
     def calculate_overlap(self, box1, box2):
         """Calculate IoU between two bounding boxes"""
         x1 = max(box1[0], box2[0])
@@ -45,233 +147,136 @@ class TripleRiderDetector:
         return iou
 
     def filter_overlapping_detections(self, boxes, scores, classes, iou_threshold=0.4):
-        """Filter out overlapping detections keeping the ones with higher confidence"""
-        indices = []
-
-        # Convert to numpy arrays if they aren't already
-        boxes = np.array(boxes)
-        scores = np.array(scores)
-
-        print(f"\nFiltering {len(boxes)} detections with IoU threshold {iou_threshold}")
-
-        # Get indices sorted by score
-        score_indices = np.argsort(scores)[::-1]
-
-        while len(score_indices) > 0:
-            # Keep the current highest scoring box
-            current_index = score_indices[0]
-            indices.append(current_index)
-
-            # Calculate IoU of the kept box with the rest
-            ious = [
-                self.calculate_overlap(boxes[current_index], boxes[i])
-                for i in score_indices[1:]
-            ]
-
-            # Print debug information
-            print(
-                f"\nKeeping box {current_index} with score {scores[current_index]:.2f}"
-            )
-            print(f"Box coordinates: {boxes[current_index]}")
-
-            # Filter out boxes with high IoU
-            filtered_indices = []
-            for i, iou in zip(score_indices[1:], ious):
-                if iou < iou_threshold:
-                    filtered_indices.append(i)
-                else:
-                    print(
-                        f"Filtering out box {i} with IoU {iou:.2f} and score {scores[i]:.2f}"
-                    )
-
-            score_indices = filtered_indices
-
-        print(f"After filtering: {len(indices)} detections remain")
+        """Filter out overlapping detections keeping the ones with higher confidence
+
+        Same keep semantics as a greedy loop over ``calculate_overlap``, but the IoU
+        of every pair is computed in one vectorized step.
+        """
+        logger.debug("Filtering %d detections with IoU threshold %s", len(boxes), iou_threshold)
+        indices = nms_indices(boxes, scores, iou_threshold)
+        logger.debug("After filtering: %d detections remain", len(indices))
         return indices
 
-    def detect_triple_riders(self, frame):
-        """Detect triple riders in a frame and return if violation detected"""
-        print("Running YOLO detection...")
-        # Run detection with different confidence thresholds for persons and motorcycles
+    def run_detection(self, frame):
+        """Run the COCO model for persons and motorcycles only"""
+        logger.debug("Running YOLO detection")
         # Use a lower confidence threshold to ensure we detect all potential riders
-        results = self.model(frame, classes=[0, 3], conf=self.confidence)[0]
-        print(f"YOLO detection completed. Found {len(results.boxes)} objects")
-
-        # Flag to track if violations were detected
-        violations_detected = False
+        results = self.model(
+            frame, classes=[PERSON_CLASS_ID, MOTORCYCLE_CLASS_ID], conf=self.confidence
+        )[0]
+        logger.debug("YOLO detection completed. Found %d objects", len(results.boxes))
 
         # Convert YOLO results to supervision Detections format
-        detections = sv.Detections(
-            xyxy=results.boxes.xyxy.cpu().numpy(),
-            confidence=results.boxes.conf.cpu().numpy(),
-            class_id=results.boxes.cls.cpu().numpy().astype(int),
-        )
+        return detections_from_results(results)
 
-        if len(detections) == 0:
-            print("No objects detected in the frame")
-            return False
+    def detect_triple_riders(self, frame, detections=None, tracker=None):
+        """Detect triple riders in a frame and return if violation detected"""
+        return len(self.find_triple_riders(frame, detections, tracker)) > 0
+
+    def find_triple_riders(self, frame, detections=None, tracker=None):
+        """Return the triple riding violations in a frame.
+
+        Each violation is a dict with the motorcycle ``box``, its ``confidence``,
+        its ``tracker_id`` (``None`` unless the detections are tracked) and the
+        ``riders`` boxes.
+
+        ``detections`` may come from a shared COCO pass over the same frame, in which
+        case only persons and motorcycles at or above ``self.confidence`` are used and
+        the model is not run again. Objects are only tracked for video frames, with
+        the ``tracker`` (e.g. ``sv.ByteTrack``) of the stream the frame belongs to;
+        a still image has no previous frame to associate with.
+        """
+        if detections is None:
+            detections = self.run_detection(frame)
+        else:
+            detections = filter_detections(
+                detections, [PERSON_CLASS_ID, MOTORCYCLE_CLASS_ID], self.confidence
+            )
 
-        print(f"Detected {len(detections)} objects before filtering.")
-
-        # Track objects
-        detections = self.tracker.update_with_detections(detections)
-        print("Object tracking completed")
-
-        # Extract motorcycle and people boxes with scores
-        motorcycles = []
-        motorcycles_scores = []
-        people = []
-        people_scores = []
-
-        for i, (xyxy, conf, class_id) in enumerate(
-            zip(detections.xyxy, detections.confidence, detections.class_id)
-        ):
-            # Person class_id = 0, Motorcycle class_id = 3
-            if class_id == 0:  # Person
-                people.append(xyxy)
-                people_scores.append(conf)
-            elif class_id == 3:  # Motorcycle
-                motorcycles.append(xyxy)
-                motorcycles_scores.append(conf)
-
-        print(
-            f"Initial detection: {len(people)} people and {len(motorcycles)} motorcycles"
+        if len(detections) == 0:
+            logger.debug("No objects detected in the frame")
+            return []
+
+        logger.debug("Detected %d objects before filtering", len(detections))
+
+        if tracker is not None:
+            # Track objects
+            detections = tracker.update_with_detections(detections)
+            logger.debug("Object tracking completed")
+
+        # Split motorcycles and people
+        boxes = detections.xyxy
+        scores = detections.confidence
+        tracker_ids = detections.tracker_id
+        people_mask = detections.class_id == PERSON_CLASS_ID
+        people = boxes[people_mask]
+        people_scores = scores[people_mask]
+        motorcycle_indices = np.flatnonzero(detections.class_id == MOTORCYCLE_CLASS_ID)
+
+        logger.debug(
+            "Initial detection: %d people and %d motorcycles",
+            len(people),
+            len(motorcycle_indices),
         )
 
         # Filter out overlapping motorcycles using IoU
-        if len(motorcycles) > 1:
-            motorcycles_indices = self.filter_overlapping_detections(
-                motorcycles, motorcycles_scores, [3] * len(motorcycles), self.iou
+        if len(motorcycle_indices) > 1:
+            keep = self.filter_overlapping_detections(
+                boxes[motorcycle_indices],
+                scores[motorcycle_indices],
+                [MOTORCYCLE_CLASS_ID] * len(motorcycle_indices),
+                self.iou,
             )
-            motorcycles = [motorcycles[i] for i in motorcycles_indices]
-            motorcycles_scores = [motorcycles_scores[i] for i in motorcycles_indices]
+            motorcycle_indices = motorcycle_indices[keep]
 
-        print(
-            f"After motorcycle filtering: {len(people)} people and {len(motorcycles)} motorcycles"
+        logger.debug(
+            "After motorcycle filtering: %d people and %d motorcycles",
+            len(people),
+            len(motorcycle_indices),
         )
 
+        # Every motorcycle x person pair at once
+        assignment = associate_riders(
+            boxes[motorcycle_indices], people, exclusive=self.exclusive_riders
+        )
+        rider_counts = assignment.sum(axis=1)
+
         # Store violations for annotation
         violations = []
-        for motorcycle in motorcycles:
-            riders = []
-            motorcycle_center = (
-                (motorcycle[0] + motorcycle[2]) / 2,
-                (motorcycle[1] + motorcycle[3]) / 2,
+        # Only flag as a violation if 3 or more riders are detected
+        for row in np.flatnonzero(rider_counts >= 3):
+            index = motorcycle_indices[row]
+            # Riders sorted by confidence score
+            riders = np.flatnonzero(assignment[row])
+            riders = riders[np.argsort(-people_scores[riders], kind="stable")]
+            violations.append(
+                {
+                    "box": boxes[index],
+                    "confidence": float(scores[index]),
+                    "tracker_id": (
+                        None if tracker_ids is None else int(tracker_ids[index])
+                    ),
+                    "riders": list(people[riders]),
+                }
             )
-            motorcycle_width = motorcycle[2] - motorcycle[0]
-            motorcycle_height = motorcycle[3] - motorcycle[1]
+            logger.debug("VIOLATION DETECTED: TRIPLE RIDING with %d riders", len(riders))
 
-            print(
-                f"\nChecking motorcycle at {motorcycle_center} with size {motorcycle_width}x{motorcycle_height}"
-            )
-
-            # Sort people by their vertical position (top to bottom)
-            sorted_people = sorted(
-                enumerate(people), key=lambda x: x[1][1]
-            )  # Sort by y-coordinate
-            print(f"People sorted by vertical position: {len(sorted_people)}")
-
-            for idx, person in sorted_people:
-                person_center = (
-                    (person[0] + person[2]) / 2,
-                    (person[1] + person[3]) / 2,
-                )
-                person_height = person[3] - person[1]
-                person_width = person[2] - person[0]
-
-                # Calculate distance from person center to motorcycle center
-                distance = np.sqrt(
-                    (person_center[0] - motorcycle_center[0]) ** 2
-                    + (person_center[1] - motorcycle_center[1]) ** 2
-                )
-
-                # More lenient distance threshold based on motorcycle size
-                distance_threshold = (
-                    max(motorcycle_width, motorcycle_height) * 2.0
-                )  # 100% more lenient
-
-                # Calculate vertical overlap
-                vertical_overlap = min(person[3], motorcycle[3]) - max(
-                    person[1], motorcycle[1]
-                )
-                vertical_ratio = vertical_overlap / min(
-                    person_height, motorcycle_height
-                )
-
-                # Calculate horizontal overlap
-                horizontal_overlap = min(person[2], motorcycle[2]) - max(
-                    person[0], motorcycle[0]
-                )
-                horizontal_ratio = horizontal_overlap / min(
-                    person_width, motorcycle_width
-                )
-
-                print(f"\nPerson {idx} at {person_center}:")
-                print(
-                    f"  Distance: {distance:.2f}, threshold: {distance_threshold:.2f}"
-                )
-                print(f"  Vertical ratio: {vertical_ratio:.2f}")
-                print(f"  Horizontal ratio: {horizontal_ratio:.2f}")
-                print(f"  Confidence: {people_scores[idx]:.2f}")
-
-                # Consider a person as a rider if they meet any of these criteria:
-                # Make criteria more lenient to detect all riders
-                if (
-                    distance < distance_threshold
-                    or vertical_ratio > 0.1
-                    or horizontal_ratio > 0.1
-                ):
-                    riders.append((person, people_scores[idx]))
-                    print(f"  Added as rider!")
-                else:
-                    print(f"  Not considered a rider")
-
-            print(f"\nFound {len(riders)} riders for this motorcycle")
-
-            # Sort riders by confidence score
-            riders.sort(key=lambda x: x[1], reverse=True)
-
-            # Only flag as a violation if 3 or more riders are detected
-            if len(riders) >= 3:  # Triple riding requires 3+ riders
-                violations.append((motorcycle, [r[0] for r in riders]))
-                print(f"Violation detected with {len(riders)} riders!")
-                # Set violation detected flag
-                violations_detected = True
-
-                # For debugging only
-                violation_type = "TRIPLE RIDING"
-                print(f"VIOLATION DETECTED: {violation_type} with {len(riders)} riders")
-
-        return violations_detected
+        return violations
 
     def preprocess_image(self, image):
-        """Apply preprocessing to enhance image quality while preserving color channels"""
-        # Create a copy of the original image
-        enhanced = image.copy()
-
-        # Split the image into its BGR channels
-        b, g, r = cv2.split(enhanced)
+        """Apply preprocessing to enhance image quality while preserving color channels.
 
-        # Apply CLAHE for contrast enhancement on each channel
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        b = clahe.apply(b)
-        g = clahe.apply(g)
-        r = clahe.apply(r)
+        Returns a new array; batch callers use ``self.preprocessor`` directly to
+        work in its reused buffers instead.
+        """
+        return self.preprocessor(image, copy=True)
 
-        # Merge the enhanced channels back
-        enhanced = cv2.merge([b, g, r])
-
-        # Apply slight sharpening filter
-        kernel = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]])
-        enhanced = cv2.filter2D(enhanced, -1, kernel)
-
-        # Ensure output image has 3 channels as required by YOLO
-        if len(enhanced.shape) == 2 or enhanced.shape[2] != 3:
-            print("Warning: Converting image to ensure 3 channels")
-            if len(enhanced.shape) == 2:  # If somehow it's grayscale
-                enhanced = cv2.cvtColor(enhanced, cv2.COLOR_GRAY2BGR)
+    def has_triple_riding_violation(self, image):
+        """Check an already decoded BGR frame for triple riding violations"""
+        image = self.preprocess_image(image)
 
-        return enhanced
+        # Detect violations and return the result (True if violation detected, False otherwise)
+        return self.detect_triple_riders(image)
 
     def has_triple_riding_violation_from_path(self, image_path):
         """Check if there are triple riding violations in an image and return True/False"""
@@ -284,10 +289,7 @@ class TripleRiderDetector:
             print(f"Error: Image not found at {image_path}")
             return False
 
-        image = self.preprocess_image(image)
-
-        # Detect violations and return the result (True if violation detected, False otherwise)
-        return self.detect_triple_riders(image)
+        return self.has_triple_riding_violation(image)
 
 
 if __name__ == "__main__":
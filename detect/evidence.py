@@ -0,0 +1,172 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import cv2
+
+from detect.frames import encode_jpeg
+
+logger = logging.getLogger(__name__)
+
+# Box colours (BGR): boxes carrying a violation, riders with a helmet, the rest
+VIOLATION_COLOR = (0, 0, 255)
+HELMET_COLOR = (0, 200, 0)
+DEFAULT_COLOR = (255, 160, 0)
+# Rendered evidence kept on disk before the least recently viewed is evicted
+DEFAULT_EVIDENCE_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def evidence_detections(result):
+    """The boxes of a detection result to draw on its evidence image.
+
+    One JSON-serialisable dict per box with its ``box``, ``class_name``,
+    ``confidence`` and ``tags``: the violations it carries. Vehicles are tagged
+    with the violations of their plate region, riders without a helmet with
+    "No Helmet"; a violating rider on no detected vehicle adds its region.
+    """
+    regions = {tuple(region["box"]): region for region in result["plates"] if region["box"]}
+    detections = []
+    for vehicle in result["vehicles"]:
+        region = regions.pop(tuple(vehicle["box"]), None)
+        detections.append(
+            {
+                "box": vehicle["box"],
+                "class_name": vehicle["class_name"],
+                "confidence": vehicle["confidence"],
+                "tags": list(region["violations"]) if region else [],
+            }
+        )
+    for rider in result["riders"]:
+        detections.append(
+            {
+                "box": [float(v) for v in rider["box"]],
+                "class_name": "rider" if rider["helmet"] else "rider (no helmet)",
+                "confidence": rider["confidence"],
+                "tags": [] if rider["helmet"] else ["No Helmet"],
+                "helmet": rider["helmet"],
+            }
+        )
+    for box, region in regions.items():
+        detections.append(
+            {
+                "box": list(box),
+                "class_name": "violation",
+                "confidence": None,
+                "tags": list(region["violations"]),
+            }
+        )
+    return detections
+
+
+def render_evidence(frame, detections, scale=1.0):
+    """Return a copy of the frame with the detections drawn on it.
+
+    ``scale`` maps the boxes onto a resized copy of the frame they were found in.
+    """
+    image = frame.copy()
+    for detection in detections:
+        x1, y1, x2, y2 = (int(v * scale) for v in detection["box"])
+        if detection["tags"]:
+            color = VIOLATION_COLOR
+        elif detection.get("helmet"):
+            color = HELMET_COLOR
+        else:
+            color = DEFAULT_COLOR
+        label = detection["class_name"]
+        if detection["confidence"] is not None:
+            label += f" ({detection['confidence']:.2f})"
+        if detection["tags"]:
+            label += ": " + ", ".join(detection["tags"])
+        cv2.rectangle(image, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(
+            image, label, (x1, max(y1 - 10, 15)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2
+        )
+    return image
+
+
+def evidence_name(image_digest, detections):
+    """File name of the evidence image of these detections on this image content"""
+    digest = hashlib.sha256(image_digest.encode())
+    digest.update(json.dumps(detections, sort_keys=True).encode())
+    return f"{digest.hexdigest()}.jpg"
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """SHA-256 of a file's content, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class EvidenceCache:
+    """Annotated evidence images, rendered on first view and kept within a size budget.
+
+    An image is named after its source content and detections (``evidence_name``),
+    so every process rendering the same evidence writes the same file and a view
+    after a change of detections never gets a stale one. A hit only touches the
+    file's modification time; after each render the least recently viewed files
+    are deleted until the directory is back under ``max_bytes``.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_EVIDENCE_CACHE_BYTES):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def get(self, image_digest, detections, load_frame, original_width=None):
+        """Path of the evidence image, rendering it from ``load_frame()`` on a miss.
+
+        ``original_width`` is the width of the frame the detections were found in,
+        when ``load_frame`` returns a resized copy. Returns ``None`` when the frame
+        cannot be loaded.
+        """
+        path = os.path.join(self.directory, evidence_name(image_digest, detections))
+        try:
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            pass
+
+        frame = load_frame()
+        if frame is None:
+            return None
+        scale = frame.shape[1] / original_width if original_width else 1.0
+        data = encode_jpeg(render_evidence(frame, detections, scale))
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep=None):
+        """Delete the least recently viewed images until the cache fits its budget"""
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if not entry.name.endswith(".jpg"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                logger.debug("Evicted evidence image %s", path)
@@ -0,0 +1,89 @@
+import os
+
+import cv2
+import numpy as np
+
+DEFAULT_JPEG_QUALITY = 95
+
+
+def read_image(source):
+    """Decode ``source`` once and return ``(frame, encoded)``.
+
+    ``source`` may be an already decoded BGR ndarray, raw encoded bytes, a
+    file-like object (including Django uploads) or a path. ``encoded`` holds the
+    original encoded bytes so later stages (the plate API) can reuse them without
+    touching the disk or re-encoding; it is ``None`` when an ndarray was given.
+    ``frame`` is ``None`` when the data cannot be decoded.
+    """
+    if isinstance(source, np.ndarray):
+        return source, None
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        encoded = bytes(source)
+    elif hasattr(source, "chunks"):
+        # Django UploadedFile: reads from memory for in-memory uploads
+        encoded = b"".join(source.chunks())
+    elif hasattr(source, "read"):
+        encoded = source.read()
+    else:
+        if not os.path.exists(source):
+            return None, None
+        with open(source, "rb") as f:
+            encoded = f.read()
+
+    return decode_image(encoded), encoded
+
+
+def decode_image(encoded):
+    """Decode encoded image bytes into a BGR frame (``None`` if undecodable)"""
+    if not encoded:
+        return None
+    return cv2.imdecode(np.frombuffer(encoded, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def encode_jpeg(frame, quality=DEFAULT_JPEG_QUALITY):
+    """Encode a BGR frame as JPEG bytes in memory"""
+    ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Could not encode frame as JPEG")
+    return buffer.tobytes()
+
+
+def crop_box(frame, box, padding=0.0):
+    """Crop ``box`` (x1, y1, x2, y2) out of a frame.
+
+    The box is grown by ``padding`` times its width/height on every side and
+    clipped to the frame. Returns a view, not a copy.
+    """
+    height, width = frame.shape[:2]
+    x1, y1, x2, y2 = (float(v) for v in box)
+    pad_x = (x2 - x1) * padding
+    pad_y = (y2 - y1) * padding
+    x1 = max(0, int(x1 - pad_x))
+    y1 = max(0, int(y1 - pad_y))
+    x2 = min(width, int(np.ceil(x2 + pad_x)))
+    y2 = min(height, int(np.ceil(y2 + pad_y)))
+    return frame[y1:y2, x1:x2]
+
+
+def encode_region(frame, box, padding=0.15, max_side=1024, quality=90):
+    """JPEG bytes of a padded crop of ``frame``, downscaled to at most ``max_side`` pixels.
+
+    Used to upload just a vehicle instead of a full (possibly 4K) frame.
+    """
+    crop = crop_box(frame, box, padding)
+    if crop.size == 0:
+        raise ValueError(f"Empty crop for box {box}")
+    return encode_jpeg(fit_within(crop, max_side), quality)
+
+
+def fit_within(frame, max_side):
+    """``frame`` downscaled so its longer side is at most ``max_side`` (never upscaled)"""
+    scale = max_side / max(frame.shape[:2])
+    if scale >= 1:
+        return frame
+    return cv2.resize(
+        frame,
+        (max(1, round(frame.shape[1] * scale)), max(1, round(frame.shape[0] * scale))),
+        interpolation=cv2.INTER_AREA,
+    )
@@ -0,0 +1,79 @@
+import numpy as np
+
+
+def box_iou_matrix(boxes_a, boxes_b):
+    """IoU of every box in ``boxes_a`` against every box in ``boxes_b`` (x1, y1, x2, y2).
+
+    Arithmetic follows ``TripleRiderDetector.calculate_overlap``: boxes that do
+    not overlap get 0, everything else ``intersection / union``, with the areas
+    computed in the boxes' own dtype and the division in float64.
+    """
+    boxes_a = np.asarray(boxes_a).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b).reshape(-1, 4)
+
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+
+    overlapping = (x2 >= x1) & (y2 >= y1)
+    intersection = np.where(overlapping, (x2 - x1) * (y2 - y1), 0)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(
+            overlapping, intersection / union.astype(np.float64), 0.0
+        )
+
+
+def nms_indices(boxes, scores, iou_threshold):
+    """Greedy non-maximum suppression, returning the kept indices.
+
+    Boxes are visited from the highest score down; each kept box suppresses every
+    remaining box whose IoU with it is at or above ``iou_threshold``. Each step
+    compares the kept box with all remaining boxes at once, so the Python loop
+    runs once per kept box rather than once per pair.
+    """
+    boxes = np.asarray(boxes)
+    scores = np.asarray(scores)
+    if len(boxes) == 0:
+        return []
+
+    order = np.argsort(scores)[::-1]
+    boxes = boxes[order]
+    keep = []
+    remaining = np.arange(len(order))
+    while remaining.size:
+        current = remaining[0]
+        keep.append(current)
+        rest = remaining[1:]
+        ious = box_iou_matrix(boxes[current], boxes[rest])[0]
+        # NaN (degenerate zero-area pairs) is never "below the threshold"
+        remaining = rest[ious < iou_threshold]
+    return order[keep].tolist()
+
+
+def class_nms_indices(boxes, scores, classes, iou_threshold):
+    """``nms_indices`` run separately per class; kept indices by descending score"""
+    classes = np.asarray(classes)
+    scores = np.asarray(scores)
+    keep = []
+    for class_id in np.unique(classes):
+        members = np.flatnonzero(classes == class_id)
+        keep.extend(members[nms_indices(np.asarray(boxes)[members], scores[members], iou_threshold)])
+    return sorted((int(i) for i in keep), key=lambda i: -scores[i])
+
+
+def best_overlap_index(box, boxes):
+    """Index of the box in ``boxes`` sharing the largest area with ``box``, or ``None``"""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    if len(boxes) == 0:
+        return None
+    box = np.asarray(box, dtype=np.float64)
+    widths = np.minimum(boxes[:, 2], box[2]) - np.maximum(boxes[:, 0], box[0])
+    heights = np.minimum(boxes[:, 3], box[3]) - np.maximum(boxes[:, 1], box[1])
+    areas = np.clip(widths, 0, None) * np.clip(heights, 0, None)
+    best = int(np.argmax(areas))
+    return best if areas[best] > 0 else None
@@ -0,0 +1,175 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets, from a cached plate
+# lookup to a cold model call on a large batch
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+STAGE_SECONDS = "trafai_stage_seconds"
+
+HELP = {
+    STAGE_SECONDS: "Time spent per call of each detection pipeline stage",
+    "trafai_images_total": "Images run through the detection pipeline",
+    "trafai_detections_total": "Boxes returned by each model stage",
+    "trafai_violations_total": "Violations found, by type",
+    "trafai_skipped_stages_total": "Stages the cascade skipped on frames without a two-wheeler",
+    "trafai_helmet_pixels_total": "Image pixels given to the helmet model (frames or crops)",
+    "trafai_plate_cache_total": "Plate cache lookups, by result",
+    "trafai_result_cache_total": "Whole-result cache lookups, by result",
+    "trafai_plate_reads_total": "Plate reader backend calls, by outcome",
+}
+
+
+def _key(name, labels):
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class MetricsRegistry:
+    """Counters and latency histograms of the detection pipeline, for this process.
+
+    Cheap enough for the hot path: recording is a dict update under a lock.
+    ``span`` times a block into the ``trafai_stage_seconds`` histogram of its
+    stage. Worker processes ``dump`` their snapshot to a directory the web
+    process merges into the metrics endpoint (see ``render_prometheus``).
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}
+        # (name, labels) -> [count per bucket..., sum, count]
+        self._histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[i] += 1
+                    break
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    @contextmanager
+    def span(self, stage, **labels):
+        """Time the block as one call of ``stage``"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(STAGE_SECONDS, time.perf_counter() - start, stage=stage, **labels)
+
+    def snapshot(self):
+        """JSON-serialisable copy of every metric"""
+        with self._lock:
+            return {
+                "buckets": list(self.buckets),
+                "counters": [
+                    [name, dict(labels), value]
+                    for (name, labels), value in self._counters.items()
+                ],
+                "histograms": [
+                    [name, dict(labels), list(values)]
+                    for (name, labels), values in self._histograms.items()
+                ],
+            }
+
+    def dump(self, path):
+        """Write the snapshot to ``path`` atomically, for another process to read"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+def load_snapshots(directory):
+    """Snapshots dumped by the worker processes into ``directory``"""
+    snapshots = []
+    if not directory or not os.path.isdir(directory):
+        return snapshots
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping metrics snapshot {filename}: {e}")
+    return snapshots
+
+
+def _labels_text(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def render_prometheus(snapshots):
+    """Prometheus text exposition of the snapshots, summed across processes"""
+    counters = {}
+    histograms = {}
+    buckets = LATENCY_BUCKETS
+    for snapshot in snapshots:
+        for name, labels, value in snapshot["counters"]:
+            key = _key(name, labels)
+            counters[key] = counters.get(key, 0) + value
+        if tuple(snapshot["buckets"]) != tuple(buckets):
+            logger.warning("Skipping histograms recorded with different buckets")
+            continue
+        for name, labels, values in snapshot["histograms"]:
+            key = _key(name, labels)
+            total = histograms.setdefault(key, [0] * len(values))
+            histograms[key] = [a + b for a, b in zip(total, values)]
+
+    lines = []
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f"# HELP {name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} counter")
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f"{name}{_labels_text(labels)} {value}")
+    for name in sorted({name for name, _ in histograms}):
+        lines.append(f"# HELP {name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} histogram")
+        for (metric, labels), values in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, values):
+                cumulative += count
+                lines.append(
+                    f"{name}_bucket{_labels_text(labels + (('le', repr(float(bound))),))} {cumulative}"
+                )
+            lines.append(f"{name}_bucket{_labels_text(labels + (('le', '+Inf'),))} {values[-1]}")
+            lines.append(f"{name}_sum{_labels_text(labels)} {values[-2]}")
+            lines.append(f"{name}_count{_labels_text(labels)} {values[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+# The process-wide registry every detector records into
+metrics = MetricsRegistry()
@@ -0,0 +1,226 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Formats a model can be served in. "pytorch" is the .pt checkpoint itself;
+# the "int8-*" formats are quantized ONNX models (see detect.quantization).
+MODEL_FORMATS = ("pytorch", "onnx", "openvino", "int8-static", "int8-dynamic")
+
+# Input size the models are exported for (the ultralytics default)
+EXPORT_IMAGE_SIZE = 640
+
+
+def exported_model_path(path, model_format):
+    """Where the ``model_format`` export of the checkpoint at ``path`` is cached.
+
+    Exports live next to the ``.pt`` file, under the names ultralytics gives them:
+    ``model.onnx`` and the ``model_openvino_model/`` directory. Quantized
+    variants are ``model.int8-static.onnx`` and ``model.int8-dynamic.onnx``.
+    """
+    path = Path(path)
+    if model_format == "pytorch":
+        return path
+    if model_format == "onnx":
+        return path.with_suffix(".onnx")
+    if model_format == "openvino":
+        return path.with_name(f"{path.stem}_openvino_model")
+    if model_format in ("int8-static", "int8-dynamic"):
+        return path.with_name(f"{path.stem}.{model_format}.onnx")
+    raise ValueError(f"Unknown model format: {model_format}")
+
+
+def source_record_path(exported):
+    """The record of the checkpoint an export was made from, next to the export"""
+    return Path(f"{exported}.source.json")
+
+
+def checkpoint_signature(path, digest=True):
+    """Size, modification time and (with ``digest``) SHA-256 of a checkpoint"""
+    stat = os.stat(path)
+    signature = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if digest:
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(chunk)
+        signature["sha256"] = sha256.hexdigest()
+    return signature
+
+
+def write_source_record(path, exported):
+    """Record the checkpoint ``exported`` was made from; written last, so an
+    export only counts as current once it is complete"""
+    record = source_record_path(exported)
+    tmp_path = f"{record}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint_signature(path), f)
+    os.replace(tmp_path, record)
+
+
+def is_export_current(path, model_format):
+    """True when the cached export exists and was made from the checkpoint as it is now.
+
+    The checkpoint is compared with the size and SHA-256 recorded at export
+    time; it is only hashed when its size matches but its modification time
+    does not (e.g. a copy of the same weights).
+    """
+    exported = exported_model_path(path, model_format)
+    try:
+        with open(source_record_path(exported)) as f:
+            recorded = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if not exported.exists():
+        return False
+    current = checkpoint_signature(path, digest=False)
+    if current["size"] != recorded.get("size"):
+        return False
+    if current["mtime_ns"] == recorded.get("mtime_ns"):
+        return True
+    return checkpoint_signature(path)["sha256"] == recorded.get("sha256")
+
+
+@contextmanager
+def export_lock(path, model_format):
+    """Exclusive lock on the ``model_format`` export of ``path``, across processes.
+
+    Held around checking and creating an export, so worker processes starting
+    together create it once and never load one that is still being written.
+    """
+    lock_path = f"{exported_model_path(path, model_format)}.lock"
+    with open(lock_path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+
+            # LK_LOCK gives up after ten seconds; an export takes longer
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def replace_export(built, exported):
+    """Move a finished export (a file or a directory) into place"""
+    exported = Path(exported)
+    if Path(built).is_dir() and exported.exists():
+        # A directory cannot replace a non-empty one: move the old one aside first
+        stale = exported.with_name(f"{exported.name}.{os.getpid()}.stale")
+        os.replace(exported, stale)
+        os.replace(built, exported)
+        shutil.rmtree(stale, ignore_errors=True)
+    else:
+        os.replace(built, exported)
+
+
+def export_model(path, model_format, imgsz=EXPORT_IMAGE_SIZE, force=False):
+    """Export the checkpoint at ``path`` to ``model_format`` and return the artifact path.
+
+    The export is reused while it was made from the checkpoint as it is now
+    (``is_export_current``). It is built in a temporary directory and moved into
+    place, under ``export_lock``, so concurrent callers never see a partial one.
+    The batch and image dimensions are dynamic, so the exported model takes the
+    same batched, letterboxed frames as the PyTorch one, and ultralytics runs
+    the same NMS and box scaling on its output.
+
+    ``"int8-dynamic"`` is created on demand. ``"int8-static"`` needs calibration
+    images, so it must be created beforehand with ``python -m detect.quantization``.
+    """
+    if model_format == "pytorch":
+        return Path(path)
+    if model_format == "int8-dynamic":
+        from detect.quantization import quantize_model
+
+        return quantize_model(path, model_format, force=force)
+    exported = exported_model_path(path, model_format)
+    if model_format == "int8-static":
+        if not is_export_current(path, model_format):
+            raise RuntimeError(
+                f"No current {exported}; create it with "
+                f"python -m detect.quantization --mode int8-static --calibration <images>"
+            )
+        return exported
+
+    with export_lock(path, model_format):
+        if not force and is_export_current(path, model_format):
+            return exported
+
+        from ultralytics import YOLO
+
+        logger.info(f"Exporting {path} to {model_format}")
+        # ultralytics writes the export next to the checkpoint it loaded: export a
+        # link to it in a temporary directory on the same filesystem
+        with tempfile.TemporaryDirectory(dir=exported.parent) as workdir:
+            source = Path(workdir) / Path(path).name
+            try:
+                os.symlink(os.path.abspath(path), source)
+            except OSError:
+                shutil.copy2(path, source)
+            YOLO(str(source)).export(format=model_format, imgsz=imgsz, dynamic=True)
+            built = exported_model_path(source, model_format)
+            if not built.exists():
+                raise RuntimeError(f"Export of {path} to {model_format} produced no {built}")
+            replace_export(built, exported)
+        write_source_record(path, exported)
+    return exported
+
+
+def project_checkpoints():
+    """The three checkpoints the detectors load"""
+    from detect.object_detection import coco_model_path
+    from detect.vehicle_detection import VEHICLE_MODEL_PATH
+
+    detect_dir = Path(__file__).resolve().parent
+    return [
+        detect_dir / "Helmet_detection" / "hemletYoloV8_100epochs.pt",
+        Path(coco_model_path("m")),
+        Path(VEHICLE_MODEL_PATH),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the detection checkpoints ahead of time, so worker "
+        "processes start on a cached export instead of racing to create it"
+    )
+    parser.add_argument(
+        "--format", choices=MODEL_FORMATS[1:], nargs="+", default=["onnx"],
+        help="int8-static is created by detect.quantization, which needs calibration images",
+    )
+    parser.add_argument("--force", action="store_true", help="Re-export even if current")
+    parser.add_argument("checkpoints", nargs="*", help="Checkpoints (default: the project's)")
+    args = parser.parse_args()
+
+    for checkpoint in args.checkpoints or project_checkpoints():
+        if not os.path.exists(checkpoint):
+            print(f"[WARNING] {checkpoint} not found; skipped")
+            continue
+        for model_format in args.format:
+            print(f"[INFO] {checkpoint} -> {export_model(checkpoint, model_format, force=args.force)}")
+
+
+if __name__ == "__main__":
+    main()
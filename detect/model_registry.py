@@ -0,0 +1,237 @@
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from ultralytics import YOLO
+
+from detect.model_export import export_model
+
+logger = logging.getLogger(__name__)
+
+# Size of the blank frame used to warm a model after loading
+WARMUP_IMAGE_SIZE = 640
+
+
+class InferenceStats:
+    """Latency bookkeeping for one model: the first (cold) call versus the rest"""
+
+    def __init__(self):
+        self.calls = 0
+        self.first_call_seconds = None
+        self.steady_total_seconds = 0.0
+        self.steady_min_seconds = None
+        self.steady_max_seconds = None
+        self.last_seconds = None
+
+    def record(self, seconds):
+        self.calls += 1
+        self.last_seconds = seconds
+        if self.first_call_seconds is None:
+            self.first_call_seconds = seconds
+            return
+        self.steady_total_seconds += seconds
+        if self.steady_min_seconds is None or seconds < self.steady_min_seconds:
+            self.steady_min_seconds = seconds
+        if self.steady_max_seconds is None or seconds > self.steady_max_seconds:
+            self.steady_max_seconds = seconds
+
+    def as_dict(self):
+        steady_calls = max(self.calls - 1, 0)
+        return {
+            "calls": self.calls,
+            "first_call_seconds": self.first_call_seconds,
+            "steady_calls": steady_calls,
+            "steady_mean_seconds": (
+                self.steady_total_seconds / steady_calls if steady_calls else None
+            ),
+            "steady_min_seconds": self.steady_min_seconds,
+            "steady_max_seconds": self.steady_max_seconds,
+            "last_seconds": self.last_seconds,
+        }
+
+
+class SharedModel:
+    """A loaded YOLO model shared between requests.
+
+    Calls are serialised with a per-model lock because an ultralytics predictor
+    is not safe to drive from several threads at once, and every forward pass is
+    timed. Any other attribute (``names``, ``predictor``...) is looked up on the
+    wrapped model.
+    """
+
+    def __init__(self, path, model, load_seconds):
+        self.path = path
+        self.model = model
+        self.load_seconds = load_seconds
+        self.warmup_seconds = None
+        self.stats = InferenceStats()
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            start = time.perf_counter()
+            results = self.model(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+            self.stats.record(elapsed)
+        return results
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def warm_up(self, imgsz=WARMUP_IMAGE_SIZE):
+        """Run one dummy inference so the first real request does not pay for it"""
+        if self.warmup_seconds is not None:
+            return self.warmup_seconds
+        dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+        start = time.perf_counter()
+        self(dummy, verbose=False)
+        self.warmup_seconds = time.perf_counter() - start
+        logger.info(
+            f"Warmed {os.path.basename(self.path)} in {self.warmup_seconds:.2f}s"
+        )
+        return self.warmup_seconds
+
+    def report(self):
+        report = {
+            "path": self.path,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+        }
+        report.update(self.stats.as_dict())
+        return report
+
+
+class ModelRegistry:
+    """Process-wide cache of loaded models and the detectors built on top of them.
+
+    Each model file is loaded once per worker process, no matter how many
+    detectors or requests use it.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._models = {}
+        self._objects = {}
+        self._object_build_seconds = {}
+
+    def get_model(self, path, model_format="pytorch"):
+        """Return the shared model for ``path``, loading it on first use.
+
+        ``model_format`` picks the runtime: ``"pytorch"`` loads the checkpoint
+        itself, ``"onnx"`` (ONNX Runtime) and ``"openvino"`` load an export of it
+        cached next to the checkpoint, exporting it first if needed (see
+        ``detect.model_export``); ``"int8-static"`` / ``"int8-dynamic"`` load an
+        INT8 quantized ONNX variant (see ``detect.quantization``). If the export
+        cannot be produced or loaded the PyTorch checkpoint is used, with a warning.
+        """
+        key = (str(Path(path).resolve()), model_format)
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                model = self._load(key[0], model_format)
+                self._models[key] = model
+            return model
+
+    def get_replicas(self, path, model_format="pytorch", count=1):
+        """The shared model for ``path`` plus ``count - 1`` independently loaded copies.
+
+        Each copy has its own predictor and lock, so the copies can run at the same
+        time from different threads (e.g. the tile batches of ``detect.tiling``).
+        The copies are cached too, so asking again returns the same ones.
+        """
+        models = [self.get_model(path, model_format)]
+        key = (str(Path(path).resolve()), model_format)
+        with self._lock:
+            for i in range(1, count):
+                replica_key = key + (i,)
+                if replica_key not in self._models:
+                    self._models[replica_key] = self._load(key[0], model_format)
+                models.append(self._models[replica_key])
+        return models
+
+    def _load(self, path, model_format):
+        if model_format != "pytorch":
+            try:
+                exported = str(export_model(path, model_format))
+                return self._load_file(exported, task="detect")
+            except Exception as e:
+                logger.warning(
+                    f"Cannot serve {path} with {model_format} ({e}); using PyTorch"
+                )
+        return self._load_file(path)
+
+    def _load_file(self, path, **kwargs):
+        logger.info(f"Loading model: {path}")
+        start = time.perf_counter()
+        loaded = YOLO(path, **kwargs)
+        model = SharedModel(path, loaded, time.perf_counter() - start)
+        logger.info(f"Loaded {path} in {model.load_seconds:.2f}s")
+        return model
+
+    def get_or_create(self, key, factory):
+        """Return the shared object stored under ``key``, building it on first use"""
+        with self._lock:
+            if key not in self._objects:
+                start = time.perf_counter()
+                self._objects[key] = factory()
+                self._object_build_seconds[key] = time.perf_counter() - start
+            return self._objects[key]
+
+    def warm_up(self, imgsz=WARMUP_IMAGE_SIZE):
+        """Warm every model loaded so far and return the report"""
+        with self._lock:
+            models = list(self._models.values())
+        for model in models:
+            model.warm_up(imgsz)
+        return self.report()
+
+    def report(self):
+        """Load and latency figures for every loaded model"""
+        with self._lock:
+            models = {model.path: model.report() for model in self._models.values()}
+            objects = {
+                repr(key): seconds
+                for key, seconds in self._object_build_seconds.items()
+            }
+        return {
+            "pid": os.getpid(),
+            "models": models,
+            "build_seconds": objects,
+        }
+
+    def dump(self, path):
+        """Write the report to ``path`` atomically, for another process to read"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.report(), f)
+        os.replace(tmp_path, path)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._objects.clear()
+            self._object_build_seconds.clear()
+
+
+def load_reports(directory):
+    """Registry reports dumped by the worker processes into ``directory``, by worker"""
+    reports = {}
+    if not directory or not os.path.isdir(directory):
+        return reports
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as f:
+                reports[filename[: -len(".json")]] = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping model report {filename}: {e}")
+    return reports
+
+
+# The registry shared by everything running in this process
+registry = ModelRegistry()
@@ -0,0 +1,110 @@
+import os
+
+import numpy as np
+import supervision as sv
+
+from detect.geometry import class_nms_indices
+
+DETECT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(DETECT_DIR)
+
+# COCO class IDs used by the rule logic
+PERSON_CLASS_ID = 0
+BICYCLE_CLASS_ID = 1
+CAR_CLASS_ID = 2
+MOTORCYCLE_CLASS_ID = 3
+BUS_CLASS_ID = 5
+TRUCK_CLASS_ID = 7
+
+# Everything the triple-riding rule and the vehicle annotation need from one pass
+SHARED_PASS_CLASSES = [
+    PERSON_CLASS_ID,
+    BICYCLE_CLASS_ID,
+    CAR_CLASS_ID,
+    MOTORCYCLE_CLASS_ID,
+    BUS_CLASS_ID,
+    TRUCK_CLASS_ID,
+]
+
+# Ultralytics' default threshold, which the vehicle detector has always used
+SHARED_PASS_CONFIDENCE = 0.25
+
+
+def coco_model_path(model_size="m"):
+    """Path of the COCO YOLOv8 checkpoint of the given size (n, s, m, l or x).
+
+    Checkpoints are looked up next to the triple-riding detector first and then
+    in the project root. If neither exists, the project-root path is returned and
+    ultralytics downloads the official weights on first load.
+    """
+    filename = f"yolov8{model_size}.pt"
+    for directory in (os.path.join(DETECT_DIR, "Trippleriding_detection"), PROJECT_DIR):
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            return path
+    return os.path.join(PROJECT_DIR, filename)
+
+
+def detections_from_results(results):
+    """Convert one ultralytics result into supervision Detections (with class names)"""
+    return sv.Detections.from_ultralytics(results)
+
+
+def results_from_boxes(frame, data, names, merge_iou=None):
+    """An ultralytics result for ``frame`` holding ``data`` (N x 6 rows of x1, y1, x2,
+    y2, confidence, class) from several model calls, e.g. over crops of the frame.
+
+    With ``merge_iou``, boxes of the same class overlapping at that IoU are merged
+    by NMS first.
+    """
+    import torch
+    from ultralytics.engine.results import Results
+
+    data = np.asarray(data, dtype=np.float32).reshape(-1, 6)
+    if merge_iou is not None and len(data):
+        data = data[class_nms_indices(data[:, :4], data[:, 4], data[:, 5], merge_iou)]
+    return Results(frame, path="", names=names, boxes=torch.from_numpy(data))
+
+
+def filter_detections(detections, class_ids=None, min_confidence=None):
+    """Keep only detections of the given classes at or above ``min_confidence``"""
+    mask = np.ones(len(detections), dtype=bool)
+    if class_ids is not None:
+        mask &= np.isin(detections.class_id, class_ids)
+    if min_confidence is not None:
+        mask &= detections.confidence >= min_confidence
+    return detections[mask]
+
+
+def run_coco_pass(
+    model, frame, conf=SHARED_PASS_CONFIDENCE, classes=SHARED_PASS_CLASSES
+):
+    """Run the general-object model once and return the detections for every consumer"""
+    return run_coco_pass_batch(model, [frame], conf, classes)[0]
+
+
+def run_coco_pass_batch(
+    model,
+    frames,
+    conf=SHARED_PASS_CONFIDENCE,
+    classes=SHARED_PASS_CLASSES,
+    batch_size=None,
+):
+    """Run the general-object model over several frames, ``batch_size`` at a time"""
+    return [
+        detections_from_results(results)
+        for results in predict_batched(
+            model, frames, batch_size, classes=classes, conf=conf, verbose=False
+        )
+    ]
+
+
+def predict_batched(model, frames, batch_size=None, **kwargs):
+    """Run ``model`` on ``frames`` in batches and return one result per frame"""
+    if not frames:
+        return []
+    batch_size = batch_size or len(frames)
+    results = []
+    for start in range(0, len(frames), batch_size):
+        results.extend(model(frames[start : start + batch_size], **kwargs))
+    return results
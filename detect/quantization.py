@@ -0,0 +1,229 @@
+import argparse
+import glob
+import logging
+import os
+import re
+import tempfile
+
+import cv2
+import numpy as np
+
+from detect.model_export import (
+    EXPORT_IMAGE_SIZE,
+    export_lock,
+    export_model,
+    exported_model_path,
+    is_export_current,
+    project_checkpoints,
+    write_source_record,
+)
+
+logger = logging.getLogger(__name__)
+
+# Quantized variants, loadable by name as a model_format
+QUANTIZATION_MODES = ("int8-static", "int8-dynamic")
+
+
+def letterbox(frame, size=EXPORT_IMAGE_SIZE):
+    """Resize keeping the aspect ratio and pad to ``size`` x ``size`` with grey (114),
+    the way ultralytics prepares frames for an exported model"""
+    height, width = frame.shape[:2]
+    scale = min(size / height, size / width)
+    resized = cv2.resize(
+        frame, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_LINEAR
+    )
+    top = (size - resized.shape[0]) // 2
+    left = (size - resized.shape[1]) // 2
+    return cv2.copyMakeBorder(
+        resized,
+        top,
+        size - resized.shape[0] - top,
+        left,
+        size - resized.shape[1] - left,
+        cv2.BORDER_CONSTANT,
+        value=(114, 114, 114),
+    )
+
+
+def calibration_images(folder, limit=None):
+    paths = sorted(
+        path
+        for pattern in ("*.jpg", "*.jpeg", "*.png")
+        for path in glob.glob(os.path.join(folder, pattern))
+    )
+    return paths[:limit] if limit else paths
+
+
+def head_node_names(model):
+    """Nodes of the detection head (the last ``/model.N/`` block).
+
+    The head decodes box coordinates (DFL, anchors, strides); quantizing it costs
+    far more accuracy than it saves time, so static quantization leaves it in float.
+    """
+    blocks = {}
+    for node in model.graph.node:
+        match = re.match(r"^/model\.(\d+)/", node.name)
+        if match:
+            blocks.setdefault(int(match.group(1)), []).append(node.name)
+    return blocks[max(blocks)] if blocks else []
+
+
+def _copy_metadata(source, target):
+    """Carry the ultralytics metadata (class names, stride, image size) over to
+    the quantized model, so it loads through ``YOLO`` like the float export"""
+    import onnx
+
+    source_model = onnx.load(str(source), load_external_data=False)
+    target_model = onnx.load(str(target))
+    del target_model.metadata_props[:]
+    target_model.metadata_props.extend(source_model.metadata_props)
+    onnx.save(target_model, str(target))
+
+
+def quantize_model(
+    path,
+    mode,
+    calibration_dir=None,
+    max_calibration_images=200,
+    per_channel=True,
+    force=False,
+):
+    """Create the INT8 ``mode`` variant of the checkpoint at ``path``; returns its path.
+
+    ``"int8-static"`` calibrates activation ranges on the images in
+    ``calibration_dir`` (our own camera frames, letterboxed like at inference) and
+    quantizes weights and activations, keeping the detection head in float.
+    ``"int8-dynamic"`` quantizes the weights only and needs no calibration data.
+    Both start from the FP32 ONNX export and are cached next to the checkpoint;
+    like ``export_model``, the variant is written under ``export_lock`` to a
+    temporary file that is renamed into place.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode: {mode}")
+    output = exported_model_path(path, mode)
+    if mode == "int8-static":
+        if not calibration_dir:
+            raise ValueError(f"Static quantization of {path} needs a calibration image folder")
+        images = calibration_images(calibration_dir, max_calibration_images)
+        if not images:
+            raise ValueError(f"No calibration images in {calibration_dir}")
+
+    with export_lock(path, mode):
+        if not force and is_export_current(path, mode):
+            return output
+        fp32 = export_model(path, "onnx")
+        logger.info(f"Quantizing {fp32} ({mode})")
+        with tempfile.TemporaryDirectory(dir=output.parent) as workdir:
+            prepared = _prepare(fp32, os.path.join(workdir, "prepared.onnx"))
+            quantized = os.path.join(workdir, output.name)
+            if mode == "int8-dynamic":
+                quantize_dynamic(prepared, quantized, weight_type=QuantType.QUInt8)
+            else:
+                _quantize_static(prepared, quantized, images, per_channel)
+            _copy_metadata(fp32, quantized)
+            os.replace(quantized, output)
+        write_source_record(path, output)
+    return output
+
+
+def _prepare(fp32, prepared):
+    """Shape inference and graph optimization ahead of quantization, which lets
+    more tensors be quantized; the plain export is used if it fails"""
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    try:
+        quant_pre_process(str(fp32), prepared, skip_symbolic_shape=True)
+        return prepared
+    except Exception as e:
+        logger.warning(f"Pre-processing {fp32} for quantization failed ({e})")
+        return str(fp32)
+
+
+def _quantize_static(prepared, output, images, per_channel):
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        CalibrationMethod,
+        QuantFormat,
+        QuantType,
+        quantize_static,
+    )
+    import onnx
+
+    model = onnx.load(prepared)
+    input_name = model.graph.input[0].name
+
+    class CalibrationFrames(CalibrationDataReader):
+        def __init__(self):
+            self.paths = iter(images)
+
+        def get_next(self):
+            for image_path in self.paths:
+                frame = cv2.imread(image_path)
+                if frame is None:
+                    continue
+                rgb = cv2.cvtColor(letterbox(frame), cv2.COLOR_BGR2RGB)
+                tensor = rgb.transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+                return {input_name: tensor}
+            return None
+
+    quantize_static(
+        prepared,
+        str(output),
+        CalibrationFrames(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=per_channel,
+        calibrate_method=CalibrationMethod.MinMax,
+        nodes_to_exclude=head_node_names(model),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Create INT8 variants of the detection models "
+        "(load them with model_format \"int8-static\" / \"int8-dynamic\")"
+    )
+    parser.add_argument(
+        "--mode", nargs="+", choices=QUANTIZATION_MODES, default=list(QUANTIZATION_MODES)
+    )
+    parser.add_argument("--calibration", help="Folder of our own images for static INT8")
+    parser.add_argument("--max-calibration-images", type=int, default=200)
+    parser.add_argument("--per-tensor", action="store_true", help="Per-tensor weight scales")
+    parser.add_argument("--force", action="store_true")
+    parser.add_argument("checkpoints", nargs="*", help="Checkpoints (default: the project's)")
+    args = parser.parse_args()
+
+    for checkpoint in args.checkpoints or project_checkpoints():
+        if not os.path.exists(checkpoint):
+            print(f"[WARNING] {checkpoint} not found; skipped")
+            continue
+        for mode in args.mode:
+            if mode == "int8-static" and not args.calibration:
+                print("[WARNING] int8-static needs --calibration; only dynamic is created")
+                continue
+            try:
+                output = quantize_model(
+                    checkpoint,
+                    mode,
+                    args.calibration,
+                    args.max_calibration_images,
+                    per_channel=not args.per_tensor,
+                    force=args.force,
+                )
+            except Exception as e:
+                if mode != "int8-static":
+                    raise
+                # Some graphs cannot be statically quantized; weight-only INT8 still helps
+                print(f"[WARNING] Static INT8 of {checkpoint} failed ({e}); using dynamic")
+                output = quantize_model(checkpoint, "int8-dynamic", force=args.force)
+            print(
+                f"[INFO] {checkpoint} -> {output} "
+                f"({os.path.getsize(output) / 1e6:.1f} MB)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import hashlib
+import json
+import os
+
+from detect.Licenseplate_detection.plate_cache import PlateCache
+
+# Bump when the rules change what a result holds for the same models and options
+RESULT_CACHE_VERSION = 1
+# A week, like plate reads: long enough for disputes, short enough to stay small
+DEFAULT_RESULT_CACHE_TTL = 7 * 24 * 3600
+
+
+def file_signature(path):
+    """Name, size and modification time of a model file: changes when it is replaced"""
+    stat = os.stat(path)
+    return [os.path.basename(str(path)), stat.st_size, stat.st_mtime_ns]
+
+
+def config_fingerprint(model_paths, config):
+    """Short hash of the model files and detector settings a result depends on"""
+    payload = {
+        "version": RESULT_CACHE_VERSION,
+        "models": [file_signature(path) for path in model_paths],
+        "config": config,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+class ResultCache(PlateCache):
+    """Whole detection results keyed by image content and detector fingerprint.
+
+    The same two-tier LRU over SQLite as ``PlateCache``, storing each result as
+    JSON. Keys start with the ``config_fingerprint`` of the detector, so a new
+    model file, model format or threshold never hits the results of the old
+    ones; those are no longer looked up and age out of the bounded table.
+    """
+
+    TABLE = "results"
+    VALUE_COLUMN = "result"
+
+    def __init__(
+        self,
+        fingerprint,
+        db_path=None,
+        max_entries=256,
+        max_disk_entries=10_000,
+        ttl_seconds=DEFAULT_RESULT_CACHE_TTL,
+    ):
+        super().__init__(db_path, max_entries, max_disk_entries, ttl_seconds)
+        self.fingerprint = fingerprint
+
+    def key(self, content_key):
+        return f"{self.fingerprint}:{content_key}"
+
+    def get_result(self, content_key):
+        """A fresh copy of the cached result, or ``None``"""
+        found, encoded = self.get(self.key(content_key))
+        return json.loads(encoded) if found else None
+
+    def put_result(self, content_key, result):
+        self.put(self.key(content_key), json.dumps(result))
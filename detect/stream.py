@@ -0,0 +1,99 @@
+import argparse
+import logging
+import time
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+
+def iter_video_frames(source, stride=None, fps=None, max_frames=None):
+    """Yield ``(frame_index, timestamp_seconds, frame)`` sampled from a video.
+
+    ``source`` is anything ``cv2.VideoCapture`` opens: a local video file, a
+    camera index or a stream URL (rtsp://, http://...). Frames are sampled every
+    ``stride`` frames, or at roughly ``fps`` frames per second. Skipped frames are
+    only grabbed, never decoded, and only the current frame is held in memory, so
+    memory use does not depend on the length of the video.
+
+    When the source does not report its frame rate (common for live streams),
+    ``fps`` sampling falls back to wall-clock time.
+    """
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise ValueError(f"Cannot open video source: {source}")
+
+    source_fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+    use_wall_clock = False
+    if fps:
+        if source_fps > 0:
+            stride = max(1, round(source_fps / fps))
+        else:
+            use_wall_clock = True
+    stride = stride or 1
+    logger.info(
+        f"Reading {source} ({source_fps:.1f} fps), "
+        + (f"sampling at {fps} fps by wall clock" if use_wall_clock else f"stride {stride}")
+    )
+
+    index = -1
+    sampled = 0
+    next_due = time.monotonic()
+    try:
+        while max_frames is None or sampled < max_frames:
+            index += 1
+            if use_wall_clock:
+                due = time.monotonic() >= next_due
+            else:
+                due = index % stride == 0
+
+            if not due:
+                # Advance without decoding
+                if not capture.grab():
+                    return
+                continue
+
+            ok, frame = capture.read()
+            if not ok:
+                return
+            if use_wall_clock:
+                next_due = time.monotonic() + 1.0 / fps
+            timestamp = capture.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            if timestamp <= 0 and source_fps > 0:
+                timestamp = index / source_fps
+            sampled += 1
+            yield index, timestamp, frame
+    finally:
+        capture.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Print the violations found in a video file or stream"
+    )
+    parser.add_argument("source", help="Video file path or stream URL")
+    parser.add_argument("--camera-id", help="Camera name used to key tracker state")
+    parser.add_argument("--stride", type=int, help="Process every Nth frame")
+    parser.add_argument("--fps", type=float, help="Process about this many frames per second")
+    parser.add_argument("--max-frames", type=int, help="Stop after this many sampled frames")
+    args = parser.parse_args()
+
+    from violation_detector import get_violation_detector
+
+    detector = get_violation_detector()
+    for event in detector.process_stream(
+        args.source,
+        camera_id=args.camera_id,
+        stride=args.stride,
+        fps=args.fps,
+        max_frames=args.max_frames,
+    ):
+        print(
+            f"[VIOLATION] track {event['track_id']}, best frame {event['frame_index']} "
+            f"at {event['timestamp']:.2f}s: {', '.join(event['violations'])} "
+            f"(plate: {event['plate_number']})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+from detect.object_detection import predict_batched, results_from_boxes
+
+# Tiles are the models' input size, so a tile reaches the model at full resolution
+TILE_SIZE = 640
+# Share of a tile overlapping its neighbours; an object cut by one tile border
+# is whole in the next tile as long as it is smaller than the overlap
+TILE_OVERLAP = 0.2
+# Only frames with a longer side above this are tiled (e.g. 4K overview cameras)
+TILE_MIN_SIDE = 1920
+# Boxes of the same object from neighbouring tiles are merged at this IoU
+TILE_MERGE_IOU = 0.5
+# A tile box this close (pixels) to a tile edge inside the frame is cut by it
+TILE_EDGE_MARGIN = 2
+
+
+def _tile_starts(length, tile_size, stride):
+    if length <= tile_size:
+        return [0]
+    starts = list(range(0, length - tile_size, stride))
+    # The last tile sits flush with the far edge instead of hanging over it
+    return starts + [length - tile_size]
+
+
+class TileGrid:
+    """Overlapping ``tile_size`` squares covering a ``width`` x ``height`` frame"""
+
+    def __init__(self, width, height, tile_size=TILE_SIZE, overlap=TILE_OVERLAP):
+        self.width = width
+        self.height = height
+        stride = max(1, int(tile_size * (1 - overlap)))
+        self.boxes = np.array(
+            [
+                (x, y, min(x + tile_size, width), min(y + tile_size, height))
+                for y in _tile_starts(height, tile_size, stride)
+                for x in _tile_starts(width, tile_size, stride)
+            ],
+            dtype=int,
+        )
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def slice(self, frame):
+        """The tiles of ``frame`` as views, in grid order"""
+        return [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in self.boxes]
+
+
+@lru_cache(maxsize=32)
+def tile_grid(width, height, tile_size=TILE_SIZE, overlap=TILE_OVERLAP):
+    """The grid for one camera resolution, computed once and then reused"""
+    return TileGrid(width, height, tile_size, overlap)
+
+
+class Tiler:
+    """Sliced inference over high-resolution frames.
+
+    Each frame whose longer side exceeds ``min_side`` is cut into the overlapping
+    tiles of its ``tile_grid``, plus (with ``include_full_frame``) the whole frame
+    for objects larger than a tile. The tiles of a whole group of frames are run
+    ``batch_size`` at a time, spread over ``models``: independently loaded
+    replicas of the same model (see ``ModelRegistry.get_replicas``), so batches
+    run in parallel instead of queueing on one model's lock.
+
+    Tile boxes are moved back to frame coordinates. A box cut by a tile edge
+    inside the frame is dropped: the object is whole in the overlapping
+    neighbour tile, or in the full frame when it is larger than the overlap, and
+    a partial box would count it twice. The copies of an object from overlapping
+    tiles are then merged with per-class NMS. Smaller frames are run whole, as
+    without tiling.
+
+    ``predict`` returns one ultralytics result per frame, like ``predict_batched``.
+    Calling the tiler does the same with its own ``batch_size``, so it can stand
+    in for the model wherever a list of frames is passed to one.
+    """
+
+    def __init__(
+        self,
+        models,
+        tile_size=TILE_SIZE,
+        overlap=TILE_OVERLAP,
+        min_side=TILE_MIN_SIDE,
+        merge_iou=TILE_MERGE_IOU,
+        include_full_frame=True,
+        batch_size=8,
+    ):
+        self.models = list(models)
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.min_side = min_side
+        self.merge_iou = merge_iou
+        self.include_full_frame = include_full_frame
+        self.batch_size = batch_size
+        self._free = queue.Queue()
+        for model in self.models:
+            self._free.put(model)
+        self._executor = (
+            ThreadPoolExecutor(
+                max_workers=len(self.models), thread_name_prefix="tile-inference"
+            )
+            if len(self.models) > 1
+            else None
+        )
+
+    @property
+    def names(self):
+        return self.models[0].names
+
+    def __call__(self, frames, **kwargs):
+        if isinstance(frames, np.ndarray):
+            frames = [frames]
+        return self.predict(frames, self.batch_size, **kwargs)
+
+    def is_tiled(self, frame):
+        return max(frame.shape[:2]) > self.min_side
+
+    def predict(self, frames, batch_size=None, **kwargs):
+        tiled = [i for i, frame in enumerate(frames) if self.is_tiled(frame)]
+        whole = [i for i, frame in enumerate(frames) if not self.is_tiled(frame)]
+        results = [None] * len(frames)
+
+        # Every input the models see: (frame index, tile box or None, image)
+        inputs = []
+        for i in tiled:
+            frame = frames[i]
+            grid = tile_grid(frame.shape[1], frame.shape[0], self.tile_size, self.overlap)
+            inputs.extend((i, box, tile) for box, tile in zip(grid.boxes, grid.slice(frame)))
+            if self.include_full_frame:
+                inputs.append((i, None, frame))
+        # Frames too small to tile ride along in the same batches, untouched
+        inputs.extend((i, None, frames[i]) for i in whole)
+
+        batch_size = batch_size or len(inputs) or 1
+        batches = [inputs[start : start + batch_size] for start in range(0, len(inputs), batch_size)]
+        if self._executor is None:
+            outputs = [self._run(batch, kwargs) for batch in batches]
+        else:
+            outputs = list(self._executor.map(lambda batch: self._run(batch, kwargs), batches))
+
+        boxes = {i: [] for i in tiled}
+        for batch, batch_results in zip(batches, outputs):
+            for (i, tile, _), result in zip(batch, batch_results):
+                if i not in boxes:
+                    results[i] = result
+                    continue
+                data = result.boxes.data.cpu().numpy()[:, :6]
+                if tile is not None:
+                    data = self._frame_boxes(data, tile, frames[i].shape)
+                boxes[i].append(data)
+        for i in tiled:
+            results[i] = results_from_boxes(
+                frames[i], np.concatenate(boxes[i]), self.names, self.merge_iou
+            )
+        return results
+
+    @staticmethod
+    def _frame_boxes(data, tile, frame_shape):
+        """Tile boxes in frame coordinates, without the ones cut by an inner tile edge"""
+        x1, y1, x2, y2 = tile
+        height, width = frame_shape[:2]
+        data = data.copy()
+        data[:, [0, 2]] += x1
+        data[:, [1, 3]] += y1
+        cut = (
+            ((x1 > 0) & (data[:, 0] <= x1 + TILE_EDGE_MARGIN))
+            | ((y1 > 0) & (data[:, 1] <= y1 + TILE_EDGE_MARGIN))
+            | ((x2 < width) & (data[:, 2] >= x2 - TILE_EDGE_MARGIN))
+            | ((y2 < height) & (data[:, 3] >= y2 - TILE_EDGE_MARGIN))
+        )
+        return data[~cut]
+
+    def _run(self, batch, kwargs):
+        model = self._free.get()
+        try:
+            return predict_batched(model, [image for _, _, image in batch], **kwargs)
+        finally:
+            self._free.put(model)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
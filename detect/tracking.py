@@ -0,0 +1,171 @@
+import threading
+
+import numpy as np
+import supervision as sv
+
+from detect.object_detection import MOTORCYCLE_CLASS_ID, PERSON_CLASS_ID
+
+# Sampled frames a track may go unseen before its violation is finalised. It is
+# also ByteTrack's lost-track buffer, so a track is never closed while the
+# tracker could still pick it up again.
+DEFAULT_TRACK_EXPIRY_FRAMES = 30
+
+
+class TrackedViolation:
+    """Violation state of one tracked object, kept until the track expires"""
+
+    def __init__(self, camera_id, track_id, frame_number, frame_index, timestamp):
+        self.camera_id = camera_id
+        self.track_id = track_id
+        self.violations = []
+        self.first_frame_index = frame_index
+        self.first_timestamp = timestamp
+        self.last_seen = frame_number
+        self.last_frame_index = frame_index
+        self.frames_seen = 0
+        # Best view of the object so far, used for the single plate lookup
+        self.best_confidence = -1.0
+        self.best_frame = None
+        self.best_box = None
+        self.best_frame_index = None
+        self.best_timestamp = None
+
+    def add_violations(self, violations):
+        for violation in violations:
+            if violation not in self.violations:
+                self.violations.append(violation)
+
+    def observe(self, frame_number, frame_index, timestamp, frame, box, confidence):
+        self.last_seen = frame_number
+        self.last_frame_index = frame_index
+        self.frames_seen += 1
+        if confidence > self.best_confidence:
+            self.best_confidence = float(confidence)
+            # Copy: the caller may reuse the frame buffer for the next frame
+            self.best_frame = frame.copy()
+            self.best_box = [float(v) for v in box]
+            self.best_frame_index = frame_index
+            self.best_timestamp = timestamp
+
+    def as_event(self):
+        """Summary of the finished track (without the stored frame)"""
+        return {
+            "camera_id": self.camera_id,
+            "track_id": self.track_id,
+            "violations": list(self.violations),
+            "confidence": self.best_confidence,
+            "box": self.best_box,
+            "frame_index": self.best_frame_index,
+            "timestamp": self.best_timestamp,
+            "first_frame_index": self.first_frame_index,
+            "first_timestamp": self.first_timestamp,
+            "last_frame_index": self.last_frame_index,
+            "frames_seen": self.frames_seen,
+        }
+
+
+class CameraTracks:
+    """ByteTrack tracker and live violation tracks of one camera"""
+
+    def __init__(self, camera_id, expiry_frames=DEFAULT_TRACK_EXPIRY_FRAMES):
+        self.camera_id = camera_id
+        self.expiry_frames = expiry_frames
+        self.tracker = sv.ByteTrack(lost_track_buffer=expiry_frames)
+        self.frame_number = 0
+        self.tracks = {}
+
+    def update(self, detections):
+        """Track one sampled frame's detections and return them with tracker IDs"""
+        self.frame_number += 1
+        return self.tracker.update_with_detections(detections)
+
+    def record(self, frame_index, timestamp, frame, tracked, frame_violations):
+        """Fold one frame into the track states.
+
+        ``frame_violations`` maps a tracker ID to the violations seen on it in this
+        frame. A state is opened the first time a track has a violation; after
+        that every frame the track appears in refreshes it, so its best frame is
+        chosen over the whole life of the track.
+        """
+        for box, confidence, track_id in zip(
+            tracked.xyxy, tracked.confidence, tracked.tracker_id
+        ):
+            track_id = int(track_id)
+            violations = frame_violations.get(track_id)
+            state = self.tracks.get(track_id)
+            if state is None:
+                if not violations:
+                    continue
+                state = TrackedViolation(
+                    self.camera_id, track_id, self.frame_number, frame_index, timestamp
+                )
+                self.tracks[track_id] = state
+            if violations:
+                state.add_violations(violations)
+            state.observe(
+                self.frame_number, frame_index, timestamp, frame, box, confidence
+            )
+
+    def expire(self):
+        """Remove and return the tracks unseen for more than ``expiry_frames`` frames"""
+        expired = [
+            track_id
+            for track_id, state in self.tracks.items()
+            if self.frame_number - state.last_seen > self.expiry_frames
+        ]
+        return [self.tracks.pop(track_id) for track_id in expired]
+
+    def flush(self):
+        """Remove and return every live track, e.g. when the stream ends"""
+        states = list(self.tracks.values())
+        self.tracks.clear()
+        return states
+
+
+class CameraTrackRegistry:
+    """Tracker state per camera, so concurrent streams never share a tracker"""
+
+    def __init__(self, expiry_frames=DEFAULT_TRACK_EXPIRY_FRAMES):
+        self.expiry_frames = expiry_frames
+        self._lock = threading.Lock()
+        self._cameras = {}
+
+    def get(self, camera_id):
+        with self._lock:
+            camera = self._cameras.get(camera_id)
+            if camera is None:
+                camera = CameraTracks(camera_id, self.expiry_frames)
+                self._cameras[camera_id] = camera
+            return camera
+
+    def discard(self, camera_id):
+        with self._lock:
+            self._cameras.pop(camera_id, None)
+
+
+def match_rider_to_track(rider_box, tracked):
+    """Tracker ID of the object a rider box belongs to, or ``None``.
+
+    A rider sits on top of the motorcycle, so motorcycles are matched against
+    their box stretched upwards by its own height; the tracked motorcycle with the
+    largest overlap wins. Otherwise the tracked person overlapping the rider most
+    is used.
+    """
+    if len(tracked) == 0:
+        return None
+    rider = np.asarray(rider_box, dtype=np.float32)
+    boxes = tracked.xyxy.astype(np.float32).copy()
+    is_motorcycle = tracked.class_id == MOTORCYCLE_CLASS_ID
+    heights = boxes[:, 3] - boxes[:, 1]
+    boxes[is_motorcycle, 1] -= heights[is_motorcycle]
+
+    widths = np.minimum(boxes[:, 2], rider[2]) - np.maximum(boxes[:, 0], rider[0])
+    overlaps = np.minimum(boxes[:, 3], rider[3]) - np.maximum(boxes[:, 1], rider[1])
+    areas = np.clip(widths, 0, None) * np.clip(overlaps, 0, None)
+
+    for candidates in (is_motorcycle, tracked.class_id == PERSON_CLASS_ID):
+        candidate_areas = np.where(candidates, areas, 0.0)
+        best = int(np.argmax(candidate_areas))
+        if candidate_areas[best] > 0:
+            return int(tracked.tracker_id[best])
+    return None
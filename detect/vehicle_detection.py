@@ -1,51 +1,87 @@
 import cv2
-from ultralytics import YOLO
+import numpy as np
 import os
 
-# Load the pretrained YOLOv8 model (use yolov8n.pt or yolov8s.pt for better speed/accuracy)
-model = YOLO("yolov8x.pt")  # Change to yolov8s.pt for more accuracy
+from detect.model_registry import registry
+from detect.object_detection import detections_from_results
+
+# Pretrained YOLOv8 model (use yolov8n.pt or yolov8s.pt for better speed/accuracy)
+# It is loaded lazily through the shared model registry on first use.
+VEHICLE_MODEL_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "yolov8x.pt"
+)
 
 # Define allowed vehicle classes
 VEHICLE_CLASSES = ["car", "motorcycle", "bus", "truck", "bicycle"]
 
 
-def detect_vehicles(image_path):
-    # Run YOLO inference
-    results = model(image_path)[0]
+def detect_vehicles(
+    image, model=None, detections=None, output_path=None, model_format="pytorch"
+):
+    """Return the vehicles in an image as a list of dicts.
 
-    # Load the image using OpenCV
-    image = cv2.imread(image_path)
+    ``image`` is an already decoded BGR frame or a path. ``detections`` may come
+    from a shared COCO pass (see ``detect.object_detection.run_coco_pass``);
+    otherwise ``model`` is run here, by default the shared vehicle model served in
+    ``model_format`` (``"pytorch"``, ``"onnx"`` or ``"openvino"``). The annotated
+    image is only written when ``output_path`` is given; the violation pipeline
+    stores the boxes instead and renders evidence when it is viewed (see
+    ``detect.evidence``).
+    """
+    if not isinstance(image, np.ndarray):
+        image = cv2.imread(image)
 
-    for box in results.boxes:
-        cls_id = int(box.cls[0])
-        class_name = model.names[cls_id]
+    if detections is None:
+        if model is None:
+            model = registry.get_model(VEHICLE_MODEL_PATH, model_format)
+        # Run YOLO inference
+        detections = detections_from_results(model(image)[0])
 
+    vehicles = []
+    for xyxy, conf, class_name in zip(
+        detections.xyxy, detections.confidence, detections.data["class_name"]
+    ):
         if class_name in VEHICLE_CLASSES:
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
-            conf = float(box.conf[0])
-            label = f"{class_name} ({conf:.2f})"
-
-            # Draw rectangle and label
-            cv2.rectangle(image, (x1, y1), (x2, y2), (0, 0, 255), 2)
-            cv2.putText(
-                image,
-                label,
-                (x1, y1 - 10),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.7,
-                (0, 0, 255),
-                2,
+            vehicles.append(
+                {
+                    "class_name": str(class_name),
+                    "confidence": float(conf),
+                    "box": [float(v) for v in xyxy],
+                }
             )
 
-    # Save output
-    output_path = os.path.join(
-        os.path.dirname(image_path), "vehicle_detection_output.jpg"
-    )
-    cv2.imwrite(output_path, image)
-    print(f"[INFO] Saved detection result to: {output_path}")
+    if output_path is not None:
+        # Save output
+        cv2.imwrite(output_path, annotate_vehicles(image, vehicles))
+        print(f"[INFO] Saved detection result to: {output_path}")
+    return vehicles
+
+
+def annotate_vehicles(image, vehicles):
+    """Return a copy of the image with the vehicle boxes and labels drawn on it"""
+    image = image.copy()
+    for vehicle in vehicles:
+        x1, y1, x2, y2 = map(int, vehicle["box"])
+        label = f"{vehicle['class_name']} ({vehicle['confidence']:.2f})"
+
+        # Draw rectangle and label
+        cv2.rectangle(image, (x1, y1), (x2, y2), (0, 0, 255), 2)
+        cv2.putText(
+            image,
+            label,
+            (x1, y1 - 10),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.7,
+            (0, 0, 255),
+            2,
+        )
+    return image
 
 
 # --- Test with your image ---
 if __name__ == "__main__":
     test_image = " " #give path of your test image here
-    detect_vehicles(test_image)
+    detect_vehicles(
+        test_image,
+        output_path=os.path.splitext(test_image)[0] + "_vehicles.jpg",
+    )
@@ -14,3 +14,15 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "traffic_violation_web.settings")
 
 application = get_asgi_application()
+
+# Load and warm the detection models once per worker process. In queue mode the
+# detection workers own the models and the web process never loads them.
+from django.conf import settings  # noqa: E402
+
+if (
+    getattr(settings, "VIOLATION_DETECTOR_WARM_ON_STARTUP", False)
+    and getattr(settings, "DETECTION_JOB_MODE", "inline") == "inline"
+):
+    from violation_detector import warm_up_violation_detector
+
+    warm_up_violation_detector(**settings.VIOLATION_DETECTOR_OPTIONS)
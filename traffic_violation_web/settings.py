@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -81,6 +82,9 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Detection workers write from several processes; wait for the lock
+        # instead of failing with "database is locked"
+        "OPTIONS": {"timeout": 20},
     }
 }
 
@@ -125,6 +129,92 @@ STATIC_URL = "static/"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Keep camera-sized uploads in memory instead of spooling them to a temp file;
+# detection decodes them straight from memory
+FILE_UPLOAD_MAX_MEMORY_SIZE = 20 * 1024 * 1024
+DATA_UPLOAD_MAX_MEMORY_SIZE = 20 * 1024 * 1024
+
+# Detection pipeline
+# Keyword arguments for violation_detector.ViolationDetector, e.g.
+# {"coco_model_size": "s"} to trade some accuracy for a faster COCO pass
+VIOLATION_DETECTOR_OPTIONS = {
+    "coco_model_size": "m",
+    # "pytorch", or "onnx" / "openvino" to run exports of the checkpoints (created
+    # next to them on first use, or ahead of time with python -m detect.model_export),
+    # or "int8-dynamic" / "int8-static" for INT8 quantized variants (static ones are
+    # calibrated on our images with python -m detect.quantization; see
+    # benchmarks/quantization_report.py for what they cost in accuracy)
+    "model_format": "pytorch",
+    # "cloud" (Plate Recognizer API) or "local" (offline OCR; needs pytesseract
+    # and the tesseract binary, or easyocr)
+    "plate_backend": "cloud",
+    # Run the helmet model and rider rules only on frames where the COCO pass finds
+    # a motorcycle (the result's "skipped_stages" lists what was skipped)
+    "cascade": True,
+    # "full" runs the helmet model on whole frames, "roi" on a crop around each
+    # motorcycle (fewer pixels, larger heads on wide junction shots)
+    "helmet_mode": "full",
+    # Tile frames with a longer side over 1920px (4K junction cameras) into
+    # overlapping squares of this size, so small far-away riders reach the models
+    # at full resolution; None runs every frame whole
+    "tile_size": None,
+    # Frame enhancement before the COCO pass: CLAHE "bgr" (per channel), "lab" or
+    # "ycrcb" (luminance only; "ycrcb" is the cheapest) or None, and a sharpening
+    # filter; with
+    # preprocess_helmet the helmet model sees the enhanced frame too
+    "preprocess_clahe": "bgr",
+    "preprocess_sharpen": True,
+    "preprocess_helmet": False,
+    # Return the stored result for an image uploaded before, as long as the model
+    # files and these options are unchanged (kept in result_cache.sqlite3)
+    "result_cache": True,
+}
+
+# Load every detection model and run a dummy inference when a WSGI/ASGI worker
+# starts, so the first upload does not pay the cold-start cost
+VIOLATION_DETECTOR_WARM_ON_STARTUP = True
+
+# "queue": uploads become DetectionJob rows processed by the worker pool started
+# with `python manage.py run_detection_workers`; the page polls for the result.
+# "inline": the request runs the job itself (no workers needed, e.g. development).
+DETECTION_JOB_MODE = "queue"
+
+# Detection worker processes started by run_detection_workers, and how often an
+# idle worker checks the queue
+DETECTION_WORKERS = 2
+DETECTION_WORKER_POLL_SECONDS = 0.5
+
+# Jobs still "running" after this long belong to a dead worker and are requeued
+# when the worker pool starts
+DETECTION_JOB_STALE_SECONDS = 600
+
+# Detection workers write their pipeline metrics (stage latencies, counters) here
+# after every job; the /metrics/ endpoint merges them with the web process's own
+METRICS_DIR = BASE_DIR / "metrics"
+# ...and their model load/latency reports here, merged by /models/report/
+MODEL_REPORTS_DIR = METRICS_DIR / "models"
+
+# Annotated evidence images are rendered from the stored detections when first
+# viewed and cached here, least recently viewed first out past the size budget
+EVIDENCE_CACHE_DIR = BASE_DIR / "evidence_cache"
+EVIDENCE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Per-image and per-frame pipeline logging stays off unless asked for, e.g.
+# DETECTION_LOG_LEVEL=DEBUG; warnings and errors are always shown
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        name: {
+            "handlers": ["console"],
+            "level": os.environ.get("DETECTION_LOG_LEVEL", "WARNING"),
+            "propagate": False,
+        }
+        for name in ("detect", "violation_detector", "violations")
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
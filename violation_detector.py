@@ -1,22 +1,127 @@
+import logging
 import os
-import cv2
+from itertools import islice, repeat
 from pathlib import Path
-import shutil
 from datetime import datetime
 
+import numpy as np
+
 # Import detection modules
-from detect.Helmet_detection.helmet import helmet_violation_in_image
-from detect.Licenseplate_detection.plate_reader import extract_plate_text_from_api
+from detect.Helmet_detection.helmet import (
+    HELMET_CONFIDENCE,
+    ROI_IMAGE_SIZE,
+    helmetless_riders,
+    predict_helmet_rois,
+    rider_helmet_results,
+    rider_rois,
+)
+from detect.Licenseplate_detection.plate_reader import create_plate_backend
+from detect.Licenseplate_detection.plate_cache import (
+    DEFAULT_PLATE_CACHE_TTL,
+    CachedPlateReader,
+    PlateCache,
+    content_key,
+)
 from detect.vehicle_detection import detect_vehicles
+from detect.object_detection import (
+    MOTORCYCLE_CLASS_ID,
+    PERSON_CLASS_ID,
+    SHARED_PASS_CONFIDENCE,
+    coco_model_path,
+    filter_detections,
+    predict_batched,
+    run_coco_pass_batch,
+)
 from detect.Trippleriding_detection.tripple import TripleRiderDetector
-from ultralytics import YOLO
+from detect.tiling import TILE_MIN_SIDE, TILE_OVERLAP, Tiler
+from detect.evidence import evidence_detections, render_evidence
+from detect.metrics import metrics
+from detect.preprocess import Preprocessor
+from detect.result_cache import DEFAULT_RESULT_CACHE_TTL, ResultCache, config_fingerprint
+from detect.model_registry import registry as default_registry
+from detect.frames import encode_jpeg, encode_region, read_image
+from detect.geometry import best_overlap_index, box_iou_matrix
+from detect.stream import iter_video_frames
+from detect.tracking import (
+    DEFAULT_TRACK_EXPIRY_FRAMES,
+    CameraTrackRegistry,
+    match_rider_to_track,
+)
 
 # Import database
 #from database import ViolationDatabase
 
+logger = logging.getLogger(__name__)
+
+# Plate reads shared by every process running from this checkout
+PLATE_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "plate_cache.sqlite3"
+)
+
+# Whole detection results, shared the same way
+RESULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "result_cache.sqlite3"
+)
+
+# What the cascade does not run on a frame whose COCO pass found no two-wheeler
+CASCADE_SKIPPED_STAGES = ("helmet_model", "helmet_rule", "triple_riding_rule", "plate_lookup")
+
+
+def _matched_pairs(images, names):
+    """``zip(images, names)`` that raises ValueError instead of dropping the extras"""
+    if hasattr(images, "__len__") and hasattr(names, "__len__") and len(images) != len(names):
+        raise ValueError(f"Got {len(images)} images but {len(names)} names")
+    sentinel = object()
+    names = iter(names)
+    for image in images:
+        name = next(names, sentinel)
+        if name is sentinel:
+            raise ValueError("More images than names")
+        yield image, name
+    if next(names, sentinel) is not sentinel:
+        raise ValueError("More names than images")
+
 
 class ViolationDetector:
-    def __init__(self):
+    def __init__(
+        self,
+        registry=None,
+        coco_model_size="m",
+        model_format="pytorch",
+        helmet_batch_size=8,
+        coco_batch_size=8,
+        track_expiry_frames=DEFAULT_TRACK_EXPIRY_FRAMES,
+        plate_backend="cloud",
+        plate_cache_path=PLATE_CACHE_PATH,
+        plate_cache_size=1024,
+        plate_cache_ttl=DEFAULT_PLATE_CACHE_TTL,
+        plate_crop_padding=0.15,
+        plate_crop_max_side=1024,
+        plate_crop_quality=90,
+        cascade=True,
+        cascade_confidence=SHARED_PASS_CONFIDENCE,
+        helmet_mode="full",
+        helmet_roi_size=ROI_IMAGE_SIZE,
+        tile_size=None,
+        tile_overlap=TILE_OVERLAP,
+        tile_min_side=TILE_MIN_SIDE,
+        tile_workers=2,
+        preprocess_clahe="bgr",
+        preprocess_sharpen=True,
+        preprocess_helmet=False,
+        result_cache=True,
+        result_cache_path=RESULT_CACHE_PATH,
+        result_cache_size=256,
+        result_cache_disk_entries=10_000,
+        result_cache_ttl=DEFAULT_RESULT_CACHE_TTL,
+    ):
+        # Models are loaded once per process and shared through the registry, in
+        # model_format: "pytorch", an "onnx"/"openvino" export, or an
+        # "int8-static"/"int8-dynamic" quantized variant, cached next to each
+        # checkpoint
+        self.model_format = model_format
+        self.registry = registry or default_registry
+
         # Initialize paths
         self.current_dir = Path(os.path.dirname(os.path.abspath(__file__)))
         self.output_dir = self.current_dir / "output_images"
@@ -32,24 +137,524 @@ class ViolationDetector:
             / "hemletYoloV8_100epochs.pt"
         )
         print(f"[INFO] Using helmet model: {self.helmet_model_path}")
-        self.helmet_model = YOLO(str(self.helmet_model_path))
+        self.helmet_model = self.registry.get_model(self.helmet_model_path, model_format)
+
+        # One general-object (COCO) model serves both triple riding and vehicle
+        # detection; its size (n, s, m, l, x) trades accuracy for speed
+        self.coco_model_size = coco_model_size
+        self.coco_model_path = coco_model_path(coco_model_size)
+        print(f"[INFO] Using COCO model: {self.coco_model_path}")
+        self.coco_model = self.registry.get_model(self.coco_model_path, model_format)
+
+        # Each frame is preprocessed once (see detect.preprocess): preprocess_clahe
+        # "bgr" (per channel), "lab"/"ycrcb" (luminance only) or None, and sharpening.
+        # The COCO pass, and so triple riding and vehicle detection, runs on the
+        # result; with preprocess_helmet the helmet model uses the same frame
+        self.preprocessor = Preprocessor(clahe=preprocess_clahe, sharpen=preprocess_sharpen)
+        self.preprocess_helmet = preprocess_helmet
 
         # Initialize triple riding detector
-        self.triple_rider_detector = TripleRiderDetector()
+        # Use a lower confidence threshold for triple riding detection to improve reliability
+        self.triple_rider_detector = TripleRiderDetector(
+            confidence=0.3, model=self.coco_model, preprocessor=self.preprocessor
+        )
+
+        # Frames per model call in process_batch
+        self.helmet_batch_size = helmet_batch_size
+        self.coco_batch_size = coco_batch_size
+
+        # Tracker state of every camera being streamed (see process_stream)
+        self.camera_tracks = CameraTrackRegistry(track_expiry_frames)
 
         # API Key for license plate recognition
         self.plate_api_key = " " #paste your api key here
+        # Plate reader backend: "cloud" (the Plate Recognizer API, through a pooled
+        # client shared by every detector using this key) or "local" (offline OCR).
+        # It sits behind a content-hash cache so the same image is never read twice
+        # (plate_cache_path=None keeps the cache in memory only)
+        self.plate_backend = create_plate_backend(plate_backend, self.plate_api_key)
+        self.plate_cache = PlateCache(
+            plate_cache_path, max_entries=plate_cache_size, ttl_seconds=plate_cache_ttl
+        )
+        self.plate_reader = CachedPlateReader(self.plate_backend, self.plate_cache)
+
+        # Plates are read from a crop of each violating vehicle, grown by
+        # plate_crop_padding of its size, downscaled to at most plate_crop_max_side
+        # pixels and re-encoded at plate_crop_quality
+        self.plate_crop_padding = plate_crop_padding
+        self.plate_crop_max_side = plate_crop_max_side
+        self.plate_crop_quality = plate_crop_quality
+
+        # Cascade: the COCO pass runs first, and the helmet model and rider rules
+        # only run on frames where it found a motorcycle at cascade_confidence or
+        # above; cascade=False runs every stage on every frame
+        self.cascade = cascade
+        self.cascade_confidence = cascade_confidence
+
+        # helmet_mode "full" runs the helmet model on whole frames; "roi" runs it
+        # on a crop around each motorcycle of the COCO pass, at helmet_roi_size,
+        # so small heads are seen larger and empty road is not processed
+        if helmet_mode not in ("full", "roi"):
+            raise ValueError(f"Unknown helmet mode: {helmet_mode}")
+        self.helmet_mode = helmet_mode
+        self.helmet_roi_size = helmet_roi_size
+
+        # Tiled inference for high-resolution cameras: with tile_size set, frames
+        # whose longer side exceeds tile_min_side are cut into overlapping
+        # tile_size squares (plus the whole frame) for the COCO pass and the
+        # full-frame helmet model, run on tile_workers copies of each model in
+        # parallel, and the tile boxes merged back into one result per frame
+        self.tile_size = tile_size
+        self.coco_tiler = self.helmet_tiler = None
+        if tile_size:
+            print(f"[INFO] Tiling frames over {tile_min_side}px into {tile_size}px tiles")
+            self.coco_tiler = self._tiler(
+                self.coco_model_path, coco_batch_size, tile_overlap, tile_min_side, tile_workers
+            )
+            if helmet_mode == "full":
+                self.helmet_tiler = self._tiler(
+                    self.helmet_model_path,
+                    helmet_batch_size,
+                    tile_overlap,
+                    tile_min_side,
+                    tile_workers,
+                )
+
+        # Whole-result cache: an image whose encoded bytes were seen before by a
+        # detector with the same model files and settings gets the stored result
+        # back without running the models or reading plates. The fingerprint of
+        # those files and settings is part of the key, so changing any of them
+        # invalidates the old entries (result_cache_path=None keeps the cache in
+        # memory only; result_cache=False turns it off)
+        self.result_cache = None
+        if result_cache:
+            fingerprint = config_fingerprint(
+                [self.helmet_model.path, self.coco_model.path],
+                {
+                    "model_format": model_format,
+                    "helmet_confidence": HELMET_CONFIDENCE,
+                    "shared_pass_confidence": SHARED_PASS_CONFIDENCE,
+                    "triple_riding": [
+                        self.triple_rider_detector.confidence,
+                        self.triple_rider_detector.iou,
+                        self.triple_rider_detector.exclusive_riders,
+                    ],
+                    "cascade": [cascade, cascade_confidence],
+                    "helmet_mode": [helmet_mode, helmet_roi_size],
+                    "tiling": [tile_size, tile_overlap, tile_min_side],
+                    "preprocess": [self.preprocessor.describe(), preprocess_helmet],
+                    "plates": [
+                        self.plate_backend.name,
+                        plate_crop_padding,
+                        plate_crop_max_side,
+                        plate_crop_quality,
+                    ],
+                },
+            )
+            self.result_cache = ResultCache(
+                fingerprint,
+                result_cache_path,
+                max_entries=result_cache_size,
+                max_disk_entries=result_cache_disk_entries,
+                ttl_seconds=result_cache_ttl,
+            )
 
         print("[INFO] Violation detection system initialized.")
 
-    def process_image(self, image_path):
-        """Process an image for traffic violations"""
-        # Check if the image exists
-        if not os.path.exists(image_path):
-            print(f"[ERROR] Image not found: {image_path}")
-            return None
+    def _tiler(self, model_path, batch_size, overlap, min_side, workers):
+        return Tiler(
+            self.registry.get_replicas(model_path, self.model_format, workers),
+            tile_size=self.tile_size,
+            overlap=overlap,
+            min_side=min_side,
+            batch_size=batch_size,
+        )
+
+    def process_image(self, image, name=None, persist_evidence=False):
+        """Process an image for traffic violations
+
+        ``image`` may be a path, raw encoded bytes (e.g. straight from an upload) or
+        an already decoded BGR ndarray. It is decoded once and the same frame is
+        passed to every stage. The annotated evidence image is only written to
+        ``output_images`` when ``persist_evidence`` is set. Plate reads are cached
+        by image content, so re-uploading an image never calls the API again.
+
+        With the cascade on, an image whose COCO pass finds no motorcycle skips the
+        helmet model and the rider rules; the result lists them in
+        ``skipped_stages``. With the result cache on, encoded bytes seen before
+        return the stored result with ``cached`` set, without running any model.
+        """
+        return self.process_batch(
+            [image], names=[name], persist_evidence=persist_evidence
+        )[0]
+
+    def process_batch(self, images, names=None, persist_evidence=False):
+        """Process many images, batching the model calls
+
+        ``images`` is any iterable of what ``process_image`` accepts, so a folder of
+        thousands of paths can be streamed through. Frames are decoded a group at a
+        time and run through the helmet model ``helmet_batch_size`` and the COCO
+        model ``coco_batch_size`` frames per call; the rule logic and plate lookup
+        then run per image. Returns one result dict per input, in order, with
+        ``None`` for images that could not be read. ``names``, when given, must
+        match ``images`` one to one; a ``ValueError`` is raised otherwise.
+
+        A group holds as many frames as the larger batch size, so at most that
+        many decoded frames are in memory; the model with the smaller batch size
+        runs a short last batch per group.
+        """
+        pairs = zip(images, repeat(None)) if names is None else _matched_pairs(images, names)
+        group_size = max(self.helmet_batch_size, self.coco_batch_size)
+        results = []
+        while True:
+            group = list(islice(pairs, group_size))
+            if not group:
+                return results
+            results.extend(self._process_group(group, persist_evidence))
+
+    def _process_group(self, group, persist_evidence):
+        """Decode one group of images, run the batched models, then the per-image rules"""
+        inputs = []
+        for image, name in group:
+            image_path = str(image) if isinstance(image, (str, os.PathLike)) else None
+            with metrics.span("decode"):
+                frame, encoded = read_image(image)
+            if frame is None:
+                logger.error(f"Image not found or unreadable: {image_path or name}")
+            inputs.append((frame, encoded, image_path, name))
+
+        results = [None] * len(inputs)
+        keys = [None] * len(inputs)
+        if self.result_cache is not None:
+            for i, (frame, encoded, image_path, name) in enumerate(inputs):
+                # Only encoded images are looked up; decoded frames are not hashed
+                if frame is None or encoded is None:
+                    continue
+                keys[i] = content_key(encoded)
+                cached = self.result_cache.get_result(keys[i])
+                metrics.inc("trafai_result_cache_total", result="hit" if cached else "miss")
+                if cached is not None:
+                    results[i] = self._cached_result(cached, *inputs[i], persist_evidence)
+
+        readable = [
+            i for i, item in enumerate(inputs) if item[0] is not None and results[i] is None
+        ]
+        frames = [inputs[i][0] for i in readable]
+        metrics.inc("trafai_images_total", len(frames))
+
+        helmet_results, coco_frames, coco_detections = self._run_models(frames)
+        for i, helmet, coco_frame, detections in zip(
+            readable, helmet_results, coco_frames, coco_detections
+        ):
+            results[i] = self._evaluate(
+                *inputs[i], helmet, coco_frame, detections, persist_evidence
+            )
+
+        # Read the plate of every violating vehicle in the group concurrently,
+        # uploading a padded, downscaled crop of the vehicle instead of the frame
+        regions = []
+        uploads = []
+        violating = [i for i in readable if results[i]["violations"]]
+        for i in violating:
+            frame, encoded = inputs[i][:2]
+            if not results[i]["plates"]:
+                # No vehicle box to crop: fall back to the whole image
+                results[i]["plates"].append(
+                    {
+                        "box": None,
+                        "violations": list(results[i]["violations"]),
+                        "plate_number": None,
+                    }
+                )
+                regions.append(results[i]["plates"][0])
+                uploads.append(encoded if encoded is not None else frame)
+                continue
+            for region in results[i]["plates"]:
+                regions.append(region)
+                uploads.append(self._plate_upload(frame, region["box"]))
+
+        plates = []
+        if uploads:
+            with metrics.span("plate_lookup"):
+                plates = self.plate_reader.read_many(uploads)
+        for region, plate_number in zip(regions, plates):
+            region["plate_number"] = plate_number
+        for i in violating:
+            self._apply_plates(results[i])
+
+        if self.result_cache is not None:
+            for i in readable:
+                # A plate that could not be read may be read next time
+                if keys[i] is not None and all(
+                    region["plate_number"] for region in results[i]["plates"]
+                ):
+                    self.result_cache.put_result(keys[i], results[i])
+        return results
+
+    def _cached_result(self, result, frame, encoded, image_path, name, persist_evidence):
+        """A result from the cache, with the fields of this call filled in"""
+        result["cached"] = True
+        result["image_path"] = image_path
+        result["output_path"] = None
+        if persist_evidence:
+            result["output_path"] = self._persist_evidence(
+                frame, image_path, name, result["detections"]
+            )
+        return result
+
+    def _persist_evidence(self, frame, image_path, name, detections):
+        """Write the annotated evidence image to ``output_images`` and return its path"""
+        # Create a timestamped output image path for the annotated evidence
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = os.path.basename(image_path or name or "frame.jpg")
+        output_path = os.path.join(
+            str(self.output_dir), f"processed_{timestamp}_{os.path.splitext(filename)[0]}.jpg"
+        )
+        with open(output_path, "wb") as f:
+            f.write(encode_jpeg(render_evidence(frame, detections)))
+        return output_path
+
+    def _plate_upload(self, frame, box):
+        """JPEG bytes of the vehicle region sent to the plate reader"""
+        return encode_region(
+            frame,
+            box,
+            padding=self.plate_crop_padding,
+            max_side=self.plate_crop_max_side,
+            quality=self.plate_crop_quality,
+        )
+
+    def _run_models(self, frames):
+        """Batched model calls for a group of decoded frames.
+
+        The shared COCO pass runs first. With the cascade on, the helmet model
+        only runs on the frames it found a two-wheeler in; the others get
+        ``None`` in place of a helmet result.
+        """
+        # Single COCO pass shared by the triple riding rule and vehicle detection.
+        # It runs on the preprocessed frames, which live in the preprocessor's
+        # buffers until the next group.
+        with metrics.span("preprocess"):
+            coco_frames = self.preprocessor.process_batch(frames)
+        with metrics.span("coco_model"):
+            coco_detections = run_coco_pass_batch(
+                self.coco_tiler or self.coco_model,
+                coco_frames,
+                batch_size=self.coco_batch_size,
+            )
+        metrics.inc(
+            "trafai_detections_total",
+            sum(len(detections) for detections in coco_detections),
+            stage="coco_model",
+        )
+
+        helmet_results = [None] * len(frames)
+        gated = [
+            i
+            for i, detections in enumerate(coco_detections)
+            if not self.cascade or self._has_two_wheeler(detections)
+        ]
+        if gated:
+            with metrics.span("helmet_model"):
+                helmet_frames = coco_frames if self.preprocess_helmet else frames
+                results = self._run_helmet_model(
+                    [helmet_frames[i] for i in gated], [coco_detections[i] for i in gated]
+                )
+            for i, result in zip(gated, results):
+                helmet_results[i] = result
+            metrics.inc(
+                "trafai_detections_total",
+                sum(len(result.boxes) for result in results),
+                stage="helmet_model",
+            )
+        return helmet_results, coco_frames, coco_detections
+
+    def _run_helmet_model(self, frames, coco_detections):
+        """Helmet model results of the frames, on whole frames or on motorcycle crops"""
+        if self.helmet_mode == "full":
+            metrics.inc(
+                "trafai_helmet_pixels_total",
+                sum(frame.shape[0] * frame.shape[1] for frame in frames),
+                mode="full",
+            )
+            return predict_batched(
+                self.helmet_tiler or self.helmet_model,
+                frames,
+                self.helmet_batch_size,
+                conf=HELMET_CONFIDENCE,
+                verbose=False,
+            )
+
+        rois = [
+            rider_rois(
+                filter_detections(
+                    detections, [MOTORCYCLE_CLASS_ID], self.cascade_confidence
+                ).xyxy,
+                frame.shape,
+            )
+            for frame, detections in zip(frames, coco_detections)
+        ]
+        metrics.inc(
+            "trafai_helmet_pixels_total",
+            sum((x2 - x1) * (y2 - y1) for frame_rois in rois for x1, y1, x2, y2 in frame_rois),
+            mode="roi",
+        )
+        return predict_helmet_rois(
+            self.helmet_model,
+            frames,
+            rois,
+            imgsz=self.helmet_roi_size,
+            batch_size=self.helmet_batch_size,
+        )
+
+    def _has_two_wheeler(self, detections):
+        """True if the COCO pass found a motorcycle at ``cascade_confidence`` or above"""
+        return bool(
+            np.any(
+                (detections.class_id == MOTORCYCLE_CLASS_ID)
+                & (detections.confidence >= self.cascade_confidence)
+            )
+        )
+
+    def process_stream(
+        self, source, camera_id=None, stride=None, fps=None, max_frames=None
+    ):
+        """Yield one violation record per tracked object from a video file or stream
 
-        print(f"[INFO] Processing image: {image_path}")
+        Frames are sampled every ``stride`` frames or at about ``fps`` frames per
+        second (see ``detect.stream.iter_video_frames``) and run through the models
+        in groups of ``coco_batch_size``, so at most one group of frames is in memory
+        however long the video is.
+
+        Persons and motorcycles are tracked with the ByteTrack tracker of
+        ``camera_id`` (the source by default). Violations are keyed by tracker ID:
+        a track is reported once, after it has not been seen for
+        ``track_expiry_frames`` sampled frames or when the stream ends, and its
+        plate is read once, from the frame where the object was detected with the
+        highest confidence. Each yielded record is ``TrackedViolation.as_event()``
+        plus ``plate_number``.
+        """
+        camera_id = str(source) if camera_id is None else camera_id
+        camera = self.camera_tracks.get(camera_id)
+        try:
+            sampled = iter_video_frames(
+                source, stride=stride, fps=fps, max_frames=max_frames
+            )
+            while True:
+                group = list(islice(sampled, self.coco_batch_size))
+                if not group:
+                    break
+                frames = [frame for _, _, frame in group]
+                helmet_results, coco_frames, coco_detections = self._run_models(frames)
+                for (index, timestamp, frame), helmet, coco_frame, detections in zip(
+                    group, helmet_results, coco_frames, coco_detections
+                ):
+                    self._track_frame(
+                        camera, index, timestamp, frame, helmet, coco_frame, detections
+                    )
+                    yield from self._finalize_tracks(camera.expire())
+
+            # The stream has ended: report what is still open
+            yield from self._finalize_tracks(camera.flush())
+        finally:
+            # Drop the camera state however the stream stops: at its end, on an
+            # error, or when the consumer closes the generator early
+            self.camera_tracks.discard(camera_id)
+
+    def _track_frame(
+        self, camera, index, timestamp, frame, helmet_results, coco_frame, detections
+    ):
+        """Track one video frame and attach its violations to the tracks they belong to"""
+        tracked = camera.update(
+            filter_detections(
+                detections,
+                [PERSON_CLASS_ID, MOTORCYCLE_CLASS_ID],
+                self.triple_rider_detector.confidence,
+            )
+        )
+
+        frame_violations = {}
+        if helmet_results is None:
+            # Cascade: no two-wheeler in this frame; it only keeps the tracks going
+            camera.record(index, timestamp, frame, tracked, frame_violations)
+            return
+        for violation in self.triple_rider_detector.find_triple_riders(
+            coco_frame, detections=tracked
+        ):
+            frame_violations.setdefault(violation["tracker_id"], []).append(
+                "Triple Riding"
+            )
+        for rider_box in helmetless_riders(helmet_results):
+            track_id = match_rider_to_track(rider_box, tracked)
+            if track_id is None:
+                logger.debug(
+                    "Helmetless rider at %s in frame %d matches no tracked object; skipped",
+                    rider_box,
+                    index,
+                )
+                continue
+            frame_violations.setdefault(track_id, []).append("No Helmet")
+
+        camera.record(index, timestamp, frame, tracked, frame_violations)
+
+    def _finalize_tracks(self, states):
+        """Read each track's plate once, from its box in its best frame, and build the records.
+
+        The plates of tracks closing together are read concurrently.
+        """
+        if not states:
+            return []
+        with metrics.span("plate_lookup"):
+            plates = self.plate_reader.read_many(
+                self._plate_upload(state.best_frame, state.best_box) for state in states
+            )
+        events = []
+        for state, plate_number in zip(states, plates):
+            event = state.as_event()
+            event["plate_number"] = plate_number
+            state.best_frame = None
+            for violation in event["violations"]:
+                metrics.inc("trafai_violations_total", violation=violation)
+            logger.info(
+                f"Track {state.track_id} on {state.camera_id}: "
+                f"{event['violations']} over {state.frames_seen} frames, "
+                f"plate {event['plate_number']}"
+            )
+            events.append(event)
+        return events
+
+    def _evaluate(
+        self,
+        frame,
+        encoded,
+        image_path,
+        name,
+        helmet_results,
+        coco_frame,
+        coco_detections,
+        persist_evidence,
+    ):
+        """Apply the violation rules to one decoded image (the plate is read later)"""
+        with metrics.span("rules"):
+            result = self._apply_rules(
+                frame, image_path, name, helmet_results, coco_frame, coco_detections,
+                persist_evidence,
+            )
+        for violation in result["violations"]:
+            metrics.inc("trafai_violations_total", violation=violation)
+        return result
+
+    def _apply_rules(
+        self,
+        frame,
+        image_path,
+        name,
+        helmet_results,
+        coco_frame,
+        coco_detections,
+        persist_evidence,
+    ):
+        logger.debug("Processing image: %s", image_path or name or "in-memory frame")
         result = {
             "violations": [],
             "plate_number": None,
@@ -57,64 +662,145 @@ class ViolationDetector:
             "violation_count": 0,
             "image_path": image_path,
             "output_path": None,
+            "vehicles": [],
+            # Per-rider helmet matches and triple riding motorcycles
+            "riders": [],
+            "triple_riding": [],
+            # Confidence of the strongest detection behind each violation
+            "confidences": {},
+            # One entry per violating vehicle: box, violations and plate_number
+            "plates": [],
+            # Every box to draw on the evidence image, with its violation tags
+            # (see detect.evidence); the image itself is rendered when viewed
+            "detections": [],
+            # Stages the cascade did not run on this image (see CASCADE_SKIPPED_STAGES)
+            "skipped_stages": [],
+            # Set when the result came from the result cache
+            "cached": False,
         }
 
-        # Create a timestamped output image path
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = os.path.basename(image_path)
-        output_path = os.path.join(
-            str(self.output_dir), f"processed_{timestamp}_{filename}"
-        )
+        if helmet_results is None:
+            # Cascade: no two-wheeler in the COCO pass, so neither violation is possible
+            result["skipped_stages"] = list(CASCADE_SKIPPED_STAGES)
+            for stage in CASCADE_SKIPPED_STAGES:
+                metrics.inc("trafai_skipped_stages_total", stage=stage)
+            logger.debug("No two-wheeler in the frame; rider checks skipped")
+        else:
+            self._check_riders(result, helmet_results, coco_frame, coco_detections)
 
-        # Copy the original image to the output path for annotation
-        shutil.copy(image_path, output_path)
-        result["output_path"] = output_path
+        # Vehicle detection reuses the COCO pass
+        result["vehicles"] = detect_vehicles(frame, detections=coco_detections)
 
-        # Check for helmet violation using the actual detection function
-        print(f"[INFO] Checking for helmet violations in: {image_path}")
-        has_helmet_violation = helmet_violation_in_image(self.helmet_model, image_path)
-        print(f"[INFO] Helmet detection result: {has_helmet_violation}")
+        if result["violations"]:
+            result["plates"] = self._plate_regions(result, coco_detections)
+        else:
+            logger.debug("No violations detected in the image")
+        result["detections"] = evidence_detections(result)
 
-        if has_helmet_violation:
+        if persist_evidence:
+            result["output_path"] = self._persist_evidence(
+                frame, image_path, name, result["detections"]
+            )
+
+        return result
+
+    def _check_riders(self, result, helmet_results, coco_frame, coco_detections):
+        """Helmet and triple riding rules, recorded into ``result``"""
+        # Check for helmet violation, rider by rider
+        logger.debug("Checking for helmet violations")
+        result["riders"] = rider_helmet_results(helmet_results)
+        helmetless = [rider for rider in result["riders"] if not rider["helmet"]]
+        logger.debug(
+            "Helmet detection result: %d of %d riders without a helmet",
+            len(helmetless),
+            len(result["riders"]),
+        )
+
+        if helmetless:
             result["violations"].append("No Helmet")
-            print("[INFO] Helmet violation detected.")
+            result["confidences"]["No Helmet"] = max(
+                rider["confidence"] for rider in helmetless
+            )
+            logger.debug("Helmet violation detected")
+
+        logger.debug("COCO pass found %d objects", len(coco_detections))
 
         # Check for triple riding violation
-        print("[INFO] Checking for triple riding violation...")
-        # Use a lower confidence threshold for triple riding detection to improve reliability
-        self.triple_rider_detector.confidence = (
-            0.3  # Adjust confidence for better detection
-        )
-        has_triple_riding_violation = (
-            self.triple_rider_detector.has_triple_riding_violation_from_path(image_path)
+        logger.debug("Checking for triple riding violation")
+        triple_riding = self.triple_rider_detector.find_triple_riders(
+            coco_frame, detections=coco_detections
         )
-        print(f"[INFO] Triple riding detection result: {has_triple_riding_violation}")
+        result["triple_riding"] = [
+            {
+                "box": [float(v) for v in violation["box"]],
+                "confidence": violation["confidence"],
+                "riders": [[float(v) for v in rider] for rider in violation["riders"]],
+            }
+            for violation in triple_riding
+        ]
+        logger.debug("Triple riding detection result: %s", bool(triple_riding))
 
-        if has_triple_riding_violation:
+        if triple_riding:
             result["violations"].append("Triple Riding")
-            print("[INFO] Triple riding violation detected.")
-        else:
-            print("[INFO] No triple riding violation detected.")
+            result["confidences"]["Triple Riding"] = max(
+                violation["confidence"] for violation in triple_riding
+            )
+            logger.debug("Triple riding violation detected")
 
-        # Use vehicle detection (this creates a vehicle_detection_output.jpg file)
-        detect_vehicles(image_path)
+    def _plate_regions(self, result, coco_detections):
+        """Violating vehicles of an image, each with the violations it carries.
 
-        # Extract license plate if any violation was detected
-        if result["violations"]:
-            plate_number = extract_plate_text_from_api(image_path, self.plate_api_key)
-            if plate_number:
-                result["plate_number"] = plate_number
+        A triple riding violation is its motorcycle. A helmetless rider is given to
+        the motorcycle under them: the one whose box, stretched upwards by its own
+        height, overlaps the rider most. A rider on no detected motorcycle becomes a
+        region of its own, extended downwards to where the plate would be.
+        """
+        motorcycles = filter_detections(coco_detections, [MOTORCYCLE_CLASS_ID]).xyxy
+        seated = motorcycles.astype(np.float64).copy()
+        seated[:, 1] -= seated[:, 3] - seated[:, 1]
 
-                # Logging and repeat offender logic now handled by Django view
-                print(
-                    f"[INFO] Plate: {plate_number}, Violations: {result['violations']}"
-                )
+        regions = {}
+
+        def add(key, box, violation):
+            region = regions.setdefault(
+                key,
+                {"box": [float(v) for v in box], "violations": [], "plate_number": None},
+            )
+            if violation not in region["violations"]:
+                region["violations"].append(violation)
+
+        for violation in result["triple_riding"]:
+            index = int(np.argmax(box_iou_matrix(violation["box"], motorcycles)[0]))
+            add(index, motorcycles[index], "Triple Riding")
+
+        for rider in result["riders"]:
+            if rider["helmet"]:
+                continue
+            index = best_overlap_index(rider["box"], seated)
+            if index is not None:
+                add(index, motorcycles[index], "No Helmet")
             else:
-                print("[WARNING] License plate not detected. Violation not logged.")
-        else:
-            print("[INFO] No violations detected in the image.")
+                x1, y1, x2, y2 = rider["box"]
+                add(("rider", x1, y1), [x1, y1, x2, y2 + (y2 - y1)], "No Helmet")
+        return list(regions.values())
 
-        return result
+    def _apply_plates(self, result):
+        """Set the image's plate from its vehicles' plates (the first one read)"""
+        for region in result["plates"]:
+            if region["plate_number"]:
+                logger.debug(
+                    "Plate: %s, Violations: %s",
+                    region["plate_number"],
+                    region["violations"],
+                )
+                if result["plate_number"] is None:
+                    result["plate_number"] = region["plate_number"]
+        if result["plate_number"] is None:
+            logger.info("License plate not detected. Violation not logged.")
+
+    def warm_up(self):
+        """Run a dummy inference through every model and return the registry report"""
+        return self.registry.warm_up()
 
     def get_repeat_offenders(self):
         """No longer implemented. Use Django ORM in views."""
@@ -135,3 +821,28 @@ class ViolationDetector:
     def delete_all_violations(self):
         """No longer implemented. Use Django ORM in views."""
         return None
+
+
+def get_violation_detector(registry=None, **options):
+    """Return the detector shared by every request in this worker process.
+
+    ``options`` are passed to ``ViolationDetector``; each distinct set of options
+    gets its own shared instance.
+    """
+    registry = registry or default_registry
+    key = ("ViolationDetector",) + tuple(sorted(options.items()))
+    return registry.get_or_create(
+        key, lambda: ViolationDetector(registry=registry, **options)
+    )
+
+
+def warm_up_violation_detector(registry=None, **options):
+    """Build the shared detector and warm its models, returning the load/latency report"""
+    detector = get_violation_detector(registry, **options)
+    report = detector.warm_up()
+    for path, model in report["models"].items():
+        print(
+            f"[INFO] {os.path.basename(path)}: load {model['load_seconds']:.2f}s, "
+            f"warm-up {model['warmup_seconds']:.2f}s"
+        )
+    return report
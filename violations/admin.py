@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Offender, Violation
+from .models import DetectionJob, MediaBlob, Offender, Violation
 
 @admin.register(Offender)
 class OffenderAdmin(admin.ModelAdmin):
@@ -12,3 +12,14 @@ class ViolationAdmin(admin.ModelAdmin):
     list_display = ("plate_number", "violation_type", "date_time", "image_path", "confidence")
     search_fields = ("plate_number__plate_number", "violation_type")
     list_filter = ("violation_type",)
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ("sha256", "size", "width", "height", "ref_count", "created_at")
+    readonly_fields = ("sha256", "size", "width", "height", "ref_count")
+
+@admin.register(DetectionJob)
+class DetectionJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "image_name", "status", "worker", "created_at", "started_at", "finished_at")
+    list_filter = ("status",)
+    exclude = ("image_data",)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ViolationsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "violations"
+
+    def ready(self):
+        # Stored images are released however a violation is deleted
+        from . import signals  # noqa: F401
@@ -0,0 +1,47 @@
+import os
+
+from django.conf import settings
+
+from detect.evidence import DEFAULT_EVIDENCE_CACHE_BYTES, EvidenceCache, file_digest
+from detect.frames import decode_image
+
+from .media_store import blob_path, media_path
+
+_cache = None
+
+
+def evidence_cache():
+    """The evidence cache of this process, configured from the settings"""
+    global _cache
+    if _cache is None:
+        _cache = EvidenceCache(
+            getattr(settings, 'EVIDENCE_CACHE_DIR', os.path.join(settings.BASE_DIR, 'evidence_cache')),
+            getattr(settings, 'EVIDENCE_CACHE_MAX_BYTES', DEFAULT_EVIDENCE_CACHE_BYTES),
+        )
+    return _cache
+
+
+def _load(path):
+    with open(path, 'rb') as f:
+        return decode_image(f.read())
+
+
+def evidence_path(image_url, detections, media=None):
+    """Path of the annotated evidence image, rendered now if not cached.
+
+    Stored media is drawn on its "full" derivative, whose content hash is already
+    known; images saved before the media store are hashed from the file.
+    Returns ``None`` when the source image is gone.
+    """
+    if media is not None:
+        source = blob_path(media, 'full')
+        if os.path.exists(source):
+            return evidence_cache().get(
+                f"{media.sha256}:full", detections, lambda: _load(source), media.width
+            )
+        image_url = media.url
+
+    source = media_path(image_url)
+    if not os.path.exists(source):
+        return None
+    return evidence_cache().get(file_digest(source), detections, lambda: _load(source))
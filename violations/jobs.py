@@ -0,0 +1,236 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.urls import reverse
+from django.utils import timezone
+
+from detect.metrics import metrics
+
+from .media_store import iter_chunks, store_media
+from .models import DetectionJob, Offender, Violation
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_detection(image_name, content_type, data):
+    """Queue an uploaded image for the detection workers"""
+    return DetectionJob.objects.create(
+        image_name=image_name,
+        content_type=content_type or '',
+        image_data=data,
+    )
+
+
+def claim_next_job(worker_name):
+    """Atomically take the oldest queued job, or return None when the queue is empty.
+
+    The claim is a conditional UPDATE on the job's status, so when several worker
+    processes race for the same job exactly one of them wins and the others move
+    on to the next one.
+    """
+    while True:
+        job_id = (
+            DetectionJob.objects.filter(status=DetectionJob.QUEUED)
+            .order_by('id')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+        claimed = DetectionJob.objects.filter(id=job_id, status=DetectionJob.QUEUED).update(
+            status=DetectionJob.RUNNING,
+            started_at=timezone.now(),
+            worker=worker_name,
+        )
+        if claimed:
+            return DetectionJob.objects.get(id=job_id)
+
+
+def requeue_stale_jobs(older_than_seconds):
+    """Put back jobs left running by a worker that died mid-job"""
+    cutoff = timezone.now() - timedelta(seconds=older_than_seconds)
+    return DetectionJob.objects.filter(
+        status=DetectionJob.RUNNING, started_at__lt=cutoff, image_data__isnull=False
+    ).update(status=DetectionJob.QUEUED, started_at=None, worker='')
+
+
+def plate_offenses(detection_result):
+    """Violations of a detection result per plate read, and those of no readable plate.
+
+    Two crops can read the same plate; each violation type is logged once per
+    plate, and once for all the vehicles whose plate could not be read.
+    """
+    offenses = {}
+    unplated = []
+    for vehicle in detection_result['plates']:
+        violations = (
+            offenses.setdefault(vehicle['plate_number'], [])
+            if vehicle['plate_number'] else unplated
+        )
+        violations.extend(v for v in vehicle['violations'] if v not in violations)
+    # A violation found on no vehicle region has no plate either
+    logged = {v for violations in offenses.values() for v in violations}.union(unplated)
+    unplated.extend(v for v in detection_result['violations'] if v not in logged)
+    return offenses, unplated
+
+
+def record_detection(detection_result, image_url, media=None, offenses=None):
+    """Log the violations of a detection result and return the summary lines shown to the user
+
+    Violations are logged per vehicle, against the plate read from that vehicle,
+    so a frame with several violators updates each offender; violations whose
+    plate could not be read are logged without one, keeping their image as
+    evidence. ``offenses`` is what ``plate_offenses`` returns for the result.
+    ``media`` is the stored image, already holding one reference per violation
+    logged here.
+    """
+    results = []
+    if not detection_result['violations']:
+        results.append("No violations detected.")
+        return results
+
+    if offenses is None:
+        offenses = plate_offenses(detection_result)
+    plated, unplated = offenses
+
+    def log(violation_type, offender):
+        Violation.objects.create(
+            plate_number=offender,
+            violation_type=violation_type,
+            image_path=image_url,
+            media=media,
+            confidence=detection_result['confidences'].get(violation_type, 0.0),
+            detections=detection_result.get('detections'),
+        )
+
+    for plate_number, violations in plated.items():
+        # Get or create offender
+        offender, created = Offender.objects.get_or_create(plate_number=plate_number)
+        for violation_type in violations:
+            log(violation_type, offender)
+        # Update offender stats
+        total_violations = Violation.objects.filter(plate_number=offender).count()
+        last_violation = Violation.objects.filter(plate_number=offender).order_by('-date_time').first().date_time
+        is_repeat = total_violations > 3
+        offender.total_violations = total_violations
+        offender.last_violation = last_violation
+        offender.is_repeat_offender = is_repeat
+        offender.save()
+        results.append(f"Violations Detected: {', '.join(violations)}")
+        results.append(f"License Plate: {plate_number}")
+        results.append(f"Repeat Offender: {'Yes' if is_repeat else 'No'} (Total: {total_violations})")
+
+    if unplated:
+        for violation_type in unplated:
+            log(violation_type, None)
+        results.append(f"Violations Detected: {', '.join(unplated)}")
+        results.append("License Plate: Not Detected")
+    return results
+
+
+def process_job(job, detector=None):
+    """Run detection for a claimed job, log its violations and store the outcome"""
+    if detector is None:
+        from violation_detector import get_violation_detector
+
+        detector = get_violation_detector(**settings.VIOLATION_DETECTOR_OPTIONS)
+
+    data = bytes(job.image_data)
+    try:
+        detection_result = detector.process_image(data, name=job.image_name)
+        if detection_result is None:
+            raise ValueError('Could not decode the uploaded image.')
+        # Persist the upload when violations are logged, plate read or not,
+        # with all of their references at once; the same image uploaded again
+        # is stored once. Storing and logging commit together, so the counts
+        # always match the violations pointing at the blob
+        offenses = plate_offenses(detection_result)
+        plated, unplated = offenses
+        references = sum(len(violations) for violations in plated.values()) + len(unplated)
+        with transaction.atomic():
+            media = None
+            if references:
+                media = store_media(
+                    iter_chunks(data), job.image_name, job.content_type, references=references
+                )
+            image_url = media.url if media else None
+            with metrics.span('db_write'):
+                lines = record_detection(detection_result, image_url, media, offenses)
+        job.result = {
+            'lines': lines,
+            'image_url': image_url,
+            'media': media.sha256 if media else None,
+            'detection': detection_result,
+        }
+        job.status = DetectionJob.DONE
+    except Exception as e:
+        logger.exception(f"Detection job {job.id} failed")
+        job.error = str(e)
+        job.status = DetectionJob.FAILED
+    job.image_data = None
+    job.finished_at = timezone.now()
+    with metrics.span('job_save'):
+        job.save()
+    return job
+
+
+def job_status(job):
+    """JSON-serialisable view of a job for the polling endpoint"""
+    status = {
+        'id': job.id,
+        'status': job.status,
+        'image_name': job.image_name,
+        'wait_seconds': job.wait_seconds,
+        'processing_seconds': job.processing_seconds,
+    }
+    if job.status == DetectionJob.QUEUED:
+        status['queue_position'] = DetectionJob.objects.filter(
+            status=DetectionJob.QUEUED, id__lt=job.id
+        ).count() + 1
+    elif job.status == DetectionJob.DONE:
+        status['results'] = job.result['lines']
+        status['image_url'] = job.result['image_url']
+        status['evidence_url'] = (
+            reverse('job_evidence', args=[job.id]) if job.result['image_url'] else None
+        )
+    elif job.status == DetectionJob.FAILED:
+        status['error'] = job.error
+    return status
+
+
+def _summary(values):
+    if not values:
+        return {'count': 0, 'mean': None, 'p50': None, 'p95': None, 'max': None}
+    values = sorted(values)
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values),
+        'p50': values[len(values) // 2],
+        'p95': values[min(len(values) - 1, int(len(values) * 0.95))],
+        'max': values[-1],
+    }
+
+
+def queue_stats(window=200):
+    """Queue depth plus wait and processing times of the last ``window`` finished jobs"""
+    counts = dict(
+        DetectionJob.objects.values_list('status').annotate(total=Count('id')).order_by()
+    )
+    finished = DetectionJob.objects.filter(
+        status__in=[DetectionJob.DONE, DetectionJob.FAILED], started_at__isnull=False
+    ).only('created_at', 'started_at', 'finished_at').order_by('-finished_at')[:window]
+    oldest = DetectionJob.objects.filter(status=DetectionJob.QUEUED).only('created_at').order_by('id').first()
+    return {
+        'depth': counts.get(DetectionJob.QUEUED, 0),
+        'running': counts.get(DetectionJob.RUNNING, 0),
+        'done': counts.get(DetectionJob.DONE, 0),
+        'failed': counts.get(DetectionJob.FAILED, 0),
+        'oldest_queued_seconds': (
+            (timezone.now() - oldest.created_at).total_seconds() if oldest else None
+        ),
+        'wait_seconds': _summary([job.wait_seconds for job in finished]),
+        'processing_seconds': _summary([job.processing_seconds for job in finished]),
+    }
@@ -0,0 +1,113 @@
+import multiprocessing
+import os
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+def worker_loop(worker_name, poll_seconds):
+    """Body of one detection worker process: load the models once, then drain the queue"""
+    import django
+
+    django.setup()
+
+    from detect.metrics import metrics
+    from detect.model_registry import registry
+    from violation_detector import get_violation_detector, warm_up_violation_detector
+    from violations.jobs import claim_next_job, process_job
+
+    # Ctrl+C is handled by the parent, which stops workers with SIGTERM; a worker
+    # finishes the job it is on before exiting
+    stopping = []
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+
+    warm_up_violation_detector(**settings.VIOLATION_DETECTOR_OPTIONS)
+    detector = get_violation_detector(**settings.VIOLATION_DETECTOR_OPTIONS)
+    metrics_path = os.path.join(settings.METRICS_DIR, f"{worker_name}.json")
+    # The models are only loaded here, not in the web process: publish their report
+    report_path = os.path.join(settings.MODEL_REPORTS_DIR, f"{worker_name}.json")
+    registry.dump(report_path)
+    print(f"[INFO] {worker_name} ready")
+    while not stopping:
+        job = claim_next_job(worker_name)
+        if job is None:
+            time.sleep(poll_seconds)
+            continue
+        job = process_job(job, detector)
+        metrics.dump(metrics_path)
+        registry.dump(report_path)
+        print(
+            f"[INFO] {worker_name} finished job {job.id} ({job.status}) "
+            f"after {job.wait_seconds:.2f}s queued, {job.processing_seconds:.2f}s processing"
+        )
+
+
+class Command(BaseCommand):
+    help = "Run a pool of long-lived worker processes that process queued detection jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=settings.DETECTION_WORKERS,
+            help="Number of worker processes (each loads its own copy of the models)",
+        )
+        parser.add_argument(
+            "--poll-seconds", type=float, default=settings.DETECTION_WORKER_POLL_SECONDS,
+            help="How often an idle worker checks the queue",
+        )
+
+    def start_worker(self, context, index, poll_seconds):
+        worker = context.Process(
+            target=worker_loop,
+            args=(f"worker-{os.getpid()}-{index}", poll_seconds),
+            daemon=True,
+        )
+        worker.start()
+        return worker
+
+    def handle(self, *args, **options):
+        from violations.jobs import requeue_stale_jobs
+        from violations.media_store import collect_unreferenced_media
+
+        requeued = requeue_stale_jobs(settings.DETECTION_JOB_STALE_SECONDS)
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s)")
+        collected = collect_unreferenced_media()
+        if collected:
+            self.stdout.write(f"Deleted {collected} unreferenced stored image(s)")
+
+        # Metrics and model reports of a previous pool are dropped; the counters
+        # start again from zero
+        for directory in (settings.METRICS_DIR, settings.MODEL_REPORTS_DIR):
+            os.makedirs(directory, exist_ok=True)
+            for filename in os.listdir(directory):
+                if filename.endswith(".json"):
+                    os.remove(os.path.join(directory, filename))
+
+        # Spawn rather than fork: each worker gets a clean interpreter, its own
+        # database connection and its own torch state, on every platform
+        context = multiprocessing.get_context("spawn")
+        workers = [
+            self.start_worker(context, i, options["poll_seconds"])
+            for i in range(options["workers"])
+        ]
+        self.stdout.write(f"Started {len(workers)} detection worker(s); Ctrl+C to stop")
+
+        try:
+            while True:
+                for i, worker in enumerate(workers):
+                    if not worker.is_alive():
+                        # Replace a crashed worker so the pool keeps its size
+                        self.stderr.write(f"Worker {worker.pid} exited ({worker.exitcode}), restarting")
+                        workers[i] = self.start_worker(context, i, options["poll_seconds"])
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping detection workers")
+        finally:
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+            for worker in workers:
+                worker.join()
@@ -0,0 +1,178 @@
+import hashlib
+import logging
+import mimetypes
+import os
+import tempfile
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from detect.frames import decode_image, encode_jpeg, fit_within
+
+from .models import MediaBlob, Violation
+
+logger = logging.getLogger(__name__)
+
+# Derivatives made of every stored image: longer side (pixels) and JPEG quality.
+# "thumb" is shown in the logs table, "full" is what evidence is drawn on
+DERIVATIVES = {
+    'thumb': (192, 80),
+    'full': (1920, 90),
+}
+CHUNK_SIZE = 1024 * 1024
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def media_root():
+    return getattr(settings, 'MEDIA_ROOT', os.path.join(settings.BASE_DIR, 'media'))
+
+
+def media_path(image_url):
+    """Filesystem path of a file under MEDIA_ROOT, from its URL"""
+    rel_path = image_url.replace(settings.MEDIA_URL, '', 1).replace('\\', '/').lstrip('/')
+    return os.path.join(media_root(), rel_path)
+
+
+def blob_path(blob, tier=None):
+    """Filesystem path of a blob's original, or of its derivative ``tier``"""
+    return os.path.join(media_root(), blob.file_name(tier))
+
+
+def iter_chunks(data, chunk_size=CHUNK_SIZE):
+    """``data`` in slices of ``chunk_size`` bytes, without copying it"""
+    view = memoryview(data)
+    for start in range(0, len(view), chunk_size):
+        yield view[start:start + chunk_size]
+
+
+def _extension(name, content_type):
+    extension = os.path.splitext(name or '')[1].lower()
+    if extension in IMAGE_EXTENSIONS:
+        return '.jpg' if extension == '.jpeg' else extension
+    return mimetypes.guess_extension(content_type or '') or '.jpg'
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _install(blob, tmp_path):
+    """Move a new blob's file into place and write its derivatives"""
+    path = blob_path(blob)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(tmp_path, 'rb') as f:
+        frame = decode_image(f.read())
+    if frame is not None:
+        blob.height, blob.width = frame.shape[:2]
+        for tier, (max_side, quality) in DERIVATIVES.items():
+            _write_atomic(blob_path(blob, tier), encode_jpeg(fit_within(frame, max_side), quality))
+    else:
+        logger.warning(f"Stored {blob.sha256} without derivatives: not a decodable image")
+    os.replace(tmp_path, path)
+
+
+def store_media(chunks, name='', content_type='', references=1):
+    """Store an image by content and return its MediaBlob.
+
+    ``chunks`` (any iterable of bytes, e.g. ``iter_chunks(data)`` or an upload's
+    ``chunks()``) is written to a temporary file while it is hashed. Content
+    already stored is not written again: the temporary file is dropped and the
+    existing blob returned. ``references`` are added to its count in the same
+    update that finds the row, so a concurrent ``release_media`` either deletes
+    the blob first (and it is stored again) or sees the new references.
+    """
+    if references < 1:
+        raise ValueError('Media is only stored with at least one reference')
+    tmp_dir = os.path.join(media_root(), 'blobs', 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                digest.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        sha256 = digest.hexdigest()
+
+        for attempt in range(2):
+            try:
+                with transaction.atomic():
+                    if add_references(sha256, references):
+                        return MediaBlob.objects.get(sha256=sha256)
+                    blob = MediaBlob(
+                        sha256=sha256,
+                        extension=_extension(name, content_type),
+                        content_type=content_type or '',
+                        size=size,
+                        ref_count=references,
+                    )
+                    _install(blob, tmp_path)
+                    blob.save(force_insert=True)
+                    return blob
+            except IntegrityError:
+                # Another process stored the same content first: use its row
+                if attempt:
+                    raise
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def add_references(sha256, count=1):
+    """Add ``count`` references to a stored blob; returns False if there is none"""
+    return bool(MediaBlob.objects.filter(sha256=sha256).update(ref_count=F('ref_count') + count))
+
+
+def _remove_blob_files(blob):
+    for tier in [None, *DERIVATIVES]:
+        try:
+            os.remove(blob_path(blob, tier))
+        except FileNotFoundError:
+            pass
+
+
+def release_media(sha256, count=1):
+    """Drop ``count`` references to a blob, deleting it and its files at zero.
+
+    The files are removed before the transaction commits, while the row is still
+    locked, so a ``store_media`` of the same content waiting on that lock writes
+    them again rather than losing them. Returns True if the blob was deleted.
+    """
+    with transaction.atomic():
+        MediaBlob.objects.filter(sha256=sha256).update(ref_count=F('ref_count') - count)
+        blob = MediaBlob.objects.filter(sha256=sha256, ref_count__lte=0).first()
+        if blob is None:
+            return False
+        _remove_blob_files(blob)
+        blob.delete()
+    return True
+
+
+def collect_unreferenced_media():
+    """Delete blobs no violation references, e.g. uploads stored before every
+    stored image had to carry a reference. Returns how many were deleted."""
+    deleted = 0
+    for sha256 in MediaBlob.objects.filter(ref_count__lte=0).values_list('sha256', flat=True):
+        deleted += release_media(sha256, 0)
+    return deleted
+
+
+def legacy_image_paths(violations):
+    """Files of violations saved before the media store, not shared with other rows"""
+    paths = []
+    for image_path in (
+        violations.filter(media__isnull=True, image_path__isnull=False)
+        .values_list('image_path', flat=True)
+        .distinct()
+    ):
+        if image_path and not Violation.objects.filter(image_path=image_path).exclude(
+            id__in=violations.values('id')
+        ).exists():
+            paths.append(media_path(image_path))
+    return paths
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('violations', '0002_detectionjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='violation',
+            name='detections',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
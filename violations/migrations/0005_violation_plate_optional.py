@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('violations', '0004_media_blob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='violation',
+            name='plate_number',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='violations.offender'),
+        ),
+    ]
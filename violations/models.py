@@ -1,5 +1,37 @@
+from django.conf import settings
 from django.db import models
 
+class MediaBlob(models.Model):
+    """An image stored once by content (see violations.media_store).
+
+    ``ref_count`` is the number of violations pointing at it; the files are
+    deleted with the row when it drops to zero.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    extension = models.CharField(max_length=8)
+    content_type = models.CharField(max_length=64, blank=True)
+    size = models.BigIntegerField()
+    width = models.IntegerField(null=True, blank=True)
+    height = models.IntegerField(null=True, blank=True)
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def file_name(self, tier=None):
+        """Path under MEDIA_ROOT of the original, or of a derivative ``tier``"""
+        suffix = f".{tier}.jpg" if tier else self.extension
+        return f"blobs/{self.sha256[:2]}/{self.sha256}{suffix}"
+
+    @property
+    def url(self):
+        return settings.MEDIA_URL + self.file_name()
+
+    @property
+    def thumbnail_url(self):
+        return settings.MEDIA_URL + self.file_name('thumb')
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count} refs)"
+
 class Offender(models.Model):
     plate_number = models.CharField(max_length=32, primary_key=True)
     total_violations = models.IntegerField(default=1)
@@ -10,11 +42,61 @@ class Offender(models.Model):
         return self.plate_number
 
 class Violation(models.Model):
-    plate_number = models.ForeignKey(Offender, on_delete=models.CASCADE, to_field='plate_number')
+    # None when no plate could be read; the violation and its image are still kept
+    plate_number = models.ForeignKey(
+        Offender, on_delete=models.CASCADE, to_field='plate_number', null=True, blank=True
+    )
     violation_type = models.CharField(max_length=64)
     date_time = models.DateTimeField(auto_now_add=True)
     image_path = models.CharField(max_length=256, blank=True, null=True)
+    # The stored image; image_path is its URL (older rows only have image_path)
+    media = models.ForeignKey(
+        MediaBlob, null=True, blank=True, on_delete=models.SET_NULL, related_name='violations'
+    )
     confidence = models.FloatField(default=0.0)
+    # Boxes of the evidence image, drawn when it is viewed (see detect.evidence)
+    detections = models.JSONField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.plate_number} - {self.violation_type} - {self.date_time}"
+
+class DetectionJob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    image_name = models.CharField(max_length=256)
+    content_type = models.CharField(max_length=64, blank=True)
+    # Upload bytes, kept only until a worker has processed the job
+    image_data = models.BinaryField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def wait_seconds(self):
+        """Time spent queued before a worker picked the job up"""
+        if self.started_at is None:
+            return None
+        return (self.started_at - self.created_at).total_seconds()
+
+    @property
+    def processing_seconds(self):
+        """Time a worker spent on the job"""
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return (self.finished_at - self.started_at).total_seconds()
+
+    def __str__(self):
+        return f"Job {self.id} - {self.image_name} - {self.status}"
@@ -0,0 +1,19 @@
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .media_store import release_media
+from .models import Violation
+
+
+@receiver(post_delete, sender=Violation)
+def release_deleted_violation_media(sender, instance, **kwargs):
+    """Drop the deleted violation's reference to its stored image.
+
+    Covers every way a violation goes: the views, the admin (one or a queryset)
+    and the cascade from its offender. The reference is released once the
+    deletion commits, so a rolled back delete keeps the image.
+    """
+    if instance.media_id is not None:
+        sha256 = instance.media_id
+        transaction.on_commit(lambda: release_media(sha256))
@@ -1,3 +1,173 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+import cv2
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from detect.tracking import CameraTrackRegistry
+from violation_detector import ViolationDetector
+
+from .jobs import enqueue_detection, process_job
+from .media_store import blob_path, iter_chunks, store_media
+from .models import MediaBlob, Offender, Violation
+
+
+class ProcessBatchGroupingTests(SimpleTestCase):
+    def detector(self, helmet_batch_size, coco_batch_size):
+        # The grouping needs no models
+        detector = ViolationDetector.__new__(ViolationDetector)
+        detector.helmet_batch_size = helmet_batch_size
+        detector.coco_batch_size = coco_batch_size
+        return detector
+
+    def test_groups_are_bounded_by_the_larger_batch_size(self):
+        detector = self.detector(16, 15)
+        sizes = []
+
+        def process_group(group, persist_evidence):
+            sizes.append(len(group))
+            return [None] * len(group)
+
+        with mock.patch.object(detector, '_process_group', side_effect=process_group):
+            results = detector.process_batch(range(100))
+        self.assertEqual(len(results), 100)
+        self.assertEqual(max(sizes), 16)
+        self.assertEqual(sum(sizes), 100)
+
+    def test_names_must_match_images(self):
+        detector = self.detector(4, 3)
+        with mock.patch.object(detector, '_process_group', side_effect=lambda g, p: [None] * len(g)):
+            with self.assertRaises(ValueError):
+                detector.process_batch(['a.jpg', 'b.jpg'], names=['a'])
+            with self.assertRaises(ValueError):
+                detector.process_batch(iter(['a.jpg']), names=iter(['a', 'b']))
+
+
+
+class ProcessStreamCleanupTests(SimpleTestCase):
+    def detector(self):
+        detector = ViolationDetector.__new__(ViolationDetector)
+        detector.coco_batch_size = 2
+        detector.camera_tracks = CameraTrackRegistry()
+        return detector
+
+    def frames(self, source, **kwargs):
+        for index in range(10):
+            yield index, index / 10, np.zeros((8, 8, 3), dtype=np.uint8)
+
+    def test_camera_state_is_dropped_when_the_consumer_stops_early(self):
+        detector = self.detector()
+        with mock.patch('violation_detector.iter_video_frames', self.frames), \
+                mock.patch.object(detector, '_run_models', side_effect=lambda frames: (
+                    [None] * len(frames), frames, [None] * len(frames))), \
+                mock.patch.object(detector, '_track_frame'), \
+                mock.patch.object(detector, '_finalize_tracks', side_effect=lambda states: iter([{}])):
+            stream = detector.process_stream('camera.mp4', camera_id='cam-1')
+            next(stream)
+            self.assertIn('cam-1', detector.camera_tracks._cameras)
+            stream.close()
+        self.assertNotIn('cam-1', detector.camera_tracks._cameras)
+
+    def test_camera_state_is_dropped_on_error(self):
+        detector = self.detector()
+        with mock.patch('violation_detector.iter_video_frames', self.frames), \
+                mock.patch.object(detector, '_run_models', side_effect=RuntimeError('decode failed')):
+            with self.assertRaises(RuntimeError):
+                list(detector.process_stream('camera.mp4', camera_id='cam-1'))
+        self.assertNotIn('cam-1', detector.camera_tracks._cameras)
+
+
+def encoded_frame(seed=0):
+    image = np.random.default_rng(seed).integers(0, 255, (60, 80, 3), dtype=np.uint8)
+    return cv2.imencode('.jpg', image)[1].tobytes()
+
+
+class MediaRootTestCase(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class ViolationMediaReleaseTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        data = encoded_frame()
+        self.blob = store_media(iter_chunks(data), 'frame.jpg', 'image/jpeg', references=2)
+        self.offender = Offender.objects.create(plate_number='AB12CD3456')
+        self.violations = [
+            Violation.objects.create(
+                plate_number=self.offender, violation_type=violation_type, media=self.blob
+            )
+            for violation_type in ('No Helmet', 'Triple Riding')
+        ]
+
+    def ref_count(self):
+        return MediaBlob.objects.get(sha256=self.blob.sha256).ref_count
+
+    def test_deleting_one_violation_releases_one_reference(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.violations[0].delete()
+        self.assertEqual(self.ref_count(), 1)
+
+    def test_queryset_delete_releases_the_blob(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Violation.objects.all().delete()
+        self.assertFalse(MediaBlob.objects.filter(sha256=self.blob.sha256).exists())
+        self.assertFalse(os.path.exists(blob_path(self.blob)))
+
+    def test_offender_cascade_releases_the_blob(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.offender.delete()
+        self.assertFalse(MediaBlob.objects.filter(sha256=self.blob.sha256).exists())
+
+
+class StubDetector:
+    def __init__(self, plates):
+        self.plates = plates
+
+    def process_image(self, data, name=None):
+        violations = []
+        for plate in self.plates:
+            violations.extend(v for v in plate['violations'] if v not in violations)
+        return {
+            'violations': violations,
+            'confidences': {violation: 0.9 for violation in violations},
+            'plates': self.plates,
+            'detections': [],
+        }
+
+
+class ProcessJobTests(MediaRootTestCase):
+    def run_job(self, plates):
+        job = enqueue_detection('frame.jpg', 'image/jpeg', encoded_frame())
+        return process_job(job, StubDetector(plates))
+
+    def test_violation_without_a_plate_keeps_its_image(self):
+        job = self.run_job([{'plate_number': None, 'violations': ['No Helmet'], 'box': [0, 0, 10, 10]}])
+        self.assertEqual(job.status, 'done')
+        self.assertIn('License Plate: Not Detected', job.result['lines'])
+        violation = Violation.objects.get()
+        self.assertIsNone(violation.plate_number)
+        self.assertEqual(violation.media.ref_count, 1)
+        self.assertTrue(os.path.exists(blob_path(violation.media)))
+
+    def test_references_match_the_logged_violations(self):
+        job = self.run_job([
+            {'plate_number': 'AB12CD3456', 'violations': ['No Helmet', 'Triple Riding'], 'box': [0, 0, 10, 10]},
+            {'plate_number': None, 'violations': ['No Helmet'], 'box': [20, 0, 30, 10]},
+        ])
+        blob = MediaBlob.objects.get(sha256=job.result['media'])
+        self.assertEqual(Violation.objects.count(), 3)
+        self.assertEqual(blob.ref_count, 3)
+        self.assertEqual(Violation.objects.filter(plate_number__isnull=True).count(), 1)
+
+    def test_clean_upload_stores_nothing(self):
+        job = self.run_job([])
+        self.assertIsNone(job.result['image_url'])
+        self.assertFalse(MediaBlob.objects.exists())
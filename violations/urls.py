@@ -10,4 +10,10 @@ urlpatterns = [
     path('delete-offender/<str:plate_number>/', views.delete_offender, name='delete_offender'),
     path('delete-all/', views.delete_all_violations, name='delete_all_violations'),
     path('offender-logs/<str:plate_number>/', views.offender_logs, name='offender_logs'),
+    path('jobs/<int:job_id>/', views.detection_job_status, name='detection_job_status'),
+    path('jobs/stats/', views.detection_queue_stats, name='detection_queue_stats'),
+    path('jobs/<int:job_id>/evidence/', views.job_evidence, name='job_evidence'),
+    path('evidence/<int:violation_id>/', views.violation_evidence, name='violation_evidence'),
+    path('models/report/', views.model_report, name='model_report'),
+    path('metrics/', views.pipeline_metrics, name='pipeline_metrics'),
 ]
@@ -1,86 +1,106 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.contrib import messages
-from .models import Violation, Offender
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from .models import MediaBlob, Violation, Offender, DetectionJob
 from .forms import ImageUploadForm
 from django.conf import settings
 import os
-import uuid
-from violation_detector import ViolationDetector
+from detect.metrics import load_snapshots, metrics, render_prometheus
+from detect.model_registry import load_reports, registry
+from .evidence import evidence_path
+from .media_store import legacy_image_paths
+from .jobs import enqueue_detection, job_status, process_job, queue_stats
 
 def dashboard(request):
     return redirect('detect_violation')
 
 def detect_violation(request):
-    results = None
-    uploaded_image_url = None
+    job = None
     if request.method == 'POST':
         form = ImageUploadForm(request.POST, request.FILES)
         if form.is_valid():
             image = form.cleaned_data['image']
-            # Save uploaded image to media directory
-            media_root = getattr(settings, 'MEDIA_ROOT', os.path.join(settings.BASE_DIR, 'media'))
-            os.makedirs(media_root, exist_ok=True)
-            filename = f"{uuid.uuid4().hex}_{image.name}"
-            image_path = os.path.join(media_root, filename)
-            with open(image_path, 'wb+') as f:
-                for chunk in image.chunks():
-                    f.write(chunk)
-            # Prepare uploaded image URL for display
-            rel_path = os.path.relpath(image_path, media_root)
-            uploaded_image_url = settings.MEDIA_URL + rel_path.replace('\\', '/')
-            # Run detection (no DB logging here!)
-            detector = ViolationDetector()
-            detection_result = detector.process_image(image_path)
-            # Log violations using Django ORM
-            results = []
-            plate_number = detection_result['plate_number']
-            if detection_result['violations'] and plate_number:
-                # Get or create offender
-                from .models import Offender, Violation
-                offender, created = Offender.objects.get_or_create(plate_number=plate_number)
-                for violation_type in detection_result['violations']:
-                    Violation.objects.create(
-                        plate_number=offender,
-                        violation_type=violation_type,
-                        image_path=uploaded_image_url,
-                        confidence=0.0  # You can pass real confidence if available
-                    )
-                # Update offender stats
-                total_violations = Violation.objects.filter(plate_number=offender).count()
-                last_violation = Violation.objects.filter(plate_number=offender).order_by('-date_time').first().date_time
-                is_repeat = total_violations > 3
-                offender.total_violations = total_violations
-                offender.last_violation = last_violation
-                offender.is_repeat_offender = is_repeat
-                offender.save()
-                results.append(f"Violations Detected: {', '.join(detection_result['violations'])}")
-                results.append(f"License Plate: {plate_number}")
-                results.append(f"Repeat Offender: {'Yes' if is_repeat else 'No'} (Total: {total_violations})")
-            elif detection_result['violations']:
-                results.append(f"Violations Detected: {', '.join(detection_result['violations'])}")
-                results.append("License Plate: Not Detected")
-            else:
-                results.append("No violations detected.")
+            # Read the upload once; the job carries the bytes to a detection worker
+            image_data = b''.join(image.chunks())
+            job = enqueue_detection(image.name, image.content_type, image_data)
+            if settings.DETECTION_JOB_MODE == 'inline':
+                # No worker pool: run the job in this request
+                job = process_job(job)
         else:
             messages.error(request, 'Invalid image upload.')
     else:
         form = ImageUploadForm()
     return render(request, 'violations/detect.html', {
         'form': form,
-        'results': results,
-        'uploaded_image_url': uploaded_image_url
+        'job': job,
+        'job_status': job_status(job) if job else None
     })
 
+# Status and results of a queued detection, polled by the detect page
+def detection_job_status(request, job_id):
+    job = get_object_or_404(DetectionJob.objects.defer('image_data'), id=job_id)
+    return JsonResponse(job_status(job))
+
+# Queue depth, wait time and processing time, for sizing the worker pool
+def detection_queue_stats(request):
+    return JsonResponse(queue_stats())
+
+def evidence_response(image_url, detections, media=None):
+    """The annotated evidence image, rendered on first view"""
+    if not image_url:
+        raise Http404('No image was kept for this detection.')
+    if detections is None:
+        # Recorded before detections were stored: only the original image exists
+        return redirect(image_url)
+    path = evidence_path(image_url, detections, media)
+    if path is None:
+        raise Http404('The evidence image is gone.')
+    return FileResponse(open(path, 'rb'), content_type='image/jpeg')
+
+# Evidence image of a logged violation
+def violation_evidence(request, violation_id):
+    violation = get_object_or_404(Violation.objects.select_related('media'), id=violation_id)
+    return evidence_response(violation.image_path, violation.detections, violation.media)
+
+# Evidence image of a finished detection job
+def job_evidence(request, job_id):
+    job = get_object_or_404(DetectionJob.objects.defer('image_data'), id=job_id, status=DetectionJob.DONE)
+    media = None
+    if job.result.get('media'):
+        media = MediaBlob.objects.filter(sha256=job.result['media']).first()
+    return evidence_response(
+        job.result['image_url'], job.result['detection'].get('detections'), media
+    )
+
 def offender_logs(request, plate_number):
-    from .models import Violation, Offender
     offender = Offender.objects.filter(plate_number=plate_number).first()
-    violations = Violation.objects.filter(plate_number=offender).order_by('-date_time')
+    # Without an offender, filtering on it would list the violations with no plate
+    violations = (
+        Violation.objects.filter(plate_number=offender).select_related('media').order_by('-date_time')
+        if offender else Violation.objects.none()
+    )
     return render(request, 'violations/logs.html', {'violations': violations, 'offender': offender})
 
+# Model load / inference latency report of this process and of each detection
+# worker, which hold the models when jobs are queued
+def model_report(request):
+    return JsonResponse({
+        'web': registry.report(),
+        'workers': load_reports(settings.MODEL_REPORTS_DIR),
+    })
+
+# Stage latency histograms and pipeline counters in the Prometheus text format,
+# summed over this process and the detection workers
+def pipeline_metrics(request):
+    snapshots = [metrics.snapshot()] + load_snapshots(settings.METRICS_DIR)
+    return HttpResponse(
+        render_prometheus(snapshots), content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
 # Violation logs table
 def violation_logs(request):
-    violations = Violation.objects.select_related('plate_number').order_by('-date_time')
+    violations = Violation.objects.select_related('plate_number', 'media').order_by('-date_time')
     return render(request, 'violations/logs.html', {'violations': violations})
 
 # Repeat offenders table
@@ -88,20 +108,18 @@ def repeat_offenders(request):
     offenders = Offender.objects.filter(is_repeat_offender=True).order_by('-total_violations')
     return render(request, 'violations/repeat_offenders.html', {'offenders': offenders})
 
+def remove_files(paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
 # Delete a single violation
 def delete_violation(request, violation_id):
     violation = get_object_or_404(Violation, id=violation_id)
-    # Delete associated image file if not used elsewhere
-    if violation.image_path:
-        from django.conf import settings
-        import os
-        # Remove MEDIA_URL prefix to get relative path
-        rel_path = violation.image_path.replace(settings.MEDIA_URL, '').replace('\\', '/').lstrip('/')
-        abs_path = os.path.join(settings.MEDIA_ROOT, rel_path)
-        # Only delete if no other violation uses this image
-        if not Violation.objects.filter(image_path=violation.image_path).exclude(id=violation.id).exists():
-            if os.path.exists(abs_path):
-                os.remove(abs_path)
+    if violation.media_id is None:
+        # Saved before the media store: delete the file if no other violation uses it
+        remove_files(legacy_image_paths(Violation.objects.filter(id=violation.id)))
+    # A stored image loses one reference (see violations.signals) and goes with the last
     violation.delete()
     messages.success(request, 'Violation deleted.')
     return redirect('violation_logs')
@@ -109,22 +127,19 @@ def delete_violation(request, violation_id):
 # Delete all violations for an offender
 def delete_offender(request, plate_number):
     offender = get_object_or_404(Offender, plate_number=plate_number)
+    violations = Violation.objects.filter(plate_number=offender)
+    legacy_paths = legacy_image_paths(violations)
     offender.delete()
+    remove_files(legacy_paths)
     messages.success(request, f'All violations for {plate_number} deleted.')
     return redirect('repeat_offenders')
 
 # Delete all violations
 def delete_all_violations(request):
-    from django.conf import settings
-    import os
     # Delete all associated image files
-    for violation in Violation.objects.all():
-        if violation.image_path:
-            rel_path = violation.image_path.replace(settings.MEDIA_URL, '').replace('\\', '/').lstrip('/')
-            abs_path = os.path.join(settings.MEDIA_ROOT, rel_path)
-            if os.path.exists(abs_path):
-                os.remove(abs_path)
+    legacy_paths = legacy_image_paths(Violation.objects.all())
     Violation.objects.all().delete()
+    remove_files(legacy_paths)
     Offender.objects.all().delete()
     messages.success(request, 'All violations and images deleted.')
     return redirect('violation_logs')